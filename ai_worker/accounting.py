@@ -0,0 +1,123 @@
+"""Resource accounting for the worker's subprocesses (ffmpeg, say).
+
+wait() reaps a child with os.wait4, which hands back the child's own rusage: user and
+system CPU time and peak RSS. Each record is tagged with the stage and scene of the
+innermost trace span it ran in, and a story's records are written to its output_dir as
+a resource report, with totals per stage, for capacity planning and encoder tuning.
+
+On Linux a child's ru_maxrss also counts the worker's own memory, which the child
+shares until it execs (subprocess spawns with vfork), so peak RSS is sampled there
+from the child's VmHWM instead.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import tracing
+
+REPORT_NAME = 'resource_report.json'
+
+_records = None
+_lock = threading.Lock()
+
+def start():
+    """Starts collecting subprocess records for a story render."""
+    global _records
+    with _lock:
+        _records = []
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+def _sample_peak_rss(pid, tracker):
+    """Follows a child's VmHWM (its own high-water RSS) until it exits."""
+    status_path = f"/proc/{pid}/status"
+    while True:
+        try:
+            with open(status_path, 'r') as f:
+                peak = next((int(line.split()[1]) for line in f if line.startswith('VmHWM:')), None)
+        except (OSError, ValueError):
+            peak = None
+        if peak is None:
+            return  # Exited (zombies have no memory stats)
+        tracker['peak_kb'] = max(tracker['peak_kb'], peak)
+        time.sleep(RSS_SAMPLE_INTERVAL)
+
+def track(process):
+    """Starts accounting for a just-launched child. Pass the result to wait()."""
+    tracker = {'started': time.monotonic(), 'peak_kb': 0, 'sampler': None}
+    if sys.platform.startswith('linux'):
+        tracker['sampler'] = threading.Thread(target=_sample_peak_rss, args=(process.pid, tracker), daemon=True)
+        tracker['sampler'].start()
+    return tracker
+
+def wait(process, command, tracker):
+    """Reaps process with os.wait4 and records its usage. Returns the exit code.
+
+    Any pipes must already be drained.
+    """
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if tracker['sampler'] is not None:
+        tracker['sampler'].join()
+        max_rss_mb = tracker['peak_kb'] / 1024
+    else:
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    stage, scene = tracing.current_stage()
+    record = {
+        'stage': stage or 'other',
+        'scene': scene,
+        'program': os.path.basename(command[0]),
+        'returncode': process.returncode,
+        'wall_s': round(time.monotonic() - tracker['started'], 3),
+        'user_s': round(usage.ru_utime, 3),
+        'sys_s': round(usage.ru_stime, 3),
+        'max_rss_mb': round(max_rss_mb, 1),
+    }
+    with _lock:
+        if _records is not None:
+            _records.append(record)
+    return process.returncode
+
+def _totals(records):
+    return {
+        'processes': len(records),
+        'wall_s': round(sum(r['wall_s'] for r in records), 3),
+        'cpu_s': round(sum(r['user_s'] + r['sys_s'] for r in records), 3),
+        'max_rss_mb': max((r['max_rss_mb'] for r in records), default=0.0),
+    }
+
+def finish(output_dir):
+    """Writes the story's resource report to output_dir and stops collecting.
+
+    Returns (report path, summary) with the summary holding the overall totals and
+    CPU seconds per stage, or None if nothing was collected.
+    """
+    global _records
+    with _lock:
+        records, _records = _records, None
+    if records is None or not os.path.isdir(output_dir):
+        return None
+
+    stages = {}
+    for record in records:
+        stages.setdefault(record['stage'], []).append(record)
+    report = {
+        'total': _totals(records),
+        'stages': {stage: _totals(stage_records) for stage, stage_records in stages.items()},
+        'processes': records,
+    }
+    path = os.path.join(output_dir, REPORT_NAME)
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+
+    summary = dict(report['total'], cpu_by_stage={stage: totals['cpu_s'] for stage, totals in report['stages'].items()})
+    return path, summary
@@ -0,0 +1,265 @@
+"""In-process voice post-processing, mirroring the ffmpeg chain the worker used to spawn:
+
+    volume=4.5, dynaudnorm=p=0.95:s=5, aecho=0.8:0.88:6:0.4,
+    highpass=f=80, lowpass=f=15000, then 48 kHz stereo
+
+plus the EBU R128 measurements (integrated loudness, true peak) and the peak limiter
+the story narration track is normalized with.
+
+Everything works on float64 NumPy arrays in [-1, 1]; no temp files or subprocesses.
+"""
+import collections
+import math
+
+import numpy as np
+from scipy import ndimage, signal
+from scipy.special import erf
+
+OUTPUT_SAMPLE_RATE = 48000
+# ffmpeg's "-ac 2" treats mono as front-center and pans it at -3 dB into each side
+MONO_TO_STEREO_GAIN = math.sqrt(0.5)
+
+def bound(threshold, value):
+    """Soft limiter used by dynaudnorm: ~linear below threshold, saturating to it above."""
+    const = 0.8862269254527580136490837416705725913987747280611935  # sqrt(pi) / 2
+    return erf(const * (value / threshold)) * threshold
+
+def _compress_threshold(threshold):
+    """Finds t such that bound(t, 1.0) == threshold (dynaudnorm's setup_compress_thresh).
+
+    ffmpeg's search works in 63-bit fixed point and so never steps past 1.0; the
+    result is capped there too to match its output levels.
+    """
+    if not (1e-12 < threshold < 1.0 - 1e-12):
+        return threshold
+    lo, hi = threshold, 1.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if bound(mid, 1.0) <= threshold:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def _fade(prev, curr, n):
+    """Per-sample linear ramp from prev to curr over a frame, as dynaudnorm applies gains."""
+    return prev + (curr - prev) * (np.arange(n) + 1) / n
+
+def _smoothed_gains(local_gains, active, filter_size):
+    """Runs dynaudnorm's gain history queues: minimum filter, then Gaussian smoothing.
+
+    Mirrors update_gain_history() frame by frame, including its neutral (1.0) pre-fill
+    and end-of-stream flush frames, returning one smoothed gain per input frame.
+    """
+    half = filter_size // 2
+    sigma = ((filter_size / 2.0) - 1.0) / 3.0 + 1.0 / 3.0
+    weights = np.exp(-((np.arange(filter_size) - half) ** 2) / (2.0 * sigma * sigma))
+    weights /= weights.sum()
+
+    original = collections.deque([1.0] * half)
+    thresholds = collections.deque([active[0]] * half)
+    minimum = collections.deque()
+    smoothed = []
+
+    n_frames = len(local_gains)
+    k = 0
+    while len(smoothed) < n_frames:
+        gain, is_active = (local_gains[k], active[k]) if k < n_frames else (1.0, True)
+        k += 1
+        original.append(gain)
+
+        while len(original) >= filter_size:
+            if not minimum:
+                initial = 1.0
+                for position in range(half + 1, half + 1 + half):
+                    initial = min(initial, original[position])
+                    minimum.append(initial)
+            minimum.append(min(original))
+            thresholds.append(is_active)
+            original.popleft()
+
+        while len(minimum) >= filter_size:
+            flags = np.array(list(thresholds)[:filter_size], dtype=np.float64)
+            weighted = weights * flags
+            value = float(np.dot(weighted, list(minimum))) if weighted.sum() > 0 else 1.0
+            smoothed.append(min(value, original[0]))
+            minimum.popleft()
+            thresholds.popleft()
+
+    return smoothed[:n_frames]
+
+def dynaudnorm(samples, sample_rate, peak=0.95, frame_ms=500, filter_size=31, max_gain=10.0, compress=0.0):
+    """Dynamic Audio Normalizer (offline port of ffmpeg's dynaudnorm, coupled channels).
+
+    Per-frame gains (peak / frame peak, soft-limited to max_gain) are passed through a
+    minimum filter and a Gaussian smoother across filter_size frames, then applied with
+    per-sample interpolation between frames. With compress > 0, samples are first
+    soft-limited to compress x the frame's standard deviation.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    mono = samples.ndim == 1
+    x = samples[:, None] if mono else samples.copy()
+    frame_len = int(round(sample_rate * frame_ms / 1000.0))
+    frame_len += frame_len % 2
+    frames = [x[start:start + frame_len].copy() for start in range(0, max(len(x), 1), frame_len)]
+
+    if compress > 0:
+        threshold = None
+        for k, frame in enumerate(frames):
+            std_dev = max(math.sqrt(np.sum(frame ** 2) / max(frame.size - 1, 1)), 1e-16)
+            current = min(1.0, compress * std_dev)
+            prev = current if threshold is None else threshold
+            threshold = current if threshold is None else (current / 3.0 + threshold * 2.0 / 3.0)
+            limits = _fade(_compress_threshold(prev), _compress_threshold(threshold), len(frame))[:, None]
+            frames[k] = np.sign(frame) * bound(np.maximum(limits, 1e-16), np.abs(frame))
+
+    frame_peaks = np.array([np.max(np.abs(frame)) if frame.size else 0.0 for frame in frames])
+    local_gains = bound(max_gain, peak / np.maximum(frame_peaks, 1e-16))
+    gains = _smoothed_gains(local_gains, frame_peaks > 0.0, filter_size)
+
+    prev_gain = 1.0
+    for k, frame in enumerate(frames):
+        frames[k] = frame * _fade(prev_gain, gains[k], len(frame))[:, None]
+        prev_gain = gains[k]
+    out = np.concatenate(frames)[:len(x)]
+    return out[:, 0] if mono else out
+
+def aecho(samples, sample_rate, in_gain=0.8, out_gain=0.88, delay_ms=6.0, decay=0.4):
+    """Single-tap echo: out = (in * in_gain + decay * in[n - delay]) * out_gain."""
+    samples = np.asarray(samples, dtype=np.float64)
+    delay = int(sample_rate * delay_ms / 1000.0)
+    delayed = np.zeros_like(samples)
+    if delay < len(samples):
+        delayed[delay:] = samples[:len(samples) - delay]
+    return (samples * in_gain + delayed * decay) * out_gain
+
+def biquad(samples, sample_rate, kind, frequency, q=0.707):
+    """RBJ cookbook 2-pole high/low-pass, matching ffmpeg's highpass/lowpass defaults."""
+    w0 = 2.0 * math.pi * frequency / sample_rate
+    alpha = math.sin(w0) / (2.0 * q)
+    cos_w0 = math.cos(w0)
+    if kind == 'highpass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    else:
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+    a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    return signal.lfilter(b, a, samples, axis=0)
+
+def resample(samples, sample_rate, target_rate=OUTPUT_SAMPLE_RATE):
+    """Polyphase resampling to target_rate."""
+    if sample_rate == target_rate:
+        return samples
+    g = math.gcd(int(sample_rate), int(target_rate))
+    return signal.resample_poly(samples, target_rate // g, sample_rate // g, axis=0)
+
+def voice_chain(samples, sample_rate, level=True):
+    """Full scene-voice chain. Returns (stereo float64 array of shape (n, 2), OUTPUT_SAMPLE_RATE).
+
+    Without level the volume boost and dynaudnorm are skipped, for audio that is
+    loudness-normalized later as part of the story's narration track.
+    """
+    x = np.asarray(samples, dtype=np.float64).reshape(-1)
+    if level:
+        x = x * 4.5                                            # Boost volume significantly
+        x = dynaudnorm(x, sample_rate, peak=0.95, compress=5)  # Professional dynamic normalization
+    x = aecho(x, sample_rate)                              # Subtle room presence
+    x = biquad(x, sample_rate, 'highpass', 80)             # Remove low-end rumble
+    if sample_rate > 30000:
+        # Remove harsh high-end hiss. Like ffmpeg, skipped when 15 kHz is above
+        # Nyquist (the model's 24 kHz output); resampling band-limits it anyway.
+        x = biquad(x, sample_rate, 'lowpass', 15000)
+    x = resample(x, sample_rate) * MONO_TO_STEREO_GAIN
+    return np.stack([x, x], axis=1), OUTPUT_SAMPLE_RATE
+
+def to_pcm16(samples):
+    """Converts float samples to clipped 16-bit PCM."""
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+# ITU-R BS.1770 K-weighting at 48 kHz: a high shelf (the head's acoustic effect) and a
+# high-pass (RLB weighting), as second-order sections
+K_WEIGHTING_48K = np.array([
+    [1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585],
+    [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+])
+LOUDNESS_CHUNK = 480000  # Samples filtered at a time (10 s at 48 kHz, a multiple of the 100 ms step)
+
+def integrated_loudness(samples, sample_rate=OUTPUT_SAMPLE_RATE):
+    """EBU R128 / BS.1770 integrated loudness in LUFS (-inf for silence).
+
+    Mean square of the K-weighted channels (left and right weighted 1) over 400 ms
+    blocks every 100 ms; blocks under -70 LUFS, then those 10 LU under the mean of the
+    rest, are gated out. Filters a chunk at a time, so long tracks need no copies.
+    """
+    x = np.asarray(samples)
+    if x.ndim == 1:
+        x = x[:, None]
+    if sample_rate != OUTPUT_SAMPLE_RATE:
+        x = resample(x, sample_rate)
+    step = OUTPUT_SAMPLE_RATE // 10
+    zi = np.zeros((K_WEIGHTING_48K.shape[0], 2, x.shape[1]))
+    energies = []
+    for start in range(0, len(x), LOUDNESS_CHUNK):
+        weighted, zi = signal.sosfilt(K_WEIGHTING_48K, x[start:start + LOUDNESS_CHUNK].astype(np.float64), axis=0, zi=zi)
+        squares = np.sum(weighted ** 2, axis=1)
+        whole = len(squares) // step * step
+        energies.append(squares[:whole].reshape(-1, step).sum(axis=1))
+    steps = np.concatenate(energies) if energies else np.zeros(0)
+    if len(steps) < 4:
+        return -math.inf
+    # 400 ms blocks from four consecutive 100 ms steps (a trailing partial block is dropped)
+    power = np.convolve(steps, np.ones(4), mode='valid') / (4 * step)
+    with np.errstate(divide='ignore'):
+        block_loudness = -0.691 + 10 * np.log10(power)
+    gated = power[block_loudness > -70.0]
+    if not len(gated):
+        return -math.inf
+    relative_gate = -0.691 + 10 * math.log10(gated.mean()) - 10.0
+    gated = power[(block_loudness > -70.0) & (block_loudness > relative_gate)]
+    return -0.691 + 10 * math.log10(gated.mean())
+
+def peak_envelope(samples, oversample=4):
+    """Per-sample true peak: the largest |value| around each sample after 4x oversampling,
+    over all channels (BS.1770 Annex 2). Returns a float32 array, one value per sample."""
+    x = np.asarray(samples)
+    if x.ndim == 1:
+        x = x[:, None]
+    if x.shape[1] > 1 and np.array_equal(x[:, 0], x[:, 1]):
+        x = x[:, :1]  # Narration is dual mono: one channel has the same peaks
+    envelope = np.zeros(len(x), dtype=np.float32)
+    overlap = 64  # Filter run-in, so chunk edges don't ring
+    for start in range(0, len(x), LOUDNESS_CHUNK):
+        end = min(start + LOUDNESS_CHUNK, len(x))
+        lead = min(start, overlap)
+        for channel in range(x.shape[1]):
+            upsampled = np.abs(signal.resample_poly(x[start - lead:end + overlap, channel], oversample, 1))
+            phases = upsampled[lead * oversample:(lead + end - start) * oversample].reshape(-1, oversample)
+            np.maximum(envelope[start:end], phases.max(axis=1), out=envelope[start:end])
+            np.maximum(envelope[start:end], np.abs(x[start:end, channel]), out=envelope[start:end])
+    return envelope
+
+def true_peak(samples):
+    """Peak level in dBTP (-inf for silence)."""
+    envelope = peak_envelope(samples)
+    peak = float(envelope.max()) if len(envelope) else 0.0
+    return 20 * math.log10(peak) if peak > 0 else -math.inf
+
+def limit(samples, sample_rate, ceiling, peaks=None, window_ms=10.0):
+    """Look-ahead true-peak limiter: keeps the peak envelope at or under ceiling (linear), in place.
+
+    The gain each sample needs is the running minimum over a window around it,
+    smoothed with a moving average of the same width, so gain reduction ramps in
+    before a peak and out after it without ever letting the peak through.
+    peaks is samples' peak_envelope() if already known; it is scaled by the gain
+    applied. Returns the largest gain reduction applied, in dB.
+    """
+    if peaks is None:
+        peaks = peak_envelope(samples)
+    if not len(peaks) or peaks.max() <= ceiling:
+        return 0.0
+    width = 2 * int(sample_rate * window_ms / 2000.0) + 1
+    needed = np.minimum(1.0, ceiling / np.maximum(peaks, 1e-12)).astype(np.float32)
+    gain = ndimage.uniform_filter1d(ndimage.minimum_filter1d(needed, width, mode='nearest'), width, mode='nearest')
+    gain = np.minimum(gain, needed)  # Guards the float rounding of the average
+    samples *= gain[:, None] if samples.ndim == 2 else gain
+    peaks *= gain
+    return -20 * math.log10(float(gain.min()))
@@ -0,0 +1,611 @@
+"""Micro-benchmarks for the AI worker pipeline.
+
+Usage:
+    python bench.py tts [--batch-sizes 1,2,4,8] [--lines 8] [--language en]
+    python bench.py dsp-parity [--input ../public/audio/sample.m4a] [--seconds 8]
+    python bench.py intermediates [--formats ultrafast,intra,final] [--scenes 2] [--seconds 5]
+    python bench.py motion [--engines zoompan,numpy] [--patterns 0,1,2,3,4,5] [--seconds 5]
+    python bench.py stills [--image photo.jpg] [--sizes 4000x3000,8000x6000] [--repeat 3]
+    python bench.py watermark [--image photo.jpg] [--sizes 1920x1080,4000x3000] [--max-width 1920] [--repeat 3]
+    python bench.py providers [--scenarios healthy,slow-pexels,pexels-down,hanging] [--hedge-delay 1.5]
+    python bench.py assembly [--scene-counts 5,20,50] [--modes xfade,segments] [--profile draft]
+    python bench.py narration [--scene-counts 5,20,50] [--seconds 5] [--lufs -14]
+    python bench.py single-pass [--scene-counts 4,8,16,24] [--profile final] [--seconds 3]
+"""
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from aiohttp import web
+from PIL import Image
+from scipy.io import wavfile
+
+import accounting
+import audio_dsp
+import motion
+import narration
+import segments
+import tracing
+import watermark
+import worker
+
+# The ffmpeg voice chain that audio_dsp.voice_chain replaces
+FFMPEG_VOICE_CHAIN = 'volume=4.5,dynaudnorm=p=0.95:s=5,aecho=0.8:0.88:6:0.4,highpass=f=80,lowpass=f=15000,atempo=1.0'
+
+SAMPLE_NARRATIONS = [
+    "The ocean covers more than seventy percent of our planet.",
+    "Yet we have explored less than a quarter of its floor.",
+    "Sunlight fades completely a thousand meters below the surface.",
+    "Down there, creatures make their own light to hunt and hide.",
+    "Some of them have never been seen alive by any human.",
+    "Pressure at the deepest point could crush a car like a soda can.",
+    "Still, tiny shrimp-like animals thrive at the very bottom.",
+    "Every new expedition finds species nobody has ever named.",
+]
+
+def bench_tts(args):
+    """Compares per-scene and batched synthesis real-time factor (lower is faster)."""
+    worker.init_models(args.language)
+    texts = [SAMPLE_NARRATIONS[i % len(SAMPLE_NARRATIONS)] for i in range(args.lines)]
+    sr = worker.tts_model.sr
+
+    # Warm-up so the first measurement doesn't pay for lazy initialisation
+    worker.use_voice_conditionals(worker.TARGET_VOICE_PATH)
+    worker.tts_model.generate(texts[0], language_id=args.language, audio_prompt_path=None)
+
+    rows = []
+    for batch_size in args.batch_sizes:
+        batches = worker.plan_tts_batches(texts, args.language, batch_size)
+        audio_seconds = 0.0
+        split_failures = 0
+        start = time.perf_counter()
+        for batch in batches:
+            batch_texts = [texts[i] for i in batch]
+            pieces = None
+            if len(batch) > 1:
+                pieces = worker.synthesize_batch(batch_texts, args.language, worker.TARGET_VOICE_PATH)
+                if pieces is None:
+                    split_failures += 1
+            if pieces is None:
+                worker.use_voice_conditionals(worker.TARGET_VOICE_PATH)
+                pieces = [worker.tts_model.generate(text, language_id=args.language, audio_prompt_path=None).squeeze(0).numpy()
+                          for text in batch_texts]
+            audio_seconds += sum(len(piece) for piece in pieces) / sr
+        elapsed = time.perf_counter() - start
+        rows.append((batch_size, len(batches), elapsed, audio_seconds, elapsed / max(audio_seconds, 1e-9), split_failures))
+
+    print(f"{'batch':>5} {'calls':>5} {'wall s':>8} {'audio s':>8} {'RTF':>6} {'split fails':>11}")
+    for batch_size, calls, elapsed, audio_seconds, rtf, failures in rows:
+        print(f"{batch_size:>5} {calls:>5} {elapsed:>8.2f} {audio_seconds:>8.2f} {rtf:>6.2f} {failures:>11}")
+
+def level_db(samples):
+    return 20 * np.log10(max(float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))), 1e-12))
+
+def bench_dsp_parity(args):
+    """Runs the same voice through the ffmpeg chain and the in-process chain and compares levels."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_wav = os.path.join(tmp, 'source.wav')
+        reference_wav = os.path.join(tmp, 'reference.wav')
+        # Model-like input: mono at the TTS sample rate
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-i', args.input, '-t', str(args.seconds),
+                        '-ac', '1', '-ar', str(args.sample_rate), '-c:a', 'pcm_f32le', source_wav], check=True)
+        sr, source = wavfile.read(source_wav)
+
+        start = time.perf_counter()
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-i', source_wav, '-af', FFMPEG_VOICE_CHAIN,
+                        '-ar', str(audio_dsp.OUTPUT_SAMPLE_RATE), '-ac', '2', '-c:a', 'pcm_f32le', reference_wav], check=True)
+        ffmpeg_seconds = time.perf_counter() - start
+        _, reference = wavfile.read(reference_wav)
+
+    start = time.perf_counter()
+    processed, _ = audio_dsp.voice_chain(source, sr)
+    dsp_seconds = time.perf_counter() - start
+
+    # Align for the resampler's group delay before comparing windows
+    probe = min(len(processed), audio_dsp.OUTPUT_SAMPLE_RATE) - 1000
+    lag = int(np.argmax(np.correlate(reference[:probe + 1000, 0], processed[:probe, 0], 'valid')))
+    reference = reference[lag:]
+    n = min(len(reference), len(processed))
+    reference, processed = reference[:n, 0], processed[:n, 0]
+
+    window = int(audio_dsp.OUTPUT_SAMPLE_RATE * args.window_ms / 1000)
+    print(f"{'window':>6} {'ffmpeg dB':>10} {'dsp dB':>8} {'delta':>7}")
+    deltas = []
+    for k in range(n // window):
+        a, b = level_db(reference[k * window:(k + 1) * window]), level_db(processed[k * window:(k + 1) * window])
+        if a > args.floor_db:
+            deltas.append(a - b)
+        print(f"{k:>6} {a:>10.2f} {b:>8.2f} {a - b:>+7.2f}")
+    print(f"overall RMS: ffmpeg {level_db(reference):.2f} dB, dsp {level_db(processed):.2f} dB")
+    print(f"peak: ffmpeg {20 * np.log10(np.abs(reference).max()):.2f} dBFS, dsp {20 * np.log10(np.abs(processed).max()):.2f} dBFS")
+    if deltas:
+        print(f"max window delta above {args.floor_db:.0f} dB: {max(abs(d) for d in deltas):.2f} dB")
+    print(f"time: ffmpeg {ffmpeg_seconds:.3f}s (subprocess), dsp {dsp_seconds:.3f}s (in-process)")
+
+def bench_intermediates(args):
+    """Encode time and disk use per scene clip for each intermediate format."""
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = args.image
+        if not image_path:
+            image_path = os.path.join(tmp, 'still.jpg')
+            subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc2=s=1920x1080',
+                            '-frames:v', '1', image_path], check=True)
+        audio_path = os.path.join(tmp, 'narration.wav')
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-i', args.audio, '-t', str(args.seconds),
+                        '-ar', '48000', '-ac', '2', '-c:a', 'pcm_s16le', audio_path], check=True)
+        narration = SAMPLE_NARRATIONS[0] if args.subtitles else ''
+
+        print(f"{'format':>10} {'s/scene':>8} {'MB/scene':>9} {'Mbit/s':>7}")
+        for name in args.formats:
+            times, sizes = [], []
+            for scene_index in range(args.scenes):
+                clip_path = worker.scene_clip_path(tmp, f"{name}_{scene_index}", name)
+                start = time.perf_counter()
+                worker.create_scene_video(image_path, audio_path, clip_path, narration, scene_index, args.aspect_ratio, name)
+                times.append(time.perf_counter() - start)
+                sizes.append(os.path.getsize(clip_path))
+                os.remove(clip_path)
+            seconds, size = sum(times) / len(times), sum(sizes) / len(sizes)
+            print(f"{name:>10} {seconds:>8.2f} {size / 1e6:>9.1f} {size * 8 / 1e6 / args.seconds:>7.1f}")
+
+def _render_motion_clip(image_path, audio_path, clip_path, pattern, aspect_ratio, engine, results):
+    # Runs in a fresh process so ru_maxrss covers only this render
+    start = time.perf_counter()
+    worker.create_scene_video(image_path, audio_path, clip_path, '', pattern, aspect_ratio, None, engine)
+    elapsed = time.perf_counter() - start
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    results.put((elapsed, own, children, os.path.getsize(clip_path)))
+
+def bench_motion(args):
+    """Ken Burns frame time and peak memory: ffmpeg zoompan vs the NumPy/OpenCV engine."""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = args.image
+        if not image_path:
+            image_path = os.path.join(tmp, 'still.jpg')
+            subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc2=s=4000x3000',
+                            '-frames:v', '1', image_path], check=True)
+        audio_path = os.path.join(tmp, 'narration.wav')
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-i', args.audio, '-t', str(args.seconds),
+                        '-ar', '48000', '-ac', '2', '-c:a', 'pcm_s16le', audio_path], check=True)
+        total_frames = int(args.seconds * worker.SCENE_FPS)
+
+        print(f"{'engine':>8} {'pattern':>7} {'ms/frame':>9} {'python MB':>10} {'ffmpeg MB':>10}")
+        for engine in args.engines:
+            for pattern in args.patterns:
+                clip_path = os.path.join(tmp, f"{engine}_{pattern}.mkv")
+                results = context.Queue()
+                process = context.Process(target=_render_motion_clip,
+                                          args=(image_path, audio_path, clip_path, pattern, args.aspect_ratio, engine, results))
+                process.start()
+                elapsed, own, children, _ = results.get()
+                process.join()
+                os.remove(clip_path)
+                # ru_maxrss is in KiB on Linux
+                print(f"{engine:>8} {pattern:>7} {elapsed * 1000 / total_frames:>9.2f} {own / 1024:>10.0f} {children / 1024:>10.0f}")
+
+def _ffmpeg_still(image_path, width, height, grading):
+    """Cover-crops (and optionally grades) a still with ffmpeg, returning BGR pixels."""
+    vf = f"scale=w={width}:h={height}:force_original_aspect_ratio=increase,crop={width}:{height}"
+    result = subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-i', image_path,
+                             '-vf', vf + (',' + grading if grading else ''),
+                             '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-'], capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.uint8).reshape(height, width, 3)
+
+def bench_stills(args):
+    """Still preparation time (ffmpeg scale + grading vs motion.prepare_still) and grading parity."""
+    width, height = (1920, 1080) if args.aspect_ratio == '16:9' else (1080, 1920)
+    stage_w, stage_h = motion.stage_size(width, height, args.aspect_ratio)
+    with tempfile.TemporaryDirectory() as tmp:
+        images = [args.image] if args.image else []
+        for size in ([] if args.image else args.sizes):
+            image_path = os.path.join(tmp, f"still_{size}.jpg")
+            subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', f"testsrc2=s={size}",
+                            '-frames:v', '1', '-q:v', '2', image_path], check=True)
+            images.append(image_path)
+
+        print(f"stage size {stage_w}x{stage_h}")
+        print(f"{'source':>10} {'decode':>8} {'ffmpeg ms':>10} {'numpy ms':>9} {'mean diff':>10} {'low-freq diff':>14}")
+        for image_path in images:
+            source = motion.decode_still(image_path, stage_w, stage_h)
+            with Image.open(image_path) as header:
+                source_w, source_h = header.size
+            ffmpeg_times, numpy_times = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                reference = _ffmpeg_still(image_path, stage_w, stage_h, worker.COLOR_GRADING)
+                ffmpeg_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                motion.prepare_still(image_path, width, height, args.aspect_ratio)
+                numpy_times.append(time.perf_counter() - start)
+
+            # Parity of the grading alone, on ffmpeg's own resize
+            graded = motion.grade(_ffmpeg_still(image_path, stage_w, stage_h, None)).astype(np.float32)
+            reference = reference.astype(np.float32)
+            low_freq = np.abs(cv2.blur(graded, (15, 15)) - cv2.blur(reference, (15, 15))).mean()
+            print(f"{source_w}x{source_h:<5} {f'1/{source_w // source.shape[1]}':>8} {min(ffmpeg_times) * 1000:>10.0f} "
+                  f"{min(numpy_times) * 1000:>9.0f} {np.abs(graded - reference).mean():>10.2f} {low_freq:>14.2f}")
+
+def _watermark_fixture(image, text):
+    """Draws a stock-photo style watermark: grey caption along the bottom and a corner logo."""
+    h, w = image.shape[:2]
+    marked = image.copy()
+    scale = w / 1000.0
+    cv2.putText(marked, text, (int(w * 0.05), int(h * 0.93)), cv2.FONT_HERSHEY_SIMPLEX, scale, (225, 225, 225),
+                max(1, int(scale * 2)), cv2.LINE_AA)
+    cv2.rectangle(marked, (int(w * 0.82), int(h * 0.03)), (int(w * 0.95), int(h * 0.08)), (235, 235, 235), max(1, int(scale * 2)))
+    cv2.putText(marked, "LOGO", (int(w * 0.84), int(h * 0.07)), cv2.FONT_HERSHEY_SIMPLEX, scale * 0.8, (235, 235, 235),
+                max(1, int(scale * 2)), cv2.LINE_AA)
+    return marked
+
+def bench_watermark(args):
+    """clean_watermark per-image time: full-frame detection + inpainting vs band detection + box inpainting.
+
+    The scaled column is the optional downscaled detection (WORKER_WATERMARK_DETECT_MAX_WIDTH,
+    off by default); covered and mask area compare its mask with the full-resolution one.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = []
+        for size in args.sizes:
+            width, height = (int(v) for v in size.split('x'))
+            if args.image:
+                base = cv2.resize(cv2.imread(args.image), (width, height), interpolation=cv2.INTER_AREA)
+            else:
+                image_path = os.path.join(tmp, f"watermark_{size}.png")
+                subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', f"testsrc2=s={size}",
+                                '-frames:v', '1', image_path], check=True)
+                base = cv2.imread(image_path)
+            fixtures.append((size, base, _watermark_fixture(base, "Stock Photo ID 123456789")))
+
+        print(f"{'image':>10} {'full detect':>12} {'band detect':>12} {'scaled detect':>14} {'covered':>15} {'mask area':>15} "
+              f"{'full inpaint':>13} {'box inpaint':>12} {'identical':>10}")
+        for size, base, image in fixtures:
+            h, w = image.shape[:2]
+            drawn = np.abs(image.astype(np.int16) - base).sum(axis=2) > 30
+            timings = {'full': [], 'band': [], 'scaled': [], 'full_inpaint': [], 'box_inpaint': []}
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                # The old clean_watermark: every detection step over the whole frame
+                full_mask = watermark._detect_band(image, h, w, 0, 1.0)
+                timings['full'].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                band_mask = watermark.detect(image)
+                timings['band'].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                scaled_mask = watermark.detect(image, args.max_width)
+                timings['scaled'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                full_result = cv2.inpaint(image, band_mask, watermark.INPAINT_RADIUS, cv2.INPAINT_NS)
+                timings['full_inpaint'].append(time.perf_counter() - start)
+                box_result = image.copy()
+                start = time.perf_counter()
+                watermark.inpaint(box_result, band_mask)
+                timings['box_inpaint'].append(time.perf_counter() - start)
+
+            if not np.array_equal(band_mask, full_mask):
+                print(f"Warning: {size} band mask differs from the full-frame mask", file=sys.stderr)
+            ms = {name: min(values) * 1000 for name, values in timings.items()}
+            # Share of the drawn watermark inside the mask, and share of the frame the mask takes
+            # (clean_watermark skips images whose mask exceeds 10%), full-frame -> scaled
+            covered = f"{(full_mask > 0)[drawn].mean():.2f} -> {(scaled_mask > 0)[drawn].mean():.2f}"
+            area = f"{np.count_nonzero(full_mask) / (h * w):.1%} -> {np.count_nonzero(scaled_mask) / (h * w):.1%}"
+            print(f"{size:>10} {ms['full']:>12.1f} {ms['band']:>12.1f} {ms['scaled']:>14.1f} {covered:>15} {area:>15} "
+                  f"{ms['full_inpaint']:>13.1f} {ms['box_inpaint']:>12.1f} {str(np.array_equal(full_result, box_result)):>10}")
+
+# Stub provider behaviour per scenario: provider -> (response delay in seconds, HTTP status),
+# plus the kinds of Yahoo result candidates, in result order (default: one good photo)
+PROVIDER_SCENARIOS = {
+    'healthy': {'pexels': (0.3, 200), 'yahoo': (0.3, 200), 'loremflickr': (0.3, 200)},
+    'slow-pexels': {'pexels': (6.0, 200), 'yahoo': (0.4, 200), 'loremflickr': (0.3, 200)},
+    'pexels-down': {'pexels': (0.1, 500), 'yahoo': (0.4, 200), 'loremflickr': (0.3, 200)},
+    'hanging': {'pexels': (60.0, 200), 'yahoo': (60.0, 200), 'loremflickr': (0.5, 200)},
+    'yahoo-junk': {'pexels': (0.1, 500), 'yahoo': (0.2, 200), 'loremflickr': (0.3, 200),
+                   'yahoo_candidates': ['stall', 'page', 'huge', 'tiny', 'photo']},
+}
+
+async def _start_provider_stubs(behaviour):
+    """Serves stub Pexels/Yahoo/LoremFlickr endpoints on localhost. Returns (runner, base URL)."""
+    _, jpeg = cv2.imencode('.jpg', np.full((1080, 1920, 3), 128, dtype=np.uint8))
+    _, tiny_jpeg = cv2.imencode('.jpg', np.full((240, 320, 3), 128, dtype=np.uint8))
+    base = {}
+    candidates = behaviour.get('yahoo_candidates', ['photo'])
+
+    def endpoint(provider, body, content_type):
+        async def handler(request):
+            delay, status = behaviour[provider]
+            await asyncio.sleep(delay)
+            if status != 200:
+                return web.Response(status=status)
+            return web.Response(body=body() if callable(body) else body, content_type=content_type)
+        return handler
+
+    app = web.Application()
+    app.router.add_get('/pexels/search', endpoint('pexels', lambda: json.dumps(
+        {'photos': [{'src': {'large2x': f"{base['url']}/pexels/photo.jpg"}}]}).encode(), 'application/json'))
+    app.router.add_get('/pexels/photo.jpg', endpoint('pexels', jpeg.tobytes(), 'image/jpeg'))
+    app.router.add_get('/yahoo/search', endpoint('yahoo', lambda: ','.join(
+        f'"murl":"{base["url"]}/yahoo/{kind}.jpg"' for kind in candidates).encode(), 'text/html'))
+    app.router.add_get('/yahoo/photo.jpg', endpoint('yahoo', jpeg.tobytes(), 'image/jpeg'))
+    app.router.add_get('/yahoo/tiny.jpg', endpoint('yahoo', tiny_jpeg.tobytes(), 'image/jpeg'))
+    app.router.add_get('/yahoo/page.jpg', endpoint('yahoo', b'<html>' + b' ' * 2000000 + b'</html>', 'text/html'))
+
+    async def stall(request):
+        await asyncio.sleep(60)
+        return web.Response(body=jpeg.tobytes(), content_type='image/jpeg')
+
+    async def huge(request):
+        # A 200 MB "image" trickling out: a valid JPEG start, then filler
+        response = web.StreamResponse(headers={'Content-Type': 'image/jpeg'})
+        await response.prepare(request)
+        try:
+            await response.write(jpeg.tobytes()[:1024])
+            for _ in range(200):
+                await response.write(b'\0' * 1024 * 1024)
+                await asyncio.sleep(0.02)
+        except ConnectionResetError:
+            pass  # The client gave up on it
+        return response
+
+    app.router.add_get('/yahoo/stall.jpg', stall)
+    app.router.add_get('/yahoo/huge.jpg', huge)
+    app.router.add_get('/loremflickr/{width}/{height}/{query}', endpoint('loremflickr', jpeg.tobytes(), 'image/jpeg'))
+    # Handlers still sleeping (the hanging scenario) are cancelled on cleanup instead of
+    # awaited for aiohttp's default 60 s; 0 would mean no limit at all
+    runner = web.AppRunner(app, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base['url'] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    return runner, base['url']
+
+async def _acquire_from_stubs(behaviour, mode, image_dir, scenes=1):
+    runner, base_url = await _start_provider_stubs(behaviour)
+    worker.PEXELS_SEARCH_URL = f"{base_url}/pexels/search"
+    worker.YAHOO_IMAGES_URL = f"{base_url}/yahoo/search"
+    worker.LOREMFLICKR_URL = f"{base_url}/loremflickr"
+    worker.IMAGE_FETCH_MODE = mode
+    try:
+        # Every scene of a story shares one fetcher, and so its provider limits
+        async with worker.ImageFetcher() as fetcher:
+            start = time.perf_counter()
+            images = await asyncio.gather(*(
+                fetcher.acquire(f"a lighthouse on a cliff at dusk, shot {n}", os.path.join(image_dir, f"scene_{n}.jpg"), '16:9', n)
+                for n in range(scenes)))
+            return time.perf_counter() - start, images, fetcher.stats
+    finally:
+        await runner.cleanup()
+
+def bench_providers(args):
+    """Scene image acquisition time, sequential vs hedged, against local stub providers."""
+    os.environ['PEXELS_API_KEY'] = 'stub'
+    worker.IMAGE_CACHE_MAX_MB = 0
+    worker.IMAGE_HEDGE_DELAY = args.hedge_delay
+    print(f"{'scenario':>12} {'mode':>10} {'scenes':>6} {'seconds':>8} {'wins':>28} {'missing':>8} {'timeouts':>9} {'cancelled':>10}")
+    for scenario in args.scenarios:
+        for scenes in args.scenes:
+            for mode in ('sequential', 'hedged'):
+                with tempfile.TemporaryDirectory() as tmp:
+                    elapsed, images, stats = asyncio.run(_acquire_from_stubs(PROVIDER_SCENARIOS[scenario], mode, tmp, scenes))
+                    leftovers = [name for name in os.listdir(tmp) if name.endswith('.part')]
+                    if leftovers:
+                        print(f"Warning: part files left behind: {leftovers}", file=sys.stderr)
+                wins = collections.Counter(image['provider'] for image in images if image)
+                wins = ' '.join(f"{provider}:{count}" for provider, count in wins.most_common()) or 'none'
+                missing = sum(image is None for image in images)
+                timeouts = sum(s['timeout'] for s in stats.values())
+                cancelled = sum(s['cancelled'] for s in stats.values())
+                print(f"{scenario:>12} {mode:>10} {scenes:>6} {elapsed:>8.2f} {wins:>28} {missing:>8} {timeouts:>9} {cancelled:>10}")
+
+ASSEMBLY_STAGES = ('xfade', 'xfade.window', 'segment.copy', 'concat')
+
+def bench_assembly(args):
+    """Crossfade stage time and peak memory per assembly mode as the scene count grows."""
+    profile = worker.RENDER_PROFILES[args.profile]
+    fps = profile['fps']
+    intermediate = worker.INTERMEDIATE_FORMATS[worker.INTERMEDIATE_FORMAT]
+    with tempfile.TemporaryDirectory() as tmp:
+        # A few distinct clip lengths, cycled, so the cuts don't all land on the same frames
+        width, height = (1920, 1080) if args.aspect_ratio == '16:9' else (1080, 1920)
+        sources = []
+        for n, seconds in enumerate(args.durations):
+            clip_path = os.path.join(tmp, f"source_{n}" + intermediate['ext'])
+            subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', f"testsrc2=s={width}x{height}:r={fps}",
+                            '-f', 'lavfi', '-i', f"sine=f={220 * (n + 1)}:r={worker.INTERMEDIATE_SAMPLE_RATE}", '-t', str(seconds),
+                            '-force_key_frames', segments.force_key_frames(seconds, fps, worker.CROSSFADE_DURATION),
+                            '-ac', '2'] + intermediate['video'] + intermediate['audio'] + [clip_path], check=True)
+            sources.append((clip_path, seconds))
+
+        print(f"{'scenes':>6} {'mode':>9} {'stage s':>8} {'cpu s':>7} {'peak MB':>8} {'procs':>6} {'total s':>8}")
+        for count in args.scene_counts:
+            clips = [sources[n % len(sources)] for n in range(count)]
+            for mode in args.modes:
+                worker.ASSEMBLY_MODE = mode
+                run_dir = os.path.join(tmp, f"{mode}_{count}")
+                os.makedirs(run_dir)
+                # Records are tagged with the trace span they ran in
+                tracing.start()
+                accounting.start()
+                start = time.perf_counter()
+                video = worker.step4_automatic_assembly(run_dir, [path for path, _ in clips], None, args.aspect_ratio,
+                                                        None, [seconds for _, seconds in clips], profile)
+                elapsed = time.perf_counter() - start
+                report_path, _ = accounting.finish(run_dir)
+                tracing.finish(run_dir)
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    stages = json.load(f)['stages']
+                stage = [totals for name, totals in stages.items() if name in ASSEMBLY_STAGES]
+                if video is None:
+                    print(f"Warning: {mode} assembly of {count} scenes failed", file=sys.stderr)
+                print(f"{count:>6} {mode:>9} {sum(t['wall_s'] for t in stage):>8.2f} {sum(t['cpu_s'] for t in stage):>7.2f} "
+                      f"{max((t['max_rss_mb'] for t in stage), default=0):>8.0f} {sum(t['processes'] for t in stage):>6} {elapsed:>8.2f}")
+                shutil.rmtree(run_dir)
+
+def _ebur128(path):
+    """(integrated LUFS, true peak dBTP) of a file as ffmpeg's ebur128 filter measures them."""
+    result = subprocess.run([worker.FFMPEG_PATH, '-nostats', '-i', path, '-af', 'ebur128=peak=true', '-f', 'null', '-'],
+                            capture_output=True, text=True)
+    summary = result.stderr[result.stderr.rfind('Summary:'):].split()
+    return float(summary[summary.index('I:') + 1]), float(summary[summary.index('Peak:') + 1])
+
+def bench_narration(args):
+    """Narration track build time and loudness vs target, checked with ffmpeg's ebur128, per scene count."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_wav = os.path.join(tmp, 'source.wav')
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-i', args.input, '-ac', '1', '-ar', '24000',
+                        '-c:a', 'pcm_f32le', source_wav], check=True)
+        sr, source = wavfile.read(source_wav)
+        # Unleveled scene voices at uneven levels, as the model leaves them
+        scene_length = int(args.seconds * sr)
+        scene_paths, durations = [], []
+        for n in range(max(args.scene_counts)):
+            start = n * scene_length % max(1, len(source) - scene_length)
+            processed, out_sr = audio_dsp.voice_chain(source[start:start + scene_length] * (0.2 + 0.15 * (n % 5)), sr, level=False)
+            scene_paths.append(os.path.join(tmp, f"scene_{n}.wav"))
+            wavfile.write(scene_paths[-1], out_sr, audio_dsp.to_pcm16(processed))
+            durations.append(len(processed) / out_sr)
+
+        print(f"{'scenes':>6} {'track s':>8} {'build s':>8} {'input':>7} {'gain dB':>8} {'limited':>8} {'ebur128 I':>10} {'TP':>6}")
+        for count in args.scene_counts:
+            track_path = os.path.join(tmp, f"narration_{count}.wav")
+            start = time.perf_counter()
+            samples = narration.timeline([narration.load(path) for path in scene_paths[:count]], durations[:count], worker.CROSSFADE_DURATION)
+            stats = narration.normalize(samples, args.lufs, worker.NARRATION_TRUE_PEAK)
+            narration.write(track_path, samples)
+            elapsed = time.perf_counter() - start
+            measured, peak = _ebur128(track_path)
+            print(f"{count:>6} {len(samples) / audio_dsp.OUTPUT_SAMPLE_RATE:>8.1f} {elapsed:>8.2f} {stats['input_lufs']:>7.1f} "
+                  f"{stats['gain_db']:>+8.1f} {stats['limited_db']:>8.1f} {measured:>10.1f} {peak:>6.1f}")
+
+def bench_single_pass(args):
+    """Single-pass render time and ffmpeg peak memory as the scene count grows, against the estimate."""
+    profile = worker.RENDER_PROFILES[args.profile]
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, 'still.jpg')
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc2=s=1920x1080',
+                        '-frames:v', '1', image_path], check=True)
+        # Scenes arrive with a prepared still, as render_scenes makes them
+        still_path = os.path.join(tmp, 'still.png')
+        worker.prepare_scene_still(image_path, args.aspect_ratio, still_path, profile)
+        audio_path = os.path.join(tmp, 'narration.wav')
+        subprocess.run([worker.FFMPEG_PATH, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=f=440:r=48000', '-t', str(args.seconds),
+                        '-ac', '2', '-c:a', 'pcm_s16le', audio_path], check=True)
+
+        print(f"{'scenes':>6} {'seconds':>8} {'peak MB':>8} {'estimate MB':>12} {'mode':>11}")
+        for count in args.scene_counts:
+            scenes = [{'index': n, 'image': image_path, 'still': still_path, 'audio': audio_path, 'narration': '', 'duration': args.seconds, 'video': None}
+                      for n in range(count)]
+            run_dir = os.path.join(tmp, f"scenes_{count}")
+            os.makedirs(run_dir)
+            tracing.start()
+            accounting.start()
+            start = time.perf_counter()
+            video = worker.render_single_pass(run_dir, scenes, None, args.aspect_ratio, None, profile)
+            elapsed = time.perf_counter() - start
+            _, resources = accounting.finish(run_dir)
+            tracing.finish(run_dir)
+            if video is None:
+                print(f"Warning: single-pass render of {count} scenes failed", file=sys.stderr)
+            estimate = worker.single_pass_memory_mb(count, args.aspect_ratio, profile)
+            print(f"{count:>6} {elapsed:>8.1f} {resources['max_rss_mb']:>8.0f} {estimate:>12.0f} {worker.choose_render_mode(count, args.aspect_ratio, profile):>11}")
+            shutil.rmtree(run_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    tts = subparsers.add_parser('tts', help='per-scene vs batched TTS real-time factor')
+    tts.add_argument('--batch-sizes', type=lambda v: [int(x) for x in v.split(',')], default=[1, 2, 4, 8])
+    tts.add_argument('--lines', type=int, default=8)
+    tts.add_argument('--language', default='en')
+    tts.set_defaults(func=bench_tts)
+
+    dsp = subparsers.add_parser('dsp-parity', help='level parity of the in-process voice chain vs ffmpeg')
+    dsp.add_argument('--input', default=os.path.join(worker.project_root, 'public', 'audio', 'sample.m4a'))
+    dsp.add_argument('--seconds', type=float, default=8.0)
+    dsp.add_argument('--sample-rate', type=int, default=24000)
+    dsp.add_argument('--window-ms', type=int, default=500)
+    dsp.add_argument('--floor-db', type=float, default=-40.0)
+    dsp.set_defaults(func=bench_dsp_parity)
+
+    clips = subparsers.add_parser('intermediates', help='scene clip encode time and size per intermediate format')
+    clips.add_argument('--formats', type=lambda v: v.split(','), default=list(worker.INTERMEDIATE_FORMATS))
+    clips.add_argument('--scenes', type=int, default=2)
+    clips.add_argument('--seconds', type=float, default=5.0)
+    clips.add_argument('--image', help='scene still (default: generated test pattern)')
+    clips.add_argument('--audio', default=os.path.join(worker.project_root, 'public', 'audio', 'sample.m4a'))
+    clips.add_argument('--aspect-ratio', default='16:9')
+    clips.add_argument('--no-subtitles', dest='subtitles', action='store_false', help='for ffmpeg builds without libass')
+    clips.set_defaults(func=bench_intermediates)
+
+    motion_bench = subparsers.add_parser('motion', help='Ken Burns frame time and peak memory per motion engine')
+    motion_bench.add_argument('--engines', type=lambda v: v.split(','), default=['zoompan', 'numpy'])
+    motion_bench.add_argument('--patterns', type=lambda v: [int(x) for x in v.split(',')], default=list(range(6)))
+    motion_bench.add_argument('--seconds', type=float, default=5.0)
+    motion_bench.add_argument('--image', help='scene still (default: generated 4000x3000 test pattern)')
+    motion_bench.add_argument('--audio', default=os.path.join(worker.project_root, 'public', 'audio', 'sample.m4a'))
+    motion_bench.add_argument('--aspect-ratio', default='16:9')
+    motion_bench.set_defaults(func=bench_motion)
+
+    stills = subparsers.add_parser('stills', help='scene still decode + grading time and parity vs ffmpeg')
+    stills.add_argument('--image', help='source image (default: generated test patterns at --sizes)')
+    stills.add_argument('--sizes', type=lambda v: v.split(','), default=['1920x1080', '4000x3000', '8000x6000'])
+    stills.add_argument('--repeat', type=int, default=3)
+    stills.add_argument('--aspect-ratio', default='16:9')
+    stills.set_defaults(func=bench_stills)
+
+    watermark_bench = subparsers.add_parser('watermark', help='watermark detection + inpainting time per image size')
+    watermark_bench.add_argument('--image', help='base image for the fixtures (default: generated test pattern)')
+    watermark_bench.add_argument('--sizes', type=lambda v: v.split(','), default=['1280x720', '1920x1080', '4000x3000', '6000x4000'])
+    watermark_bench.add_argument('--max-width', type=int, default=worker.WATERMARK_DETECT_MAX_WIDTH or 1920,
+                                 help='downscaled detection width for the scaled column')
+    watermark_bench.add_argument('--repeat', type=int, default=3)
+    watermark_bench.set_defaults(func=bench_watermark)
+
+    providers = subparsers.add_parser('providers', help='sequential vs hedged image acquisition against local stub providers')
+    providers.add_argument('--scenarios', type=lambda v: v.split(','), default=list(PROVIDER_SCENARIOS))
+    providers.add_argument('--hedge-delay', type=float, default=worker.IMAGE_HEDGE_DELAY)
+    providers.add_argument('--scenes', type=lambda v: [int(x) for x in v.split(',')], default=[1, 50],
+                           help='scenes acquiring images at once through one fetcher')
+    providers.set_defaults(func=bench_providers)
+
+    assembly = subparsers.add_parser('assembly', help='crossfade stage time and peak memory, xfade chain vs stream-copied segments')
+    assembly.add_argument('--scene-counts', type=lambda v: [int(x) for x in v.split(',')], default=[5, 20, 50])
+    assembly.add_argument('--modes', type=lambda v: v.split(','), default=['xfade', 'segments'])
+    assembly.add_argument('--durations', type=lambda v: [float(x) for x in v.split(',')], default=[3.0, 4.2, 5.37],
+                          help='clip lengths in seconds, cycled over the scenes')
+    assembly.add_argument('--profile', default='draft', choices=list(worker.RENDER_PROFILES))
+    assembly.add_argument('--aspect-ratio', default='16:9')
+    assembly.set_defaults(func=bench_assembly)
+
+    narration_bench = subparsers.add_parser('narration', help='narration track build time and R128 loudness vs ffmpeg ebur128')
+    narration_bench.add_argument('--scene-counts', type=lambda v: [int(x) for x in v.split(',')], default=[5, 20, 50])
+    narration_bench.add_argument('--seconds', type=float, default=5.0, help='narration per scene')
+    narration_bench.add_argument('--lufs', type=float, default=worker.NARRATION_LOUDNESS)
+    narration_bench.add_argument('--input', default=os.path.join(worker.project_root, 'public', 'audio', 'sample.m4a'))
+    narration_bench.set_defaults(func=bench_narration)
+
+    single_pass = subparsers.add_parser('single-pass', help='single-pass render time and peak memory per scene count')
+    single_pass.add_argument('--scene-counts', type=lambda v: [int(x) for x in v.split(',')], default=[4, 8, 16, 24])
+    single_pass.add_argument('--profile', default='final', choices=list(worker.RENDER_PROFILES))
+    single_pass.add_argument('--seconds', type=float, default=3.0, help='narration per scene')
+    single_pass.add_argument('--aspect-ratio', default='16:9')
+    single_pass.set_defaults(func=bench_single_pass)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
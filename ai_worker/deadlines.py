@@ -0,0 +1,269 @@
+"""Per-stage and per-story deadlines, with cooperative cancellation.
+
+A story render has an overall deadline (STORY_DEADLINE, kept under ProcessStoryJob's
+one hour timeout) and every stage a deadline of its own (STAGE_DEADLINES; encodes get
+DEADLINE_PER_MEDIA_SECOND more for every second of output). When one is missed, or
+the worker receives SIGTERM/SIGINT, the story is cancelled:
+
+- every subprocess in flight is killed together with its process group (commands
+  run in their own session, so nothing they spawned is left behind),
+- the render task is cancelled, which cancels pending HTTP requests,
+- stages that check in (before each command, between TTS scenes) raise Cancelled.
+
+render_story then returns a partial result naming the stage that was running.
+
+Model inference on a worker thread cannot be interrupted; it is abandoned and left to
+finish on its own, and drain() waits for it before the daemon takes its next job.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import tracing
+
+STORY_DEADLINE = float(os.getenv('WORKER_STORY_DEADLINE', '3300'))  # 0 disables it
+
+# Seconds a single run of each stage may take; WORKER_STAGE_DEADLINES overrides them
+# with a JSON object, e.g. {"final.encode": 1200}
+STAGE_DEADLINES = {
+    'image.acquire': 120,
+    'watermark.clean': 60,
+    'still.prepare': 60,
+    'tts.generate': 300,        # Per scene in the batch
+    'scene.encode': 120,
+    'xfade': 180,
+    'xfade.window': 60,
+    'segment.copy': 60,
+    'concat': 60,
+    'final.encode': 300,
+    'single_pass.encode': 300,
+}
+STAGE_DEADLINES.update(json.loads(os.getenv('WORKER_STAGE_DEADLINES', '{}')))
+DEFAULT_STAGE_DEADLINE = 120
+# Extra seconds an encode gets per second of output it writes
+DEADLINE_PER_MEDIA_SECOND = float(os.getenv('WORKER_DEADLINE_PER_MEDIA_SECOND', '8'))
+
+# Seconds between SIGTERM and SIGKILL for a cancelled process group (ffmpeg uses
+# them to flush its encoders, for an output that is discarded anyway)
+KILL_GRACE = 2
+
+class Cancelled(BaseException):
+    """Raised by stages once the story has been cancelled.
+
+    A BaseException, like asyncio.CancelledError, so `except Exception` fallbacks in
+    the stages don't swallow it and carry on rendering.
+    """
+
+_story = None
+_lock = threading.Lock()
+_abandoned = []
+_received_signal = None
+
+def start(task, deadline=STORY_DEADLINE):
+    """Starts the deadlines for a story render running as task (on the running loop)."""
+    global _story, _received_signal
+    story = {
+        'started': time.monotonic(),
+        'deadline': deadline or None,
+        'task': task,
+        'loop': asyncio.get_running_loop(),
+        'cancelled': None,
+        'processes': set(),
+        'timer': None,
+    }
+    if story['deadline']:
+        story['timer'] = threading.Timer(story['deadline'], cancel, ('deadline',), {'detail': f"story deadline of {round(story['deadline'], 1):g}s"})
+        story['timer'].daemon = True
+        story['timer'].start()
+    with _lock:
+        _story = story
+        _received_signal = None
+
+def finish():
+    """Stops the story's deadlines. Returns the cancellation record, or None if it ran to the end."""
+    global _story
+    with _lock:
+        story, _story = _story, None
+    if story is None:
+        return None
+    if story['timer'] is not None:
+        story['timer'].cancel()
+    return story['cancelled']
+
+def remaining():
+    """Seconds left before the story deadline (None without one)."""
+    story = _story
+    if story is None or not story['deadline']:
+        return None
+    return max(0.0, story['deadline'] - (time.monotonic() - story['started']))
+
+def stage_timeout(stage, media_seconds=None):
+    """Seconds one run of stage may take: its own deadline, capped by the story's."""
+    timeout = STAGE_DEADLINES.get(stage, DEFAULT_STAGE_DEADLINE)
+    if media_seconds:
+        timeout += DEADLINE_PER_MEDIA_SECOND * media_seconds
+    return _capped(timeout)
+
+def _capped(timeout):
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
+
+def cancelled():
+    """The cancellation record ({'reason', 'stage', 'scene', 'detail', ...}) or None."""
+    story = _story
+    return story['cancelled'] if story is not None else None
+
+def check():
+    """Raises Cancelled if the story has been cancelled; a cooperative cancellation point."""
+    record = cancelled()
+    if record is not None:
+        raise Cancelled(record['detail'])
+
+def _kill_group(process, sig):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass  # Already exited
+
+def _kill_stragglers(story, processes):
+    with _lock:
+        alive = [process for process in processes if process in story['processes']]
+    for process in alive:
+        _kill_group(process, signal.SIGKILL)
+
+def cancel(reason, stage=None, scene=None, detail=None):
+    """Cancels the running story (the first cancellation wins). Safe from any thread."""
+    with _lock:
+        story = _story
+        if story is None or story['cancelled'] is not None:
+            return
+        in_flight = tracing.open_stages()
+        if stage is None and in_flight:
+            stage, scene = in_flight[0]  # The longest-running stage
+        story['cancelled'] = {
+            'reason': reason,
+            'stage': stage,
+            'scene': scene,
+            'detail': detail or reason,
+            'elapsed_s': round(time.monotonic() - story['started'], 1),
+            'in_flight': [{'stage': name, 'scene': index} for name, index in in_flight],
+        }
+        processes = list(story['processes'])
+    print(f"Warning: Cancelling story at stage {stage or 'unknown'}"
+          f"{f' (scene {scene})' if scene is not None else ''}: {detail or reason}", file=sys.stderr)
+
+    for process in processes:
+        _kill_group(process, signal.SIGTERM)
+    if processes:
+        killer = threading.Timer(KILL_GRACE, _kill_stragglers, (story, processes))
+        killer.daemon = True
+        killer.start()
+    if not story['loop'].is_closed():
+        story['loop'].call_soon_threadsafe(story['task'].cancel)
+
+def _expire(stage, scene, timeout):
+    cancel('deadline', stage, scene, f"{stage or 'command'} exceeded its {round(timeout, 1):g}s deadline")
+
+@contextlib.contextmanager
+def process(command, duration=None, **kwargs):
+    """Popen for command in a new session, killed with its group on cancellation. Yields the process.
+
+    The command runs under the deadline of the stage it is started in (duration, the
+    output length in seconds, extends it for encodes). Raises Cancelled on the way out
+    if the story was cancelled meanwhile; the caller must still reap the process.
+    """
+    check()
+    proc = subprocess.Popen(command, start_new_session=True, **kwargs)
+    story = _story
+    if story is None:
+        yield proc
+        return
+
+    with _lock:
+        story['processes'].add(proc)
+        killed = story['cancelled'] is not None
+    if killed:
+        _kill_group(proc, signal.SIGKILL)  # Cancelled while it was starting
+    stage, scene = tracing.current_stage()
+    timeout = stage_timeout(stage, duration)
+    timer = threading.Timer(timeout, _expire, (stage, scene, timeout))
+    timer.daemon = True
+    timer.start()
+    try:
+        yield proc
+    finally:
+        timer.cancel()
+        with _lock:
+            story['processes'].discard(proc)
+    if story['cancelled'] is not None:
+        raise Cancelled(story['cancelled']['detail'])
+
+async def bounded(awaitable, stage, scene=None, timeout=None):
+    """Awaits awaitable under stage's deadline (or timeout), cancelling the story if it is missed."""
+    timeout = stage_timeout(stage) if timeout is None else _capped(timeout)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        cancel('deadline', stage, scene, f"{stage} exceeded its {round(timeout, 1):g}s deadline")
+        raise Cancelled(f"{stage} exceeded its {round(timeout, 1):g}s deadline") from None
+
+def abandon(executor):
+    """Shuts an executor down without waiting for work that can't be interrupted."""
+    executor.shutdown(wait=False, cancel_futures=True)
+    _abandoned.append(executor)
+
+def abandoned():
+    """True if abandoned work may still be running."""
+    return bool(_abandoned)
+
+def drain():
+    """Waits for abandoned work (e.g. inference that outlived a cancelled story) to finish."""
+    while _abandoned:
+        print("DEBUG: Waiting for work abandoned by a cancelled story", file=sys.stderr)
+        _abandoned.pop().shutdown(wait=True)
+
+def received_signal():
+    """The signal that cancelled the last story, if any."""
+    return _received_signal
+
+def _on_signal(signum, frame, action=cancel):
+    global _received_signal
+    if _received_signal is not None:
+        # Asked again while winding down: stop right away
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+        return
+    _received_signal = signum
+    # cancel() takes locks the interrupted code may hold, so it runs on its own thread
+    threading.Thread(target=action, args=('signal',), kwargs={'detail': f"received {signal.Signals(signum).name}"}, daemon=True).start()
+
+@contextlib.contextmanager
+def signals_cancel(signums=(signal.SIGTERM, signal.SIGINT), action=cancel):
+    """While open, SIGTERM/SIGINT cancel the story instead of killing the worker.
+
+    action is called like cancel() (reason, detail=...); a client forwarding the story
+    to the render daemon passes one that asks the daemon to cancel it.
+
+    Plain signal handlers rather than loop.add_signal_handler: those only run once the
+    event loop gets control, and stages like the final encode block it. Only possible
+    on the main thread; elsewhere this does nothing.
+    """
+    handler = functools.partial(_on_signal, action=action)
+    previous = {}
+    try:
+        for signum in signums:
+            previous[signum] = signal.signal(signum, handler)
+    except ValueError:
+        pass  # Not the main thread
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
@@ -0,0 +1,177 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+# Shared cache root (storage/app is git-ignored)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+CACHE_ROOT = os.getenv('WORKER_CACHE_DIR', os.path.join(project_root, 'storage', 'app', 'worker_cache'))
+
+def cache_key(*parts):
+    """Builds a stable cache key from JSON-serialisable parts."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def file_digest(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DiskCache:
+    """Persistent, size-bounded, content-addressed file cache with LRU eviction.
+
+    Blobs are stored once per content hash under blobs/ and written atomically
+    (temp file + rename). An SQLite index in WAL mode maps keys to blobs and
+    tracks last access, so several worker processes can share one cache safely.
+    """
+
+    def __init__(self, namespace, max_bytes, root=None):
+        self.dir = os.path.join(root or CACHE_ROOT, namespace)
+        self.blob_dir = os.path.join(self.dir, 'blobs')
+        self.db_path = os.path.join(self.dir, 'index.sqlite3')
+        self.max_bytes = max_bytes
+        os.makedirs(self.blob_dir, exist_ok=True)
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL, meta TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries(digest)")
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        db = self._connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _lookup(self, key, max_age=None):
+        """Returns the blob path for a key (touching its LRU timestamp), or None on a miss."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT digest, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            digest, created = row
+            path = self._blob_path(digest)
+            if (max_age is not None and now - created > max_age) or not os.path.exists(path):
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return path
+
+    def copy_to(self, key, dest_path, max_age=None):
+        """Copies a cached blob to dest_path. Returns False on a miss."""
+        path = self._lookup(key, max_age)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest_path)
+            return True
+        except FileNotFoundError:
+            # Evicted by another process between lookup and copy
+            return False
+
+    def get_bytes(self, key, max_age=None):
+        path = self._lookup(key, max_age)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_json(self, key, max_age=None):
+        data = self.get_bytes(key, max_age)
+        return json.loads(data) if data is not None else None
+
+    def put_file(self, key, src_path, meta=None):
+        """Stores a copy of src_path under key and evicts old entries if over budget."""
+        digest = file_digest(src_path)
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix='.tmp')
+            os.close(fd)
+            try:
+                shutil.copyfile(src_path, temp_path)
+                os.replace(temp_path, blob_path)
+            finally:
+                if os.path.exists(temp_path): os.remove(temp_path)
+        self._index(key, digest, os.path.getsize(blob_path), meta)
+        return blob_path
+
+    def put_bytes(self, key, data, meta=None):
+        fd, temp_path = tempfile.mkstemp(dir=self.dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self.put_file(key, temp_path, meta)
+        finally:
+            os.remove(temp_path)
+
+    def put_json(self, key, obj, meta=None):
+        return self.put_bytes(key, json.dumps(obj).encode('utf-8'), meta)
+
+    def _index(self, key, digest, size, meta):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, digest, size, created, last_access, meta) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, size, now, now, json.dumps(meta) if meta is not None else None),
+            )
+        self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the blobs fit in max_bytes."""
+        db = self._connect()
+        try:
+            # BEGIN IMMEDIATE serialises eviction across processes
+            db.isolation_level = None
+            db.execute("BEGIN IMMEDIATE")
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()[0]
+            if total <= self.max_bytes:
+                db.execute("COMMIT")
+                return
+
+            removed_blobs = []
+            for key, digest, size in db.execute("SELECT key, digest, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                if db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                    removed_blobs.append(digest)
+                    total -= size
+            db.execute("COMMIT")
+        except Exception:
+            if db.in_transaction: db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+        for digest in removed_blobs:
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,92 @@
+"""Per-scene render manifest kept in a story's output_dir.
+
+For every scene and stage (image, audio, still, clip) it records a hash of the
+stage's inputs and the artifact it produced, so a rerun of the same story (after an
+edit, or after the job died part way) redoes only the stages whose inputs changed
+or whose artifacts are gone.
+"""
+import json
+import os
+import tempfile
+import threading
+
+from disk_cache import file_digest
+
+MANIFEST_NAME = 'render_manifest.json'
+MANIFEST_VERSION = 1
+
+class RenderManifest:
+    """Stage records: scenes[index][stage] = {'inputs', 'artifact', 'size', 'mtime_ns', 'digest'}.
+
+    Artifacts are stored relative to output_dir and only count as reusable while
+    their size and mtime are the ones recorded. Every record() is written through
+    atomically, so progress survives a crash.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.scenes = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.scenes = data.get('scenes', {})
+        except (OSError, ValueError):
+            pass  # No manifest yet (or unreadable): everything is rebuilt
+
+    def _entry(self, scene_index, stage):
+        return self.scenes.get(str(scene_index), {}).get(stage)
+
+    def _current(self, entry, artifact_path):
+        """True if the entry describes artifact_path as it is on disk now."""
+        if entry is None or entry['artifact'] != os.path.relpath(artifact_path, self.output_dir):
+            return False
+        try:
+            stat = os.stat(artifact_path)
+        except OSError:
+            return False
+        return stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def reusable(self, scene_index, stage, inputs, artifact_path):
+        """True if the stage already produced artifact_path from these inputs."""
+        with self.lock:
+            entry = self._entry(scene_index, stage)
+            return self._current(entry, artifact_path) and entry['inputs'] == inputs
+
+    def record(self, scene_index, stage, inputs, artifact_path):
+        """Records that the stage produced artifact_path from inputs."""
+        stat = os.stat(artifact_path)
+        with self.lock:
+            self.scenes.setdefault(str(scene_index), {})[stage] = {
+                'inputs': inputs,
+                'artifact': os.path.relpath(artifact_path, self.output_dir),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'digest': None,
+            }
+            self._save()
+
+    def digest(self, scene_index, stage, artifact_path):
+        """Content hash of a stage's artifact, memoized in the manifest while it is unchanged."""
+        with self.lock:
+            entry = self._entry(scene_index, stage)
+            if self._current(entry, artifact_path) and entry['digest']:
+                return entry['digest']
+        digest = file_digest(artifact_path)
+        with self.lock:
+            entry = self._entry(scene_index, stage)
+            if self._current(entry, artifact_path):
+                entry['digest'] = digest
+                self._save()
+        return digest
+
+    def _save(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'scenes': self.scenes}, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
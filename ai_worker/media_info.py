@@ -0,0 +1,200 @@
+"""In-process media metadata, replacing an ffprobe launch per lookup.
+
+Audio the worker synthesizes registers its exact length (sample count / rate) with
+record_duration() when it is written. Anything else is measured by reading just the
+container header (WAV, MP4/MOV, Matroska/WebM). Results are memoized by path, size
+and mtime, so a file rewritten in place is measured again.
+
+image_size() reads JPEG/PNG dimensions from the first bytes of a (partial) download.
+"""
+import os
+import struct
+import threading
+
+_durations = {}
+_lock = threading.Lock()
+
+def _memo_key(path):
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_size, stat.st_mtime_ns
+
+def record_duration(path, seconds):
+    """Registers the known duration of a file the worker just wrote."""
+    key = _memo_key(path)
+    with _lock:
+        _durations[key[0]] = (key, float(seconds))
+
+def duration(path):
+    """Duration of a media file in seconds. Raises ValueError if it can't be determined."""
+    key = _memo_key(path)
+    with _lock:
+        cached = _durations.get(key[0])
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        magic = f.read(12)
+        f.seek(0)
+        if magic[:4] == b'RIFF' and magic[8:12] == b'WAVE':
+            seconds = _wav_duration(f)
+        elif magic[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+            seconds = _mp4_duration(f)
+        elif magic[:4] == b'\x1a\x45\xdf\xa3':
+            seconds = _matroska_duration(f)
+        else:
+            raise ValueError(f"unsupported media container: {path}")
+
+    with _lock:
+        _durations[key[0]] = (key, seconds)
+    return seconds
+
+def _wav_duration(f):
+    f.seek(12)
+    block_align = sample_rate = None
+    file_size = os.fstat(f.fileno()).st_size
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file has no data chunk")
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'fmt ':
+            _, _, sample_rate, _, block_align = struct.unpack('<HHIIH', f.read(14))
+            f.seek(size - 14 + (size & 1), os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if not sample_rate or not block_align:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streamed writers leave the size unset (0 or 0xFFFFFFFF); the data runs to EOF
+            available = file_size - f.tell()
+            if size in (0, 0xFFFFFFFF) or size > available:
+                size = available
+            return (size // block_align) / sample_rate
+        else:
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+def _mp4_duration(f):
+    """Movie duration from moov/mvhd, walking top-level boxes (moov may sit after mdat)."""
+    file_size = os.fstat(f.fileno()).st_size
+    end = file_size
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - start
+        if size < 8:
+            break
+        if box_type == b'moov':
+            # Descend: mvhd is a direct child of moov
+            end = start + size
+            continue
+        if box_type == b'mvhd':
+            version = f.read(4)[0]
+            if version == 1:
+                _, _, timescale, length = struct.unpack('>QQIQ', f.read(28))
+            else:
+                _, _, timescale, length = struct.unpack('>IIII', f.read(16))
+            if not timescale:
+                break
+            return length / timescale
+        f.seek(start + size)
+    raise ValueError("MP4 file has no movie header")
+
+def _ebml_vint(f, strip_marker=True):
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not value & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError("invalid EBML variable-length integer")
+    if strip_marker:
+        value &= mask - 1
+    for byte in f.read(length - 1):
+        value = (value << 8) | byte
+    # All-ones sizes mean "unknown" (live-streamed elements)
+    unknown = strip_marker and value == (1 << (7 * length)) - 1
+    return value, unknown
+
+# Matroska element IDs (with their length markers, as they appear in the file)
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMESTAMP_SCALE = 0x2AD7B1
+_DURATION = 0x4489
+_CLUSTER = 0x1F43B675
+
+def _matroska_duration(f):
+    """Duration from Segment/Info (Duration x TimestampScale ns)."""
+    end = os.fstat(f.fileno()).st_size
+    try:
+        while f.tell() < end:
+            element_id, _ = _ebml_vint(f, strip_marker=False)
+            size, unknown = _ebml_vint(f)
+            if element_id == _SEGMENT:
+                # Walk the segment's children instead of skipping it
+                continue
+            if element_id == _CLUSTER:
+                break
+            if element_id == _INFO:
+                info_end = f.tell() + size
+                scale, length = 1000000, None
+                while f.tell() < info_end:
+                    child_id, _ = _ebml_vint(f, strip_marker=False)
+                    child_size, _ = _ebml_vint(f)
+                    data = f.read(child_size)
+                    if child_id == _TIMESTAMP_SCALE:
+                        scale = int.from_bytes(data, 'big')
+                    elif child_id == _DURATION:
+                        length = struct.unpack('>f' if child_size == 4 else '>d', data)[0]
+                if length is None:
+                    break
+                return length * scale / 1e9
+            if unknown:
+                break
+            f.seek(size, os.SEEK_CUR)
+    except EOFError:
+        pass
+    raise ValueError("Matroska file has no segment duration")
+
+def image_size(data):
+    """(width, height) of a JPEG or PNG from its leading bytes.
+
+    Returns None while more bytes are needed; raises ValueError if data is not a
+    JPEG/PNG or the header is malformed.
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) < 24:
+            return None
+        if data[12:16] != b'IHDR':
+            raise ValueError("PNG without IHDR chunk")
+        return struct.unpack('>II', data[16:24])
+    if not data.startswith(b'\xff\xd8'):
+        if len(data) < 8 and (b'\x89PNG\r\n\x1a\n'.startswith(data) or b'\xff\xd8'.startswith(data)):
+            return None
+        raise ValueError("not a JPEG or PNG")
+
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            raise ValueError("malformed JPEG marker")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1  # Fill byte
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            offset += 2  # Standalone markers carry no length
+            continue
+        if marker == 0xDA:
+            raise ValueError("JPEG scan data before frame header")
+        # SOF0-SOF15 (C4 = DHT, C8 = JPG, CC = DAC are not frame headers)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
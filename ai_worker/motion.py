@@ -0,0 +1,182 @@
+"""Ken Burns motion engine: renders scene frames from a still with per-frame affine warps.
+
+Replaces ffmpeg's zoompan for scene clips. The still is loaded, resized and converted
+to YUV 4:2:0 once; each output frame is then one cv2.warpAffine per plane at output
+resolution, following the same zoom/pan trajectories as the zoompan expressions in
+worker.scene_video_filter. Frames are yuv420p, ready to pipe into the encoder.
+"""
+import math
+
+import cv2
+import numpy as np
+from PIL import Image
+from scipy.interpolate import CubicSpline
+
+# The zoompan trajectories are defined on this 4K base canvas
+BASE_SIZES = {'16:9': (3840, 2160), '9:16': (2160, 3840)}
+
+# Mirrors of the six zoompan motion patterns: (zoom step per frame or None for the
+# zoom-out pattern, max zoom, horizontal motion, vertical anchor)
+MOTION_PATTERNS = [
+    (0.0015, 1.35, 'center', 0.5),   # Pattern 0: Fast zoom in from center
+    (None, 1.35, 'center', 0.5),     # Pattern 1: Fast zoom out from center
+    (0.0008, 1.20, 'pan_lr', 0.5),   # Pattern 2: Pan left to right with zoom
+    (0.0008, 1.20, 'pan_rl', 0.5),   # Pattern 3: Pan right to left with zoom
+    (0.0012, 1.3, 'center', 0.25),   # Pattern 4: Zoom in on upper third
+    (0.0012, 1.3, 'center', 0.75),   # Pattern 5: Zoom in on lower third
+]
+
+def trajectory(pattern_index, total_frames, base_w, base_h, frame_step=1.0):
+    """Per-frame (zoom, x, y) crop windows on the base canvas, as zoompan evaluates them.
+
+    Returns three float arrays of length total_frames; the crop is base/zoom in size
+    with its top-left corner at (x, y), clamped inside the canvas like zoompan does.
+    frame_step scales the per-frame zoom speed (2.0 keeps the timing at half frame rate).
+    """
+    step, max_zoom, horizontal, anchor = MOTION_PATTERNS[pattern_index % len(MOTION_PATTERNS)]
+    on = np.arange(total_frames, dtype=np.float64)
+    if step is None:
+        zoom = np.maximum(max_zoom - 0.0015 * frame_step * on, 1.0)
+    else:
+        # zoom starts at 1 and the expression adds one step per output frame
+        zoom = np.minimum(1.0 + step * frame_step * (on + 1), max_zoom)
+    zoom = np.clip(zoom, 1.0, 10.0)
+
+    crop_w, crop_h = base_w / zoom, base_h / zoom
+    if horizontal == 'pan_lr':
+        x = on / max(total_frames, 1) * base_w / 3
+    elif horizontal == 'pan_rl':
+        x = base_w / 3 - on / max(total_frames, 1) * base_w / 3
+    else:
+        x = base_w / 2 - crop_w / 2
+    y = base_h * anchor - crop_h / 2
+
+    x = np.clip(x, 0, np.maximum(base_w - crop_w, 0))
+    y = np.clip(y, 0, np.maximum(base_h - crop_h, 0))
+    return zoom, x, y
+
+MAX_ZOOM = max(pattern[1] for pattern in MOTION_PATTERNS)
+
+def stage_size(width, height, aspect_ratio):
+    """Still size the warps sample from: enough pixels for the tightest crop of any pattern, never above the base."""
+    base_w, base_h = BASE_SIZES.get(aspect_ratio, BASE_SIZES['9:16'])
+    scale = min(1.0, MAX_ZOOM * max(width / base_w, height / base_h))
+    # Even dimensions so the still converts to 4:2:0 without losing a row or column
+    return 2 * int(math.ceil(base_w * scale / 2)), 2 * int(math.ceil(base_h * scale / 2))
+
+def decode_still(image_path, target_w, target_h):
+    """Decodes an image for a target_w x target_h cover crop, using libjpeg's reduced-size
+    decode (1/2, 1/4, 1/8) when the source is large enough to stay above the target."""
+    flags = cv2.IMREAD_COLOR
+    try:
+        with Image.open(image_path) as header:
+            source_w, source_h = header.size
+        for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if source_w // factor >= target_w and source_h // factor >= target_h:
+                flags = reduced
+                break
+    except Exception:
+        pass  # Not readable by PIL; let OpenCV decode it at full size
+    image = cv2.imread(image_path, flags)
+    if image is None:
+        raise ValueError(f"could not read image {image_path}")
+    return image
+
+def cover_resize(image, target_w, target_h):
+    """Scales to cover target_w x target_h and center-crops (scale=increase + crop).
+
+    The source is cropped to the target aspect first so only kept pixels are resampled.
+    """
+    h, w = image.shape[:2]
+    scale = max(target_w / w, target_h / h)
+    crop_w, crop_h = min(w, int(round(target_w / scale))), min(h, int(round(target_h / scale)))
+    left, top = (w - crop_w) // 2, (h - crop_h) // 2
+    cropped = image[top:top + crop_h, left:left + crop_w]
+    # Area averaging only pays off (and only avoids aliasing) for strong downscales
+    interpolation = cv2.INTER_AREA if scale < 0.5 else cv2.INTER_CUBIC
+    return cv2.resize(cropped, (target_w, target_h), interpolation=interpolation)
+
+def _eq_table(contrast, brightness=0.0):
+    """ffmpeg eq's fixed-point (gamma 1) path: ((v * contrast) >> 12) + brightness offset."""
+    gain = int(contrast * 256 * 16)
+    # eq keeps brightness as a float, so 0.01 * 100 truncates to 0
+    offset = (int(100.0 * float(np.float32(brightness)) + 100.0) * 511) // 200 - 128 - gain // 32
+    return np.clip(((np.arange(256) * gain) >> 12) + offset, 0, 255).astype(np.uint8)
+
+def _full_range(table, black, span):
+    """Re-expresses a lookup table on limited-range (black..black+span) values for full-range input."""
+    levels = np.arange(256, dtype=np.float64)
+    limited = np.round(black + levels * span / 255.0).astype(np.int64)
+    return np.clip(np.round((table[limited] - black) * 255.0 / span), 0, 255).astype(np.uint8)
+
+def _grade_tables():
+    """Lookup tables for worker.COLOR_GRADING's eq and curves steps."""
+    # eq=contrast=1.08:brightness=0.01 on luma, saturation=1.15 on chroma. ffmpeg runs eq
+    # on limited-range yuv420p, OpenCV's YCrCb is full range
+    luma = _full_range(_eq_table(1.08, 0.01).astype(np.float64), 16, 219)
+    chroma = _full_range(_eq_table(1.15).astype(np.float64), 16, 224)
+    # curves=preset=lighter: natural cubic spline through 0/0 0.4/0.5 1/1 on all channels
+    levels = np.arange(256, dtype=np.float64) / 255.0
+    lighter = np.clip(CubicSpline([0.0, 0.4, 1.0], [0.0, 0.5, 1.0], bc_type='natural')(levels), 0.0, 1.0) * 255.0
+    return luma, chroma, np.round(lighter).astype(np.uint8)
+
+GRADE_LUMA, GRADE_CHROMA, GRADE_CURVES = _grade_tables()
+UNSHARP_NUMERATORS = np.array([4, 2, 2], dtype=np.int16)
+
+def grade(image):
+    """Colour grades a BGR still the way worker.COLOR_GRADING does in ffmpeg.
+
+    eq and curves become lookup tables; unsharp=5:5:0.8:5:5:0.4 becomes a 5x5 box
+    blur unsharp mask on luma (0.8) and chroma (0.4).
+    """
+    ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+    ycrcb = cv2.LUT(ycrcb, np.stack([GRADE_LUMA, GRADE_CHROMA, GRADE_CHROMA], axis=1).reshape(256, 1, 3))
+    bgr = cv2.LUT(cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR), GRADE_CURVES)
+
+    ycrcb = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)
+    blurred = cv2.blur(ycrcb, (5, 5), borderType=cv2.BORDER_REPLICATE)
+    # unsharp's fixed-point arithmetic floors the correction: amounts 0.8 and 0.4 as 4/5 and 2/5
+    correction = np.floor_divide(cv2.subtract(ycrcb, blurred, dtype=cv2.CV_16S) * UNSHARP_NUMERATORS, 5)
+    sharpened = cv2.add(ycrcb, correction, dtype=cv2.CV_16S)
+    return cv2.cvtColor(np.clip(sharpened, 0, 255).astype(np.uint8), cv2.COLOR_YCrCb2BGR)
+
+def prepare_still(image_path, width, height, aspect_ratio='16:9'):
+    """Decodes, cover-crops to the motion stage size and grades a scene still (BGR uint8)."""
+    stage_w, stage_h = stage_size(width, height, aspect_ratio)
+    return grade(cover_resize(decode_still(image_path, stage_w, stage_h), stage_w, stage_h))
+
+def i420_planes(buffer, width, height):
+    """Views of the Y, U and V planes inside a contiguous (height * 3 / 2, width) I420 buffer."""
+    chroma = (height // 2) * (width // 2)
+    flat = buffer.reshape(-1)
+    y = flat[:width * height].reshape(height, width)
+    u = flat[width * height:width * height + chroma].reshape(height // 2, width // 2)
+    v = flat[width * height + chroma:].reshape(height // 2, width // 2)
+    return y, u, v
+
+def render_frames(still, total_frames, width, height, aspect_ratio='16:9', pattern_index=0, frame_step=1.0):
+    """Yields total_frames yuv420p frames of width x height following the pattern's trajectory.
+
+    still is a BGR image at the motion stage size (even dimensions). The yielded buffer is
+    reused between frames, so consume (write) each one before advancing.
+    """
+    base_w, base_h = BASE_SIZES.get(aspect_ratio, BASE_SIZES['9:16'])
+    stage_h, stage_w = still.shape[:2]
+    sx, sy = stage_w / base_w, stage_h / base_h
+    zoom, x, y = trajectory(pattern_index, total_frames, base_w, base_h, frame_step)
+    source = i420_planes(cv2.cvtColor(still, cv2.COLOR_BGR2YUV_I420), stage_w, stage_h)
+
+    frame = np.empty((height * 3 // 2, width), dtype=np.uint8)
+    planes = i420_planes(frame, width, height)
+    for k in range(total_frames):
+        # Output pixel centre (u + 0.5, v + 0.5) maps to base (x + (u + 0.5) * crop_w / width, ...)
+        ax = base_w / zoom[k] / width * sx
+        ay = base_h / zoom[k] / height * sy
+        for plane, (src, dst) in enumerate(zip(source, planes)):
+            # Chroma planes are half size in both directions, with the same scale factors
+            div = 1 if plane == 0 else 2
+            matrix = np.array([[ax, 0.0, x[k] * sx / div + 0.5 * ax - 0.5],
+                               [0.0, ay, y[k] * sy / div + 0.5 * ay - 0.5]])
+            cv2.warpAffine(src, matrix, (dst.shape[1], dst.shape[0]), dst=dst,
+                           flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+        yield frame
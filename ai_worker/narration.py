@@ -0,0 +1,86 @@
+"""The story's narration track, mixed and loudness-normalized in memory.
+
+Scene narration is laid out on the assembled timeline: scene k starts at
+o_k = sum(d_j - X for j < k), X being the crossfade, the same offsets as the video
+crossfades. Each scene is padded with silence to its scene duration, and neighbours
+overlap by X with linear fades (acrossfade's default curve). The whole track is
+then normalized once to an EBU R128 integrated loudness, with a look-ahead limiter
+keeping it under a true-peak ceiling, and written as one PCM track for the final mux.
+
+Scene audio for the track is synthesized without per-scene leveling (see
+audio_dsp.voice_chain), so this is the only loudness pass the narration gets.
+"""
+import math
+
+import numpy as np
+from scipy.io import wavfile
+
+import audio_dsp
+
+def load(path, sample_rate=audio_dsp.OUTPUT_SAMPLE_RATE):
+    """Reads a scene's WAV as float32 stereo at sample_rate."""
+    rate, samples = wavfile.read(path)
+    if samples.dtype.kind in 'iu':
+        scale = float(np.iinfo(samples.dtype).max) + 1
+        samples = samples.astype(np.float32) / scale
+    if samples.ndim == 1:
+        samples = np.stack([samples, samples], axis=1) * audio_dsp.MONO_TO_STEREO_GAIN
+    samples = samples[:, :2].astype(np.float32)
+    if rate != sample_rate:
+        samples = audio_dsp.resample(samples, rate, sample_rate).astype(np.float32)
+    return samples
+
+def timeline(tracks, durations, crossfade, sample_rate=audio_dsp.OUTPUT_SAMPLE_RATE):
+    """Lays out scene tracks (float stereo arrays) with crossfades. Returns float32 (n, 2)."""
+    fade = int(round(crossfade * sample_rate))
+    fade_in = ((np.arange(fade) + 0.5) / fade).astype(np.float32)[:, None]
+    starts, offset = [], 0.0
+    for duration in durations:
+        starts.append(int(round(offset * sample_rate)))
+        offset += duration - crossfade
+    lengths = [int(round(duration * sample_rate)) for duration in durations]
+    out = np.zeros((starts[-1] + lengths[-1], 2), dtype=np.float32) if durations else np.zeros((0, 2), dtype=np.float32)
+
+    for k, (track, start, length) in enumerate(zip(tracks, starts, lengths)):
+        scene = np.zeros((length, 2), dtype=np.float32)
+        scene[:min(length, len(track))] = track[:length]
+        if k > 0 and length >= fade:
+            scene[:fade] *= fade_in
+        if k < len(durations) - 1 and length >= fade:
+            scene[-fade:] *= fade_in[::-1]
+        out[start:start + length] += scene
+    return out
+
+def normalize(samples, target_lufs, true_peak_db, sample_rate=audio_dsp.OUTPUT_SAMPLE_RATE, passes=3):
+    """Normalizes samples in place to target_lufs, limited to true_peak_db. Returns the measurements.
+
+    A gain brings the integrated loudness to the target and peaks it pushes over the
+    ceiling are limited; limiting lowers the loudness a little, so the gain is topped
+    up (at most passes times) until it is within 0.1 LU. Silent tracks are left alone.
+    """
+    measured = audio_dsp.integrated_loudness(samples, sample_rate)
+    stats = {'input_lufs': round(measured, 2) if math.isfinite(measured) else None, 'gain_db': 0.0, 'limited_db': 0.0}
+    if not math.isfinite(measured):
+        return stats
+    ceiling = 10 ** (true_peak_db / 20)
+    # Analysed once: gains are smooth enough that the envelope scales along with them
+    peaks = audio_dsp.peak_envelope(samples)
+    gain_db = limited_db = 0.0
+    for _ in range(passes):
+        step_db = target_lufs - measured
+        if abs(step_db) < 0.1:
+            break
+        step = np.float32(10 ** (step_db / 20))
+        samples *= step
+        peaks *= step
+        gain_db += step_db
+        limited_db = max(limited_db, audio_dsp.limit(samples, sample_rate, ceiling, peaks))
+        measured = audio_dsp.integrated_loudness(samples, sample_rate)
+    peak = float(peaks.max()) if len(peaks) else 0.0
+    stats.update(gain_db=round(gain_db, 2), limited_db=round(limited_db, 2), output_lufs=round(measured, 2),
+                 true_peak_db=round(20 * math.log10(peak), 2) if peak > 0 else None)
+    return stats
+
+def write(path, samples, sample_rate=audio_dsp.OUTPUT_SAMPLE_RATE):
+    """Writes the track as 16-bit PCM WAV."""
+    wavfile.write(path, sample_rate, audio_dsp.to_pcm16(samples))
@@ -0,0 +1,96 @@
+"""Live ffmpeg progress with bounded memory.
+
+ffmpeg runs with `-progress pipe:1 -nostats`: it writes machine-readable key=value
+blocks to stdout (one per update, ending in progress=continue or progress=end) and
+keeps stderr for warnings and errors. follow() parses the blocks as they arrive and
+emits a progress event every PROGRESS_INTERVAL seconds; stderr is kept only as a ring
+buffer of its last lines, for the error message if the command fails.
+
+Events go to stderr as single lines, `PROGRESS: {json}`, so they reach ProcessStoryJob
+(and daemon clients, which receive the worker's stderr) without touching the stdout
+result.
+"""
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+PROGRESS_INTERVAL = float(os.getenv('WORKER_PROGRESS_INTERVAL', '2'))
+STDERR_TAIL_LINES = 200
+
+def ffmpeg_command(command):
+    """Adds the progress options (global, so right after the program) to an ffmpeg command."""
+    return [command[0], '-progress', 'pipe:1', '-nostats'] + command[1:]
+
+def tail_stderr(stream, lines=STDERR_TAIL_LINES):
+    """Drains a text stream on a thread, keeping its last lines. Returns (thread, deque)."""
+    tail = collections.deque(maxlen=lines)
+    thread = threading.Thread(target=tail.extend, args=(stream,), daemon=True)
+    thread.start()
+    return thread, tail
+
+def _seconds(values):
+    # out_time_us is the precise one (out_time_ms is microseconds too, despite its name)
+    for key in ('out_time_us', 'out_time_ms'):
+        try:
+            return int(values[key]) / 1e6
+        except (KeyError, ValueError):
+            pass
+    return None
+
+def _speed(values):
+    try:
+        return float(values.get('speed', '').rstrip('x'))
+    except ValueError:
+        return None  # "N/A" before the first frames
+
+def event(values, stage=None, scene=None, duration=None, started=None, done=False):
+    """A progress event dict from the latest -progress values."""
+    out_time = _seconds(values)
+    speed = _speed(values)
+    progress = {'stage': stage or 'other', 'scene': scene, 'out_time': round(out_time, 3) if out_time is not None else None,
+                'speed': speed, 'eta_s': None, 'percent': None, 'elapsed_s': round(time.monotonic() - started, 1) if started else None}
+    if done:
+        progress['done'] = True
+        progress['eta_s'] = 0.0
+        progress['percent'] = 100.0
+    elif duration and out_time is not None:
+        progress['percent'] = round(min(100.0, 100.0 * out_time / duration), 1)
+        if speed:
+            progress['eta_s'] = round(max(0.0, duration - out_time) / speed, 1)
+    return progress
+
+def emit(progress):
+    print(f"PROGRESS: {json.dumps(progress)}", file=sys.stderr, flush=True)
+
+def follow(stream, stage=None, scene=None, duration=None, interval=None):
+    """Parses ffmpeg -progress output until it ends, emitting an event at most every interval seconds.
+
+    duration is the expected output length in seconds, for percent and ETA.
+    Returns the last reported values (an empty dict if ffmpeg printed none).
+    """
+    interval = PROGRESS_INTERVAL if interval is None else interval
+    started = time.monotonic()
+    last_emit = started
+    # Latest known value of every key: a block may report N/A (e.g. while the muxer waits)
+    state = {}
+    for line in stream:
+        key, sep, value = line.strip().partition('=')
+        if not sep or value == 'N/A':
+            continue
+        state[key] = value
+        if key != 'progress':
+            continue
+        if value == 'end':
+            emit(event(state, stage, scene, duration, started, done=True))
+            break
+        now = time.monotonic()
+        if now - last_emit >= interval:
+            last_emit = now
+            emit(event(state, stage, scene, duration, started))
+    # Keep draining so ffmpeg never blocks on a full pipe
+    for _ in stream:
+        pass
+    return state
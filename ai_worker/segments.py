@@ -0,0 +1,93 @@
+"""Crossfade assembly that re-encodes only the crossfade windows.
+
+On the assembled timeline scene k starts at o_k = sum(d_j - X for j < k), X being the
+crossfade, as in an xfade chain over all the clips. Rounded to frames, that splits the
+timeline into pieces:
+
+- the middle of each scene, from the end of the crossfade into it to the start of
+  the crossfade out of it: stream-copied from its clip (audio is PCM, trimmed to the
+  sample), and
+- one crossfade window per cut, blending the tail of a clip into the head of the
+  next: the only video that is re-encoded.
+
+The pieces are joined with the concat demuxer, so no step holds more than two clips
+open. A copy only starts cleanly on a keyframe, so clips are encoded with keyframes on
+every frame a cut may land on (keyframes()); these depend only on the scene's own
+duration, so clips stay reusable across edits of other scenes.
+"""
+import math
+
+def _frame(seconds, fps):
+    return int(math.floor(seconds * fps + 0.5))
+
+def _around(frames):
+    # A frame position computed from rounded offsets lands on floor or ceil of the
+    # exact one; float error can push an integer position either way
+    return range(math.floor(frames - 1e-6), math.ceil(frames + 1e-6) + 1)
+
+def keyframes(duration, fps, crossfade):
+    """Frames of a duration-second clip where its copied middle may start or end."""
+    frames = set(_around(crossfade * fps)) | set(_around((duration - crossfade) * fps))
+    return sorted(n for n in frames if n > 0)
+
+def force_key_frames(duration, fps, crossfade):
+    """-force_key_frames value that puts keyframes on a clip's possible cut frames."""
+    return "expr:" + "+".join(f"eq(n,{n})" for n in keyframes(duration, fps, crossfade))
+
+def plan(durations, fps, crossfade):
+    """Pieces of the assembled timeline, in order, or None if a scene is too short to cut.
+
+    ('copy', k, first, end): frames [first, end) of clip k; end is None for the rest of
+        the last clip.
+    ('blend', k, first, count): count frames of clip k from first, crossfaded with the
+        first count frames of clip k + 1.
+    """
+    offsets = [0.0]
+    for duration in durations[:-1]:
+        offsets.append(offsets[-1] + duration - crossfade)
+    starts = [_frame(offset, fps) for offset in offsets]
+
+    pieces = []
+    head = 0  # Frames at the start of the clip already used by the previous window
+    for k in range(len(durations) - 1):
+        tail = starts[k + 1] - starts[k]
+        window = _frame(offsets[k + 1] + crossfade, fps) - starts[k + 1]
+        if tail <= head or window <= 0:
+            return None
+        pieces.append(('copy', k, head, tail))
+        pieces.append(('blend', k, tail, window))
+        head = window
+    if int(durations[-1] * fps) <= head:
+        return None
+    pieces.append(('copy', len(durations) - 1, head, None))
+    return pieces
+
+def blend_filter(count, fps, sample_rate, lead):
+    """filter_complex for a crossfade window of count frames.
+
+    Input 0 is the outgoing clip, sought to `lead` seconds before the window's first
+    frame; input 1 the incoming clip. Outputs [v] and [a], exactly count frames and
+    count / fps seconds of audio; a clip that ends early is held on its last frame
+    (and padded with silence).
+    """
+    seconds = count / fps
+    samples = round(seconds * sample_rate)
+    return ";".join([
+        # xfade wants a declared constant frame rate on both inputs
+        f"[0:v]setpts=PTS-STARTPTS,tpad=stop_mode=clone:stop={count},fps={fps}[vout]",
+        f"[1:v]setpts=PTS-STARTPTS,fps={fps}[vin]",
+        f"[vout][vin]xfade=transition=fade:duration={seconds:.6f}:offset=0,trim=end_frame={count}[v]",
+        f"[0:a]atrim=start={lead:.6f},asetpts=PTS-STARTPTS,apad,atrim=end_sample={samples}[aout]",
+        f"[1:a]apad,atrim=end_sample={samples}[ain]",
+        f"[aout][ain]acrossfade=ns={samples}[a]",
+    ])
+
+def copy_options(first, end, fps, sample_rate):
+    """ffmpeg output options that copy frames [first, end) of a clip's video and trim its
+    PCM audio to the same span, both restarting at zero."""
+    audio_end = f":end_sample={round(end * sample_rate / fps)}" if end is not None else ''
+    video_range = f"between(n\\,{first}\\,{end - 1})" if end is not None else f"gte(n\\,{first})"
+    return [
+        '-c:v', 'copy', '-bsf:v', f"noise=drop=not({video_range}),setts=ts=TS-STARTPTS",
+        '-af', f"atrim=start_sample={round(first * sample_rate / fps)}{audio_end},asetpts=PTS-STARTPTS",
+    ]
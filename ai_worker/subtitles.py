@@ -0,0 +1,142 @@
+"""Narration subtitles as ASS scripts, rendered by ffmpeg's libass-based `ass` filter.
+
+One script holds every chunk of a scene (or of the whole story), so the encoder runs a
+single subtitle pass per frame no matter how many words there are, and the text never
+goes through filtergraph escaping. Styling matches the old drawtext chain: white bold
+text, 4px black border, black@0.8 shadow offset by 2px.
+"""
+import os
+import re
+
+from PIL import ImageFont
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Words shown at a time
+CHUNK_SIZE = 3
+
+LATIN_FONTS = [
+    "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+]
+DEVANAGARI_FONTS = [
+    os.path.join(project_root, 'public', 'fonts', 'NotoSansDevanagari-Bold.ttf'),
+    "/System/Library/Fonts/Supplemental/DevanagariMT.ttc",
+    "/System/Library/Fonts/Kohinoor.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Bold.ttf",
+    "/usr/share/fonts/noto/NotoSansDevanagari-Bold.ttf",
+]
+
+def chunk_narration(narration, duration, chunk_size=CHUNK_SIZE):
+    """Splits narration into (start, end, text) chunks spread evenly over duration by word count."""
+    words = re.sub(r'\s+', ' ', narration).strip().split()
+    if not words:
+        return []
+    duration_per_word = duration / len(words)
+    return [
+        (i * duration_per_word, min((i + chunk_size) * duration_per_word, duration), " ".join(words[i:i + chunk_size]))
+        for i in range(0, len(words), chunk_size)
+    ]
+
+def select_font(devanagari=False):
+    """Returns (font file or None, family name, em-to-ASS size ratio) for the subtitle style."""
+    for path in (DEVANAGARI_FONTS if devanagari else []) + LATIN_FONTS:
+        if not os.path.exists(path):
+            continue
+        try:
+            font = ImageFont.truetype(path, 1000)
+            ascent, descent = font.getmetrics()
+            # drawtext sizes the em square, libass sizes ascent + descent
+            return path, font.getname()[0], (ascent + descent) / 1000.0
+        except Exception:
+            continue
+    return None, "Arial", 1.15
+
+def _timestamp(seconds):
+    centiseconds = int(round(max(seconds, 0.0) * 100))
+    return f"{centiseconds // 360000}:{centiseconds // 6000 % 60:02d}:{centiseconds // 100 % 60:02d}.{centiseconds % 100:02d}"
+
+def _escape_text(text):
+    # Braces open override blocks and a backslash starts a tag; neither is wanted in narration
+    return text.replace('\\', '/').replace('{', '(').replace('}', ')')
+
+def write_ass(path, events, aspect_ratio='16:9', devanagari=False):
+    """Writes an ASS script for (start, end, text) events at output resolution.
+
+    Returns the font file the style uses (None if only a system font name is known),
+    whose directory should be passed to the `ass` filter as fontsdir.
+    """
+    width, height = (1920, 1080) if aspect_ratio == '16:9' else (1080, 1920)
+    font_path, font_name, size_ratio = select_font(devanagari)
+    font_size = 64 if aspect_ratio == '16:9' else 80
+    if aspect_ratio == '16:9':
+        # drawtext y=h-150: text top 150px above the bottom edge
+        position = f"{{\\an8\\pos({width // 2},{height - 150})}}"
+    else:
+        # drawtext y=(h-text_h)/2+300: centred 300px below the middle (TikTok style)
+        position = f"{{\\an5\\pos({width // 2},{height // 2 + 300})}}"
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 2",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        # Colours are &HAABBGGRR; shadow alpha 0x33 is drawtext's black@0.8
+        f"Style: Narration,{font_name},{round(font_size * size_ratio)},&H00FFFFFF,&H00FFFFFF,&H00000000,&H33000000,"
+        "0,0,0,0,100,100,0,0,1,4,2,2,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start, end, text in events:
+        if end > start:
+            lines.append(f"Dialogue: 0,{_timestamp(start)},{_timestamp(end)},Narration,,0,0,0,,{position}{_escape_text(text)}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return font_path
+
+def write_scene_ass(path, narration, duration, aspect_ratio='16:9', devanagari=False):
+    """Writes one scene's subtitles. Returns the font file, or False when there is no text."""
+    events = chunk_narration(narration, duration)
+    if not events:
+        return False
+    return write_ass(path, events, aspect_ratio, devanagari)
+
+def write_story_ass(path, scenes, aspect_ratio='16:9', devanagari=False):
+    """Writes the subtitles of a whole assembled timeline.
+
+    scenes is a list of (narration, start offset, duration); a scene's last chunk is cut
+    where the next scene starts, so crossfades never show two lines at once.
+    Returns the font file, or False when there is no text.
+    """
+    events = []
+    for n, (narration, offset, duration) in enumerate(scenes):
+        next_start = scenes[n + 1][1] if n + 1 < len(scenes) else float('inf')
+        for start, end, text in chunk_narration(narration, duration):
+            events.append((offset + start, min(offset + end, next_start), text))
+    if not events:
+        return False
+    return write_ass(path, events, aspect_ratio, devanagari)
+
+def _escape_filter_value(value):
+    # Option level (key=value pairs split on ':'), then filtergraph level
+    value = re.sub(r"([\\':])", r"\\\1", value)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
+def ass_filter(ass_path, font_path=None):
+    """The `ass` filter burning ass_path, with the style's font directory when known."""
+    options = f"ass=filename={_escape_filter_value(ass_path)}"
+    if font_path:
+        options += f":fontsdir={_escape_filter_value(os.path.dirname(font_path))}"
+    return options
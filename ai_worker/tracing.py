@@ -0,0 +1,181 @@
+"""Per-stage timing spans for a story render, exported as Chrome trace-event JSON.
+
+The trace file loads into Perfetto (ui.perfetto.dev) or chrome://tracing. Every span
+is a complete ('X') event on a lane of its group ("scene 3", or "story" for work that
+isn't tied to a scene). Spans opened inside another span of the same group nest on the
+parent's lane; unrelated spans that overlap (hedged searches, parallel encodes) go to
+the first free lane of the group, so the viewer never sees broken nesting.
+
+The worker renders one story at a time, so the active trace is module state. Without
+an active trace, span() and annotate() do nothing.
+"""
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+
+TRACE_NAME = 'render_trace.json'
+
+_active = None
+# The innermost open span of the running task/thread: (trace, group, lane, span id, args, name)
+_current = contextvars.ContextVar('tracing_span', default=None)
+
+class Trace:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.events = []
+        self.lanes = {}      # (group, n) -> tid
+        self.top = {}        # tid -> id of the innermost open span on that lane
+        self.open = {}       # span id -> (name, scene, parent span id, start) while open
+        self.span_ids = itertools.count(1)
+
+    def open_span(self, group, parent, name, scene):
+        """Picks the lane for a new span. Returns (tid, span id, the lane's previous top span)."""
+        with self.lock:
+            span_id = next(self.span_ids)
+            self.open[span_id] = (name, scene, parent[3] if parent is not None else None, time.perf_counter())
+            # Nest under the parent only while it is still the innermost span on its lane
+            if parent is not None and parent[1] == group and self.top.get(parent[2]) == parent[3]:
+                tid = parent[2]
+            else:
+                n = 0
+                while True:
+                    tid = self.lanes.setdefault((group, n), len(self.lanes) + 1)
+                    if not self.top.get(tid):
+                        break
+                    n += 1
+            previous = self.top.get(tid)
+            self.top[tid] = span_id
+            return tid, span_id, previous
+
+    def close(self, tid, span_id, previous, name, category, start, end, args):
+        with self.lock:
+            self.top[tid] = previous
+            self.open.pop(span_id, None)
+            self.events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': tid,
+                'ts': round((start - self.origin) * 1e6), 'dur': round((end - start) * 1e6),
+                'args': args,
+            })
+
+    def summary(self):
+        """Wall time and per-stage totals: {'wall_s', 'stages': {name: {'count', 'total_s'}}}."""
+        with self.lock:
+            events = list(self.events)
+        stages = {}
+        for event in events:
+            stage = stages.setdefault(event['name'], {'count': 0, 'total_s': 0.0})
+            stage['count'] += 1
+            stage['total_s'] += event['dur'] / 1e6
+        for stage in stages.values():
+            stage['total_s'] = round(stage['total_s'], 3)
+        return {'wall_s': round(time.perf_counter() - self.origin, 3), 'stages': stages}
+
+    def write(self, path):
+        with self.lock:
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                         'args': {'name': group if n == 0 else f"{group} ({n + 1})"}}
+                        for (group, n), tid in self.lanes.items()]
+            metadata.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'story render'}})
+            document = {'traceEvents': metadata + sorted(self.events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms'}
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(document, f)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+
+def start():
+    """Starts tracing a story render."""
+    global _active
+    _active = Trace()
+    return _active
+
+def finish(output_dir):
+    """Writes the active trace to output_dir and stops tracing. Returns (trace path, summary) or None."""
+    global _active
+    trace, _active = _active, None
+    if trace is None or not os.path.isdir(output_dir):
+        return None
+    path = os.path.join(output_dir, TRACE_NAME)
+    trace.write(path)
+    return path, trace.summary()
+
+def summary_line(summary, limit=8):
+    """One-line summary of the stages that took longest, e.g. 'wall 41.2s; tts 20.3s x4; ...'."""
+    stages = sorted(summary['stages'].items(), key=lambda item: -item[1]['total_s'])[:limit]
+    return "; ".join([f"wall {summary['wall_s']:.1f}s"] + [f"{name} {stage['total_s']:.1f}s x{stage['count']}" for name, stage in stages])
+
+@contextlib.contextmanager
+def span(name, category='stage', scene=None, **args):
+    """Times the enclosed block as one span. Yields its args dict, which may be extended.
+
+    scene tags the span (and picks its lane group); nested spans inherit it.
+    """
+    trace = _active
+    if trace is None:
+        yield args
+        return
+
+    parent = _current.get()
+    if parent is not None and parent[0] is not trace:
+        parent = None  # Left over from an earlier story
+    if scene is None and parent is not None:
+        scene = parent[4].get('scene')
+    if scene is not None:
+        args['scene'] = scene
+    group = f"scene {scene}" if scene is not None else 'story'
+    tid, span_id, previous = trace.open_span(group, parent, name, scene)
+
+    token = _current.set((trace, group, tid, span_id, args, name))
+    start_time = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args['error'] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        trace.close(tid, span_id, previous, name, category, start_time, time.perf_counter(), args)
+
+def annotate(**args):
+    """Adds args (sizes, outcomes) to the innermost open span."""
+    current = _current.get()
+    if current is not None:
+        current[4].update(args)
+
+def current_stage():
+    """(name, scene) of the innermost open span, or (None, None) outside any span."""
+    current = _current.get()
+    if current is None or current[0] is not _active:
+        return None, None
+    return current[5], current[4].get('scene')
+
+def open_stages():
+    """(name, scene) of every open span with no open span inside it, longest-running first.
+
+    Safe to call from any thread (e.g. a watchdog deciding which stage a deadline hit).
+    """
+    trace = _active
+    if trace is None:
+        return []
+    with trace.lock:
+        spans = dict(trace.open)
+    parents = {parent for _, _, parent, _ in spans.values()}
+    leaves = sorted((span for span_id, span in spans.items() if span_id not in parents), key=lambda span: span[3])
+    return [(name, scene) for name, scene, _, _ in leaves]
+
+def traced(name, func, category='stage', scene=None, **args):
+    """func wrapped to run inside a span, for handing to worker threads."""
+    @functools.wraps(func)
+    def wrapper(*call_args, **call_kwargs):
+        with span(name, category, scene, **dict(args)):
+            return func(*call_args, **call_kwargs)
+    return wrapper
@@ -0,0 +1,143 @@
+"""Watermark detection and removal for downloaded scene images.
+
+Watermarks are only looked for in border regions (bottom strip and corners, top
+corners), so detection runs on two horizontal bands of the image instead of the full
+frame, optionally downscaled, and the full-resolution mask is rebuilt from them.
+Inpainting runs on padded bounding boxes around the detected regions only; pixels
+outside the mask are never touched.
+"""
+import cv2
+import numpy as np
+
+# Watermark-prone regions as (x0, y0, x1, y1) fractions of the frame
+REGIONS = [
+    (0.0, 0.85, 1.0, 1.0),    # Bottom strip (full width) - most common watermark location
+    (0.0, 0.75, 0.35, 1.0),   # Bottom-left corner (extended area)
+    (0.65, 0.75, 1.0, 1.0),   # Bottom-right corner (extended area)
+    (0.0, 0.0, 0.25, 0.12),   # Top corners (for logos)
+    (0.75, 0.0, 1.0, 0.12),
+]
+# Full-width row bands (top, bottom fractions) that contain every region
+BANDS = [(0.75, 1.0), (0.0, 0.12)]
+# Extra rows of context around a band, so edge detection (whose hysteresis follows
+# edge chains across rows) and morphology near its borders see the same
+# neighbourhood as on the full frame
+BAND_MARGIN = 32
+
+INPAINT_RADIUS = 5
+
+def _location_mask(height, width, full_h, full_w, offset):
+    """Region mask for rows [offset, offset + height) of a full_w x full_h frame."""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for x0, y0, x1, y1 in REGIONS:
+        cv2.rectangle(mask, (int(full_w * x0), int(full_h * y0) - offset), (int(full_w * x1), int(full_h * y1) - offset), 255, -1)
+    return mask
+
+def _detect_band(band, full_h, full_w, offset, scale):
+    """Watermark mask for one band (detection-scale pixels, band coordinates)."""
+    gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+
+    # === METHOD 1: Bright text detection (white/light watermarks) ===
+    _, bright_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
+
+    # === METHOD 2: Semi-transparent gray text (Adobe Stock style) ===
+    # These watermarks are often gray (not bright white)
+    gray_mask = cv2.inRange(band, np.array([180, 180, 180]), np.array([240, 240, 240]))
+
+    # === METHOD 3: Edge-based text detection ===
+    edges = cv2.Canny(gray, 50, 150)
+
+    combined = cv2.bitwise_or(cv2.bitwise_or(bright_mask, gray_mask), edges)
+
+    # === LOCATION FILTER: Only target watermark-prone areas ===
+    detected = cv2.bitwise_and(combined, _location_mask(band.shape[0], band.shape[1], full_h, full_w, offset))
+
+    # === MORPHOLOGICAL OPERATIONS: Connect text characters ===
+    # Dilate to connect letters in watermark text, then close gaps
+    detected = cv2.dilate(detected, cv2.getStructuringElement(cv2.MORPH_RECT, (5, 3)), iterations=2)
+    detected = cv2.morphologyEx(detected, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (7, 5)))
+
+    # === CONTOUR FILTERING: Keep only watermark-sized regions ===
+    mask = np.zeros(detected.shape, dtype=np.uint8)
+    contours, _ = cv2.findContours(detected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Size limits are for full-resolution pixels
+    area_scale = scale * scale
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        x, y, cw, ch = cv2.boundingRect(contour)
+        y += offset
+
+        # Filter: watermarks are typically small-medium sized, wide, and near edges
+        min_area = 100 * area_scale
+        max_area = (full_h * full_w) * 0.08  # Max 8% of image
+        aspect_ratio = cw / max(ch, 1)
+
+        # Watermark text is usually wider than tall (aspect ratio > 1.5)
+        # Or could be a logo (more square-ish)
+        if min_area < area < max_area and (aspect_ratio > 1.2 or area < 5000 * area_scale):
+            # Check if it's in the edge regions
+            is_bottom = y > full_h * 0.7
+            is_top_corner = y < full_h * 0.15 and (x < full_w * 0.3 or x > full_w * 0.7)
+            if is_bottom or is_top_corner:
+                cv2.drawContours(mask, [contour], -1, 255, -1)
+
+    # Dilate the final mask slightly to cover text edges
+    return cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)), iterations=2)
+
+def detect(image, max_width=None):
+    """Full-resolution watermark mask (uint8, 255 = watermark) for a BGR image.
+
+    Only the border bands are analysed; with max_width they are first downscaled so
+    detection runs at most max_width pixels wide, and the mask is scaled back up.
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, max_width / w) if max_width else 1.0
+    dw, dh = max(1, round(w * scale)), max(1, round(h * scale))
+
+    mask = np.zeros((h, w), dtype=np.uint8)
+    for top, bottom in BANDS:
+        # Band rows with context, in detection-scale pixels
+        y0 = max(0, int(dh * top) - BAND_MARGIN)
+        y1 = min(dh, int(dh * bottom) + BAND_MARGIN + 1)
+        if scale < 1.0:
+            src0, src1 = int(y0 / scale), min(h, int(np.ceil(y1 / scale)))
+            band = cv2.resize(image[src0:src1], (dw, y1 - y0), interpolation=cv2.INTER_AREA)
+            band_mask = cv2.resize(_detect_band(band, dh, dw, y0, scale), (w, src1 - src0), interpolation=cv2.INTER_NEAREST)
+            mask[src0:src1] |= band_mask
+        else:
+            mask[y0:y1] |= _detect_band(image[y0:y1], h, w, y0, 1.0)
+    return mask
+
+def mask_boxes(mask, padding):
+    """Bounding boxes (x0, y0, x1, y1) of the mask's regions, padded and merged where they overlap."""
+    h, w = mask.shape[:2]
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = [[max(0, x - padding), max(0, y - padding), min(w, x + bw + padding), min(h, y + bh + padding)]
+             for x, y, bw, bh, _ in stats[1:]]
+    merged = True
+    while merged:
+        merged = False
+        disjoint = []
+        for box in boxes:
+            for other in disjoint:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[:] = [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+                    merged = True
+                    break
+            else:
+                disjoint.append(box)
+        boxes = disjoint
+    return boxes
+
+def inpaint(image, mask, radius=INPAINT_RADIUS):
+    """Inpaints the masked pixels in place, one padded bounding box at a time.
+
+    Each box keeps at least `radius` pixels of context around its mask, which is all
+    cv2.inpaint looks at, so the result matches inpainting the whole frame.
+    """
+    for x0, y0, x1, y1 in mask_boxes(mask, radius + 1):
+        region = image[y0:y1, x0:x1]
+        region_mask = mask[y0:y1, x0:x1]
+        filled = cv2.inpaint(region, region_mask, radius, cv2.INPAINT_NS)
+        np.copyto(region, filled, where=region_mask[..., None] > 0)
+    return image
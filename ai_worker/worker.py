@@ -1,26 +1,48 @@
 import sys
 import glob
+import importlib.metadata
 import json
 import os
 import subprocess
-import urllib.request
 import urllib.parse
 import time
 import re
 import shutil
-import requests
+import ssl
+import aiohttp
+import certifi
 import base64
 import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import io
+import socket
+import signal
+import socketserver
+import tempfile
+import threading
+import traceback
 import edge_tts
 import cv2
 import numpy as np
 from PIL import Image
 from dotenv import load_dotenv
-import torch
-from chatterbox.tts import ChatterboxTTS
-from chatterbox.vc import ChatterboxVC
-from chatterbox.mtl_tts import ChatterboxMultilingualTTS
 from scipy.io import wavfile
+from disk_cache import DiskCache, cache_key, file_digest
+import accounting
+import audio_dsp
+import deadlines
+import media_info
+from manifest import RenderManifest
+import motion
+import narration
+import progress
+import segments
+import subtitles
+import tracing
+import watermark
 
 # Load .env from project root
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -39,21 +61,40 @@ def get_executable_path(name, default_path=None):
 
 import random
 
-# Detection for paths for ffmpeg and ffprobe
+# Detection for the ffmpeg path (durations come from media_info, not ffprobe)
 FFMPEG_PATH = get_executable_path('ffmpeg', '/opt/homebrew/bin/ffmpeg')
-FFPROBE_PATH = get_executable_path('ffprobe', '/opt/homebrew/bin/ffprobe')
 
 # Logo Path for watermarking
 LOGO_PATH = os.path.join(project_root, 'public', 'logo.png')
 
+# Watermark detection runs on the image's border bands at full resolution. Optionally
+# the bands are first downscaled to at most this width and the mask scaled back up;
+# `bench.py watermark` shows that is no faster even on 24 MP photos, and the upscaled
+# mask paints over about twice the area, so it is off (0) by default.
+WATERMARK_DETECT_MAX_WIDTH = int(os.getenv('WORKER_WATERMARK_DETECT_MAX_WIDTH', '0'))
+
 # Target Voice Path for voice cloning
 TARGET_VOICE_PATH = os.path.join(project_root, 'public', 'audio', 'sample.m4a')
 
-# Initialize Chatterbox models
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Render daemon socket. The daemon keeps the TTS model loaded between stories;
+# set RENDER_DAEMON_SOCKET to an empty string to always render in-process.
+DAEMON_SOCKET_PATH = os.getenv('RENDER_DAEMON_SOCKET', os.path.join(tempfile.gettempdir(), 'video-creator-render.sock'))
+
+# Chatterbox models. torch/chatterbox are imported lazily by init_models() so the
+# thin client path (forwarding a job to a running daemon) starts instantly.
+torch = None
+ChatterboxMultilingualTTS = None
+DEVICE = None
+Conditionals = None
 tts_model = None
 vc_model = None
 
+# Speaker conditioning per reference voice (content hash -> Conditionals)
+VOICE_CACHE_MAX_MB = int(os.getenv('WORKER_VOICE_CACHE_MB', '256'))
+default_conditionals = None
+voice_conditionals = {}
+voice_cache = None
+
 def is_devanagari(text):
     """Detects if a string contains Devanagari (Hindi) characters."""
     for char in text:
@@ -61,19 +102,68 @@ def is_devanagari(text):
             return True
     return False
 
+def detect_scene_language(text, language='en'):
+    """Per-scene language detection (if it's English but text is Hindi)."""
+    if language == 'en' and is_devanagari(text):
+        return 'hi'
+    return language
+
 def init_models(language='en'):
-    global tts_model, vc_model
+    global tts_model, vc_model, torch, ChatterboxMultilingualTTS, Conditionals, DEVICE, default_conditionals
     if tts_model is not None: return
 
+    import torch
+    from chatterbox.mtl_tts import ChatterboxMultilingualTTS, Conditionals
+    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
     print(f"Initializing Chatterbox models on {DEVICE} for language: {language}...", file=sys.stderr)
 
     # Use Multilingual TTS for all languages (English, Hindi, etc.) as it supports voice cloning natively
     # and is the superior model.
     tts_model = ChatterboxMultilingualTTS.from_pretrained(DEVICE)
     vc_model = None  # Multilingual model handles voice cloning internally
+    default_conditionals = tts_model.conds  # Built-in voice, restored for non-cloned TTS
 
     print("Chatterbox models initialized successfully!", file=sys.stderr)
 
+def use_voice_conditionals(voice_path=None):
+    """Points tts_model at the speaker conditioning for voice_path (the built-in voice if None).
+
+    Decoding, resampling and embedding the reference clip happens once per voice:
+    the result is memoized in-process and persisted to disk keyed by the file's
+    content hash, so every scene and story reuses it. Callers must hold the
+    model (conditioning is model state), which the 'model' scheduler slot ensures.
+    """
+    global voice_cache
+    if not voice_path or not os.path.exists(voice_path):
+        tts_model.conds = default_conditionals
+        return
+
+    digest = voice_digest(voice_path)
+    conds = voice_conditionals.get(digest)
+    if conds is None:
+        if voice_cache is None:
+            voice_cache = open_cache('voices', VOICE_CACHE_MAX_MB) or False
+        key = cache_key('conds', digest, tts_model_version())
+        fd, temp_path = tempfile.mkstemp(suffix='.pt')
+        os.close(fd)
+        try:
+            if voice_cache and voice_cache.copy_to(key, temp_path):
+                conds = Conditionals.load(temp_path, map_location='cpu').to(DEVICE)
+                print(f"DEBUG: Loaded cached speaker conditioning for {voice_path}", file=sys.stderr)
+            else:
+                print(f"DEBUG: Computing speaker conditioning for {voice_path}", file=sys.stderr)
+                tts_model.prepare_conditionals(voice_path)
+                conds = tts_model.conds
+                if voice_cache:
+                    conds.save(temp_path)
+                    voice_cache.put_file(key, temp_path)
+        finally:
+            os.remove(temp_path)
+        voice_conditionals[digest] = conds
+
+    tts_model.conds = conds
+
 STOPWORDS = {
     'a', 'an', 'the', 'and', 'or', 'but', 'if', 'because', 'as', 'what',
     'when', 'where', 'how', 'who', 'why', 'which', 'this', 'that', 'these',
@@ -110,30 +200,70 @@ def extract_keywords(text, limit=6):
 
     return " ".join(unique_keywords[:limit])
 
-def download_web_image(query, output_path, aspect_ratio='16:9'):
-    """Downloads a high-quality, watermark-free image from the web with multiple fallbacks."""
+# Domains to strictly avoid in Yahoo results (known for heavy watermarking)
+FORBIDDEN_IMAGE_DOMAINS = [
+    'shutterstock.com', 'gettyimages.com', 'alamy.com', 'adobe.com',
+    'depositphotos.com', '123rf.com', 'dreamstime.com', 'istockphoto.com',
+    'vectorstock.com', 'canstockphoto.com', 'pond5.com', 'bigstockphoto.com'
+]
+
+BROWSER_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'}
+
+# Concurrent requests allowed per image provider, shared by all scenes of a story
+IMAGE_PROVIDER_LIMITS = {
+    'pexels': 4,
+    'yahoo': 4,
+    'candidate': 8,  # Image downloads from Yahoo result URLs (many different hosts)
+    'loremflickr': 2,
+    'picsum': 2,
+}
 
-    # 1. Try Pexels first if API key is available (Best for watermark-free images)
-    pexels_key = os.getenv('PEXELS_API_KEY')
-    if pexels_key:
-        try:
-            orientation = 'landscape' if aspect_ratio == '16:9' else 'portrait'
-            url = f"https://api.pexels.com/v1/search?query={urllib.parse.quote(query)}&per_page=1&orientation={orientation}"
-            headers = {"Authorization": pexels_key}
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('photos'):
-                    img_url = data['photos'][0]['src']['large2x']
-                    img_res = requests.get(img_url, timeout=10)
-                    if img_res.status_code == 200:
-                        with open(output_path, 'wb') as f:
-                            f.write(img_res.content)
-                        return True
-        except Exception as e:
-            print(f"DEBUG: Pexels fallback: {e}", file=sys.stderr)
+# Provider endpoints (overridable, e.g. to point the worker at local stub servers)
+PEXELS_SEARCH_URL = os.getenv('PEXELS_SEARCH_URL', 'https://api.pexels.com/v1/search')
+YAHOO_IMAGES_URL = os.getenv('YAHOO_IMAGES_URL', 'https://images.search.yahoo.com/search/images')
+LOREMFLICKR_URL = os.getenv('LOREMFLICKR_URL', 'https://loremflickr.com')
+PICSUM_URL = os.getenv('PICSUM_URL', 'https://picsum.photos')
+
+# Wall-clock budget in seconds for one attempt at a provider (search and download)
+IMAGE_PROVIDER_BUDGETS = {
+    'pexels': 8,
+    'yahoo': 12,
+    'loremflickr': 8,
+    'picsum': 8,
+}
 
-    # 2. Refine Yahoo search query to exclude watermarked sites
+# 'hedged' starts the next (query, provider) attempt IMAGE_HEDGE_DELAY seconds after the
+# previous one, or as soon as it fails, keeps the first image that arrives and cancels
+# the rest; 'sequential' tries each attempt only after the previous one has failed
+IMAGE_FETCH_MODE = os.getenv('WORKER_IMAGE_FETCH_MODE', 'hedged')
+IMAGE_HEDGE_DELAY = float(os.getenv('WORKER_IMAGE_HEDGE_DELAY', '1.5'))
+
+# Yahoo result candidates are streamed and dropped as soon as they turn out to be no
+# JPEG/PNG, larger than the byte cap, or smaller than the minimum side from their header
+IMAGE_CANDIDATE_MAX_BYTES = int(os.getenv('WORKER_IMAGE_CANDIDATE_MAX_MB', '25')) * 1024 * 1024
+IMAGE_CANDIDATE_MIN_SIDE = int(os.getenv('WORKER_IMAGE_CANDIDATE_MIN_SIDE', '720'))
+IMAGE_CANDIDATE_TIMEOUT = 8
+
+# Persistent image cache (cleaned images and provider result lists)
+IMAGE_CACHE_MAX_MB = int(os.getenv('WORKER_IMAGE_CACHE_MB', '2048'))
+IMAGE_RESULTS_MAX_AGE = 7 * 24 * 3600  # Re-run searches weekly so results don't go stale
+
+def open_cache(namespace, max_mb):
+    """Opens a shared on-disk cache, or returns None if caching is disabled or unavailable."""
+    if max_mb <= 0:
+        return None
+    try:
+        return DiskCache(namespace, max_mb * 1024 * 1024)
+    except Exception as e:
+        print(f"Warning: {namespace} cache unavailable: {e}", file=sys.stderr)
+        return None
+
+def normalize_image_query(query):
+    """Normalises a search query so near-identical prompts share cache entries."""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', query.lower())).strip()
+
+def build_yahoo_query(query):
+    """Refines a Yahoo search query to exclude watermarked sites."""
     search_query = query.replace('"', '').strip()
     ai_keywords = ['highly detailed', '8k', '4k', 'photorealistic', 'masterpiece', 'stock photo', 'premium']
     for word in ai_keywords:
@@ -150,81 +280,407 @@ def download_web_image(query, output_path, aspect_ratio='16:9'):
     words = search_query.split()
     if len(words) > 8:
         search_query = ' '.join(words[:8])
+    return search_query
+
+def parse_yahoo_results(html, limit=10):
+    """Extracts candidate image URLs from a Yahoo image search page, skipping watermark-heavy domains."""
+    matches = re.findall(r'"murl":"(http[^"]+)"', html)
+    if not matches:
+        matches = re.findall(r'"iurl":"(http[^"]+)"', html)
+
+    candidates = []
+    for img_url in matches[:limit]: # Check more candidates
+        img_url = img_url.replace('\\/', '/')
+        # Skip if URL contains forbidden domains
+        if any(domain in img_url.lower() for domain in FORBIDDEN_IMAGE_DOMAINS):
+            continue
+        candidates.append(img_url)
+    return candidates
+
+class ImageFetcher:
+    """Async image search shared by every scene of a story.
+
+    One aiohttp session gives per-host keep-alive connection pools (no repeated
+    DNS+TLS per request); per-provider semaphores bound how hard we hit each API.
+    """
+
+    def __init__(self, provider_limits=None, total_connections=None, cache=None):
+        self.provider_limits = dict(provider_limits or IMAGE_PROVIDER_LIMITS)
+        self.total_connections = total_connections or int(os.getenv('WORKER_NETWORK_CONCURRENCY', '16'))
+        self.cache = cache if cache is not None else open_cache('images', IMAGE_CACHE_MAX_MB)
+        self.session = None
+        self.semaphores = {}
+        self.stats = collections.defaultdict(lambda: {'ok': 0, 'failed': 0, 'timeout': 0, 'cancelled': 0, 'wins': 0, 'latencies': []})
+
+    async def __aenter__(self):
+        ssl_context = ssl.create_default_context(cafile=certifi.where())
+        connector = aiohttp.TCPConnector(
+            limit=self.total_connections,
+            limit_per_host=8,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+            ssl=ssl_context,
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
+        self.semaphores = {name: asyncio.Semaphore(n) for name, n in self.provider_limits.items()}
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.log_stats()
+
+    def log_stats(self):
+        """Prints per-provider attempt outcomes and latencies."""
+        for provider, stats in self.stats.items():
+            latencies = sorted(stats['latencies'])
+            median = f"{latencies[len(latencies) // 2] * 1000:.0f} ms" if latencies else "n/a"
+            attempts = stats['ok'] + stats['failed'] + stats['timeout'] + stats['cancelled']
+            print(f"DEBUG: Image provider {provider}: {stats['ok']}/{attempts} ok, {stats['wins']} used, "
+                  f"{stats['failed']} failed, {stats['timeout']} timed out, {stats['cancelled']} cancelled, "
+                  f"median ok latency {median}", file=sys.stderr)
+
+    async def get(self, provider, url, headers=None, timeout=10):
+        """GETs a URL for a provider whose slot the caller holds (see attempt). Returns (status, body bytes)."""
+        async with self.session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return response.status, await response.read()
+
+    async def fetch_candidate(self, url):
+        """Streams one image search result. Returns its bytes if it is a usable JPEG/PNG, else None.
+
+        The response is rejected from its headers and first chunk (content type, magic
+        bytes) and from the image header (minimum resolution) without reading the rest,
+        and abandoned once it passes IMAGE_CANDIDATE_MAX_BYTES.
+        """
+        async with self.semaphores['candidate']:
+            timeout = aiohttp.ClientTimeout(total=IMAGE_CANDIDATE_TIMEOUT)
+            async with self.session.get(url, headers=BROWSER_HEADERS, timeout=timeout) as response:
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if response.status != 200 or content_type.startswith(('text/', 'application/json')):
+                    return None
+                if (response.content_length or 0) > IMAGE_CANDIDATE_MAX_BYTES:
+                    return None
+
+                content = bytearray()
+                size = None
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    content += chunk
+                    if len(content) > IMAGE_CANDIDATE_MAX_BYTES:
+                        return None
+                    if size is None:
+                        try:
+                            size = media_info.image_size(bytes(content[:64 * 1024]))
+                        except ValueError:
+                            return None
+                        if size is not None and min(size) < IMAGE_CANDIDATE_MIN_SIDE:
+                            return None
+                return bytes(content) if size is not None else None
+
+    async def cached_results(self, provider, query, aspect_ratio, search):
+        """Returns a provider's result list for a query, from the cache when fresh."""
+        key = cache_key('results', provider, normalize_image_query(query), aspect_ratio)
+        if self.cache:
+            results = self.cache.get_json(key, max_age=IMAGE_RESULTS_MAX_AGE)
+            if results is not None:
+                return results
+        results = await search()
+        if results and self.cache:
+            self.cache.put_json(key, results)
+        return results
+
+    async def try_pexels(self, query, output_path, aspect_ratio):
+        pexels_key = os.getenv('PEXELS_API_KEY')
+        if not pexels_key:
+            return False
 
-    print(f"DEBUG: Searching for clean web image. Query: {search_query}", file=sys.stderr)
-    encoded_query = urllib.parse.quote(search_query)
+        async def search():
+            orientation = 'landscape' if aspect_ratio == '16:9' else 'portrait'
+            url = f"{PEXELS_SEARCH_URL}?query={urllib.parse.quote(query)}&per_page=1&orientation={orientation}"
+            status, body = await self.get('pexels', url, headers={"Authorization": pexels_key})
+            if status != 200:
+                return []
+            return [photo['src']['large2x'] for photo in json.loads(body).get('photos', [])]
 
-    try:
-        # Use filters for large images and creative commons/free types if possible
-        yahoo_url = f"https://images.search.yahoo.com/search/images?p={encoded_query}&imgsz=large&imgtype=photo"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'}
-
-        response = requests.get(yahoo_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            # Extract image URLs
-            matches = re.findall(r'"murl":"(http[^"]+)"', response.text)
-            if not matches:
-                matches = re.findall(r'"iurl":"(http[^"]+)"', response.text)
-
-            # List of domains to strictly avoid (known for heavy watermarking)
-            forbidden_domains = [
-                'shutterstock.com', 'gettyimages.com', 'alamy.com', 'adobe.com',
-                'depositphotos.com', '123rf.com', 'dreamstime.com', 'istockphoto.com',
-                'vectorstock.com', 'canstockphoto.com', 'pond5.com', 'bigstockphoto.com'
-            ]
+        try:
+            results = await self.cached_results('pexels', query, aspect_ratio, search)
+            if results:
+                status, content = await self.get('pexels', results[0])
+                if status == 200:
+                    with open(output_path, 'wb') as f:
+                        f.write(content)
+                    return True
+        except Exception as e:
+            print(f"DEBUG: Pexels fallback: {e}", file=sys.stderr)
+        return False
+
+    async def try_yahoo(self, query, output_path, aspect_ratio):
+        async def search():
+            search_query = build_yahoo_query(query)
+            print(f"DEBUG: Searching for clean web image. Query: {search_query}", file=sys.stderr)
+
+            # Use filters for large images and creative commons/free types if possible
+            yahoo_url = f"{YAHOO_IMAGES_URL}?p={urllib.parse.quote(search_query)}&imgsz=large&imgtype=photo"
+            status, body = await self.get('yahoo', yahoo_url, headers=BROWSER_HEADERS)
+            if status != 200:
+                return []
+            return parse_yahoo_results(body.decode('utf-8', errors='replace'))
 
-            if matches:
-                for img_url in matches[:10]: # Check more candidates
-                    img_url = img_url.replace('\\/', '/')
-
-                    # Skip if URL contains forbidden domains
-                    if any(domain in img_url.lower() for domain in forbidden_domains):
-                        continue
-
-                    try:
-                        img_response = requests.get(img_url, headers=headers, timeout=8)
-                        if img_response.status_code == 200:
-                            # Basic image validation
-                            content = img_response.content
-                            if content.startswith(b'\xff\xd8') or content.startswith(b'\x89PNG'):
-                                with open(output_path, 'wb') as f:
-                                    f.write(content)
-                                print(f"DEBUG: Downloaded clean image from: {img_url}", file=sys.stderr)
-                                return True
-                    except:
-                        continue
-
-        # 3. Final fallback: LoremFlickr (High quality, no watermarks, but random-ish)
+        async def probe(img_url):
+            try:
+                return img_url, await self.fetch_candidate(img_url)
+            except Exception:
+                return img_url, None
+
+        # Probe every candidate at once; the first usable image wins and the rest are aborted
+        probes = [asyncio.create_task(probe(img_url)) for img_url in await self.cached_results('yahoo', query, aspect_ratio, search)]
+        try:
+            for next_probe in asyncio.as_completed(probes):
+                img_url, content = await next_probe
+                if content:
+                    with open(output_path, 'wb') as f:
+                        f.write(content)
+                    print(f"DEBUG: Downloaded clean image from: {img_url}", file=sys.stderr)
+                    return True
+        finally:
+            for task in probes:
+                task.cancel()
+            await asyncio.gather(*probes, return_exceptions=True)
+        return False
+
+    async def try_loremflickr(self, query, output_path, aspect_ratio):
+        # High quality, no watermarks, but random-ish
         print("DEBUG: Using LoremFlickr fallback", file=sys.stderr)
         clean_q = urllib.parse.quote(query.split(',')[0].strip())
         width = 1920 if aspect_ratio == '16:9' else 1080
         height = 1080 if aspect_ratio == '16:9' else 1920
-        fallback_url = f"https://loremflickr.com/{width}/{height}/{clean_q}"
-        fb_res = requests.get(fallback_url, timeout=10)
-        if fb_res.status_code == 200:
+        status, content = await self.get('loremflickr', f"{LOREMFLICKR_URL}/{width}/{height}/{clean_q}")
+        if status == 200:
             with open(output_path, 'wb') as f:
-                f.write(fb_res.content)
+                f.write(content)
             return True
+        return False
 
-    except Exception as e:
-        print(f"Warning: Image search failed: {e}", file=sys.stderr)
+    def providers(self):
+        """Image providers in order of preference."""
+        return (['pexels'] if os.getenv('PEXELS_API_KEY') else []) + ['yahoo', 'loremflickr']
+
+    def cached_image_key(self, image):
+        return cache_key('image', image['provider'], normalize_image_query(image['query']), image['aspect_ratio'])
+
+    def store_cleaned(self, image, image_path):
+        """Caches an image after clean_watermark so later hits skip both download and cleaning."""
+        if self.cache and not image['cached']:
+            self.cache.put_file(self.cached_image_key(image), image_path)
+
+    def cached_image(self, query, output_path, aspect_ratio):
+        """Copies a cleaned image for the query from the cache. Returns its image dict, or None."""
+        if not self.cache:
+            return None
+        for provider in self.providers():
+            image = {'provider': provider, 'query': query, 'aspect_ratio': aspect_ratio, 'cached': True}
+            if self.cache.copy_to(self.cached_image_key(image), output_path):
+                print(f"DEBUG: Image cache hit ({provider}) for query: {query}", file=sys.stderr)
+                return image
+        return None
 
-    return False
+    async def attempt(self, provider, query, output_path, aspect_ratio, started=None):
+        """One download from a provider within its latency budget. Returns the image dict, or None.
+
+        The attempt first waits for a free slot under the provider's concurrency limit;
+        its budget and latency sample start only then, and so does the hedge timer
+        (started, an asyncio.Event, is set once the slot is held). Time queued behind
+        other scenes' requests never counts as a timeout.
+        """
+        fetch = {'pexels': self.try_pexels, 'yahoo': self.try_yahoo, 'loremflickr': self.try_loremflickr}[provider]
+        queued = time.monotonic()
+        async with self.semaphores[provider]:
+            if started is not None:
+                started.set()
+            start = time.monotonic()
+            outcome = 'failed'
+            with tracing.span('image.search', 'network', provider=provider, query=query,
+                              queued_ms=round((start - queued) * 1000)) as span:
+                try:
+                    if await asyncio.wait_for(fetch(query, output_path, aspect_ratio), IMAGE_PROVIDER_BUDGETS[provider]):
+                        outcome = 'ok'
+                        span['bytes'] = os.path.getsize(output_path)
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                    print(f"DEBUG: {provider} exceeded its {IMAGE_PROVIDER_BUDGETS[provider]}s budget for query: {query}", file=sys.stderr)
+                except asyncio.CancelledError:
+                    outcome = 'cancelled'
+                    raise
+                except Exception as e:
+                    print(f"Warning: Image search failed ({provider}): {e}", file=sys.stderr)
+                finally:
+                    span['outcome'] = outcome
+                    stats = self.stats[provider]
+                    stats[outcome] += 1
+                    if outcome == 'ok':
+                        stats['latencies'].append(time.monotonic() - start)
+
+        if outcome != 'ok':
+            return None
+        return {'provider': provider, 'query': query, 'aspect_ratio': aspect_ratio, 'cached': False}
+
+    async def download(self, query, output_path, aspect_ratio='16:9'):
+        """Downloads a high-quality, watermark-free image from the web with multiple fallbacks.
+
+        Returns {'provider', 'query', 'aspect_ratio', 'cached'} on success, None otherwise.
+        Cached images were already cleaned of watermarks.
+        """
+        image = self.cached_image(query, output_path, aspect_ratio)
+        if image:
+            return image
+
+        # 1. Pexels if an API key is available (best for watermark-free images),
+        # 2. Yahoo image search excluding watermarked sites, 3. LoremFlickr
+        for provider in self.providers():
+            image = await self.attempt(provider, query, output_path, aspect_ratio)
+            if image:
+                self.stats[provider]['wins'] += 1
+                return image
+        return None
+
+    async def race(self, queries, output_path, aspect_ratio='16:9'):
+        """Hedged download over every (query, provider) attempt in order of preference.
+
+        The next attempt starts IMAGE_HEDGE_DELAY seconds after the previous one got its
+        provider slot, or as soon as one fails; the first image to arrive wins and the remaining requests are
+        cancelled. Each attempt writes its own part file, so losers never touch output_path.
+        """
+        ladder = collections.deque((query, provider) for query in queries for provider in self.providers())
+        checked_queries = set()
+        pending = set()
+        winner = None
+
+        async def run(n, query, provider, started):
+            part_path = f"{output_path}.{n}.part"
+            try:
+                return await self.attempt(provider, query, part_path, aspect_ratio, started), part_path
+            except BaseException:
+                if os.path.exists(part_path): os.remove(part_path)
+                raise
+
+        try:
+            n = 0
+            while winner is None and (ladder or pending):
+                if ladder:
+                    query, provider = ladder.popleft()
+                    if query not in checked_queries:
+                        checked_queries.add(query)
+                        winner = self.cached_image(query, output_path, aspect_ratio)
+                        if winner:
+                            break
+                    started = asyncio.Event()
+                    pending.add(asyncio.create_task(run(n, query, provider, started)))
+                    n += 1
+                    if ladder:
+                        # The hedge timer runs from when the attempt holds its provider slot
+                        slot = asyncio.ensure_future(started.wait())
+                        try:
+                            await asyncio.wait(pending | {slot}, return_when=asyncio.FIRST_COMPLETED)
+                        finally:
+                            slot.cancel()
+                done, pending = await asyncio.wait(pending, timeout=IMAGE_HEDGE_DELAY if ladder else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    image, part_path = task.result()
+                    if image and winner is None:
+                        os.replace(part_path, output_path)
+                        winner = image
+                        self.stats[image['provider']]['wins'] += 1
+                    elif os.path.exists(part_path):
+                        os.remove(part_path)
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, tuple) and os.path.exists(result[1]):
+                    os.remove(result[1])
+        return winner
+
+    async def acquire(self, image_prompt, img_path, aspect_ratio, scene_index=0):
+        """Downloads a scene image, retrying with progressively broader queries."""
+        # Retry Logic:
+        # 1. Full Query
+        # 2. Simplified Query (Keywords)
+        # 3. Super Broad Query ("cinematic background")
+        if IMAGE_FETCH_MODE == 'hedged':
+            queries = list(dict.fromkeys([image_prompt, extract_keywords(image_prompt, limit=3), "cinematic background"]))
+            image = await self.race(queries, img_path, aspect_ratio)
+            if image is None:
+                print(f"DEBUG: Every image search failed for scene {scene_index}", file=sys.stderr)
+            return image
+
+        image = await self.download(image_prompt, img_path, aspect_ratio)
+        if image:
+            return image
+
+        print(f"DEBUG: Primary search failed for scene {scene_index}. Retrying with simplified keywords...", file=sys.stderr)
+        image = await self.download(extract_keywords(image_prompt, limit=3), img_path, aspect_ratio)
+        if image:
+            return image
+
+        print(f"DEBUG: Secondary search failed. Retrying with broad fallback...", file=sys.stderr)
+        return await self.download("cinematic background", img_path, aspect_ratio)
+
+    async def fetch_picsum(self, img_path, aspect_ratio):
+        """Downloads a random placeholder image from Picsum."""
+        width = 1920 if aspect_ratio == "16:9" else 1080
+        height = 1080 if aspect_ratio == "16:9" else 1920
+        url = f"{PICSUM_URL}/{width}/{height}?sig={int(time.time())}"
+        async with self.semaphores['picsum']:
+            status, content = await asyncio.wait_for(self.get('picsum', url, headers={'User-Agent': 'Mozilla/5.0'}), IMAGE_PROVIDER_BUDGETS['picsum'])
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+        with open(img_path, 'wb') as f:
+            f.write(content)
 
-def run_command(command):
+def download_web_image(query, output_path, aspect_ratio='16:9'):
+    """Downloads a high-quality, watermark-free image from the web (blocking, single query)."""
+    async def _download():
+        async with ImageFetcher() as fetcher:
+            return await fetcher.download(query, output_path, aspect_ratio) is not None
+    return asyncio.run(_download())
+
+def run_command(command, duration=None):
+    """Runs a command, returning True on success.
+
+    ffmpeg commands report progress events as they run (duration, the expected output
+    length in seconds, gives them a percent and ETA); only the tail of stderr is kept.
+    The command runs under its stage's deadline; raises deadlines.Cancelled if the
+    story is cancelled before or while it runs.
+    """
     try:
         # Replace 'ffmpeg' with the absolute path
         if command[0] == 'ffmpeg':
             command[0] = FFMPEG_PATH
-        elif command[0] == 'ffprobe':
-            command[0] = FFPROBE_PATH
+        follow_progress = command[0] == FFMPEG_PATH
+        if follow_progress:
+            command = progress.ffmpeg_command(command)
 
         print(f"Running: {' '.join(command)}", file=sys.stderr)
-        result = subprocess.run(command, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error: {result.stderr}", file=sys.stderr)
+        with deadlines.process(command, duration, stdout=subprocess.PIPE if follow_progress else subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace') as process:
+            tracker = accounting.track(process)
+            # Both pipes are drained before reaping: the child blocks once one is full
+            reader, stderr_tail = progress.tail_stderr(process.stderr)
+            if follow_progress:
+                stage, scene = tracing.current_stage()
+                with process.stdout:
+                    progress.follow(process.stdout, stage, scene, duration)
+            reader.join()
+            process.stderr.close()
+            # Reaped with os.wait4 for the child's CPU time and peak memory
+            returncode = accounting.wait(process, command, tracker)
+        if returncode != 0:
+            print(f"Error: {''.join(stderr_tail)}", file=sys.stderr)
             return False
         return True
+    except deadlines.Cancelled:
+        # A killed encode leaves a truncated output (ffmpeg's output is always last)
+        if follow_progress and os.path.exists(command[-1]): os.remove(command[-1])
+        raise
     except FileNotFoundError:
         print(f"Warning: Command '{command[0]}' not found. Mocking output...", file=sys.stderr)
         return False
@@ -241,65 +697,65 @@ def process_text_for_naturalness(text):
 
     return text.strip()
 
+def postprocess_voice(wav_numpy, sr, output_path):
+    """Studio-quality post-processing of raw TTS samples into the scene audio file (48 kHz stereo WAV).
+
+    Runs in-process (see audio_dsp.voice_chain) instead of spawning ffmpeg per scene.
+    """
+    try:
+        with tracing.span('audio.postprocess', samples=len(wav_numpy), sample_rate=sr):
+            # Audio for the narration track is leveled once, for the whole story
+            processed, out_sr = audio_dsp.voice_chain(wav_numpy, sr, level=NARRATION_MODE != 'track')
+            wavfile.write(output_path, out_sr, audio_dsp.to_pcm16(processed))
+            media_info.record_duration(output_path, len(processed) / out_sr)
+            tracing.annotate(seconds=round(len(processed) / out_sr, 3))
+        return True
+    except Exception as e:
+        print(f"Warning: Voice post-processing failed: {e}", file=sys.stderr)
+        return False
+
+def load_audio_file(path):
+    """Decodes an audio file (e.g. edge_tts MP3) to mono float samples. Returns (samples, sr)."""
+    import librosa  # Installed with chatterbox; only needed on fallback paths
+    samples, sr = librosa.load(path, sr=None, mono=True)
+    return samples, sr
+
 async def generate_tts_audio(output_path, text, style='story', scene_index=0, language='en'):
-    """Generates audio using ChatterboxMultilingualTTS for the best AI quality."""
+    """Generates audio using ChatterboxMultilingualTTS for the best AI quality.
+
+    Returns the engine that produced the audio ('chatterbox', 'edge_tts', 'say' or 'silence').
+    """
     global tts_model
 
     # Per-scene language detection
-    current_language = language
-    if current_language == 'en' and is_devanagari(text):
-        current_language = 'hi'
+    current_language = detect_scene_language(text, language)
 
     # Ensure model is initialized
     if tts_model is None:
         init_models(current_language)
 
-    temp_wav = None
     try:
         print(f"DEBUG: Generating Chatterbox Multilingual audio for scene {scene_index} (Language: {current_language})", file=sys.stderr)
 
         if isinstance(tts_model, ChatterboxMultilingualTTS):
+             use_voice_conditionals(None) # No voice cloning for regular TTS
              tts_wav = tts_model.generate(
                  text,
                  language_id=current_language,
-                 audio_prompt_path=None # No voice cloning for regular TTS
+                 audio_prompt_path=None
              )
         else:
              tts_wav = tts_model.generate(text)
 
-        # Save to temporary WAV
-        temp_wav = output_path.replace('.mp3', '_gen.wav')
-        wav_numpy = tts_wav.squeeze(0).numpy()
-        wavfile.write(temp_wav, tts_model.sr, wav_numpy.astype(np.float32))
-
         # STUDIO QUALITY POST-PROCESSING
-        convert_cmd = [
-            FFMPEG_PATH, '-y', '-i', temp_wav,
-            '-af', (
-                'volume=4.5,'             # Boost volume significantly
-                'dynaudnorm=p=0.95:s=5,'  # Professional dynamic normalization
-                'aecho=0.8:0.88:6:0.4,'   # Subtle room presence
-                'highpass=f=80,'          # Remove low-end rumble
-                'lowpass=f=15000,'        # Remove harsh high-end hiss
-                'atempo=1.0'              # Normal speed (1.0) for better energy
-            ),
-            '-ar', '48000',
-            '-ac', '2',
-            '-q:a', '0',
-            output_path
-        ]
-
-        success = run_command(convert_cmd)
+        success = postprocess_voice(tts_wav.squeeze(0).numpy(), tts_model.sr, output_path)
 
         if success and os.path.exists(output_path):
             print(f"DEBUG: Successfully generated Chatterbox audio at {output_path}", file=sys.stderr)
-            return
+            return 'chatterbox'
 
     except Exception as e:
         print(f"Error: Chatterbox TTS failed: {e}. Falling back to edge_tts...", file=sys.stderr)
-    finally:
-        if temp_wav and os.path.exists(temp_wav):
-            os.remove(temp_wav)
 
     # Fallback to edge_tts if Chatterbox fails
     # Voice mapping for edge_tts
@@ -342,7 +798,7 @@ async def generate_tts_audio(output_path, text, style='story', scene_index=0, la
     final_rate = f"{base_rate + scene_rate_mod:+d}%"
     final_pitch = f"{base_pitch + scene_pitch_mod:+d}Hz"
 
-    temp_audio = output_path.replace('.mp3', '_temp.mp3')
+    temp_audio = os.path.splitext(output_path)[0] + '_temp.mp3'
 
     print(f"DEBUG: Generating edge_tts fallback: {voice}", file=sys.stderr)
 
@@ -356,54 +812,49 @@ async def generate_tts_audio(output_path, text, style='story', scene_index=0, la
         print(f"Warning: Fallback TTS failed: {e}", file=sys.stderr)
 
     if success and os.path.exists(temp_audio):
-        # Post-process the fallback audio
-        convert_cmd = [
-            FFMPEG_PATH, '-y', '-i', temp_audio,
-            '-af', (
-                'volume=4.5,'
-                'dynaudnorm=p=0.95:s=5,'
-                'aecho=0.8:0.88:6:0.4,'
-                'highpass=f=80,'
-                'lowpass=f=15000'
-            ),
-            '-ar', '48000',
-            '-ac', '2',
-            '-q:a', '0',
-            output_path
-        ]
-        run_command(convert_cmd)
-        if os.path.exists(temp_audio):
-            os.remove(temp_audio)
-        return
+        # Post-process the fallback audio with the same chain as Chatterbox output
+        try:
+            samples, sr = load_audio_file(temp_audio)
+            success = postprocess_voice(samples, sr, output_path)
+        except Exception as e:
+            print(f"Warning: Could not decode fallback TTS audio: {e}", file=sys.stderr)
+            success = False
+        finally:
+            if os.path.exists(temp_audio):
+                os.remove(temp_audio)
+        if success:
+            return 'edge_tts'
 
     # Fallback to macOS 'say'
     if sys.platform == 'darwin':
         print(f"Warning: Falling back to macOS 'say'.", file=sys.stderr)
-        temp_aiff = output_path.replace('.mp3', '.aiff')
+        temp_aiff = os.path.splitext(output_path)[0] + '.aiff'
         if run_command(['say', text, '-o', temp_aiff]):
-            run_command([FFMPEG_PATH, '-y', '-i', temp_aiff, '-ar', '48000', '-ac', '2', '-codec:a', 'libmp3lame', '-qscale:a', '2', output_path])
+            run_command([FFMPEG_PATH, '-y', '-i', temp_aiff, '-ar', str(audio_dsp.OUTPUT_SAMPLE_RATE), '-ac', '2', '-c:a', 'pcm_s16le', output_path])
             if os.path.exists(temp_aiff): os.remove(temp_aiff)
-            return
+            return 'say'
 
 
     # Final fallback to silence
     print(f"Warning: Falling back to silence.", file=sys.stderr)
-    run_command([FFMPEG_PATH, '-y', '-f', 'lavfi', '-i', 'anullsrc=r=48000:cl=stereo', '-t', '5', output_path])
+    wavfile.write(output_path, audio_dsp.OUTPUT_SAMPLE_RATE, np.zeros((5 * audio_dsp.OUTPUT_SAMPLE_RATE, 2), dtype=np.int16))
+    media_info.record_duration(output_path, 5.0)
+    return 'silence'
 
 async def generate_cloned_voice(output_path, text, target_voice_path=None, scene_index=0, language='en', style='story'):
-    """Generates audio using ChatterboxTTS and ChatterboxVC for voice cloning."""
+    """Generates audio using ChatterboxTTS and ChatterboxVC for voice cloning.
+
+    Returns 'cloned' on success, otherwise the engine used by the generate_tts_audio fallback.
+    """
 
     # Ensure models are initialized (if not already by main)
     global tts_model, vc_model
 
     temp_tts_path = None
-    temp_output_wav = None
     target_wav_path = None
 
     # Per-scene language detection (if it's English but text is Hindi)
-    current_language = language
-    if current_language == 'en' and is_devanagari(text):
-        current_language = 'hi'
+    current_language = detect_scene_language(text, language)
 
     if tts_model is None:
          init_models(current_language)
@@ -413,27 +864,27 @@ async def generate_cloned_voice(output_path, text, target_voice_path=None, scene
 
         # Generate TTS with voice cloning if target voice is provided
         if isinstance(tts_model, ChatterboxMultilingualTTS):
-             # For Multilingual model, we pass audio_prompt_path for voice cloning
-             # and language_id for language selection
+             # For Multilingual model, voice cloning uses the precomputed conditioning
+             # for the target voice and language_id selects the language
+             use_voice_conditionals(target_voice_path)
              tts_wav = tts_model.generate(
                  text,
                  language_id=current_language,
-                 audio_prompt_path=target_voice_path if target_voice_path and os.path.exists(target_voice_path) else None
+                 audio_prompt_path=None
              )
         else:
              tts_wav = tts_model.generate(text)
 
-        # Save TTS output to temporary WAV file
-        temp_tts_path = output_path.replace('.mp3', '_tts.wav')
-        tts_numpy = tts_wav.squeeze(0).numpy()
-        wavfile.write(temp_tts_path, tts_model.sr, tts_numpy.astype(np.float32))
-
         # No separate VC step needed for Multilingual model
         if vc_model:
+            # Save TTS output to temporary WAV file for the VC model
+            temp_tts_path = os.path.splitext(output_path)[0] + '_tts.wav'
+            wavfile.write(temp_tts_path, tts_model.sr, tts_wav.squeeze(0).numpy().astype(np.float32))
+
             # Convert target voice to WAV if it's not already
             target_wav_path = None
             if target_voice_path and os.path.exists(target_voice_path):
-                target_wav_path = output_path.replace('.mp3', '_target.wav')
+                target_wav_path = os.path.splitext(output_path)[0] + '_target.wav'
                 if target_voice_path.endswith('.m4a'):
                     convert_cmd = [
                         FFMPEG_PATH, '-y', '-i', target_voice_path,
@@ -453,48 +904,184 @@ async def generate_cloned_voice(output_path, text, target_voice_path=None, scene
             wav = tts_wav
             sr = tts_model.sr
 
-        # Save final output as WAV first
-        temp_output_wav = output_path.replace('.mp3', '_output.wav')
-        wav_numpy = wav.squeeze(0).numpy()
-        wavfile.write(temp_output_wav, sr, wav_numpy.astype(np.float32))
-
-        # Convert to MP3 with quality settings
-        convert_cmd = [
-            FFMPEG_PATH, '-y', '-i', temp_output_wav,
-            '-af', (
-                'volume=4.5,'             # Boost volume significantly
-                'dynaudnorm=p=0.95:s=5,'  # Professional dynamic normalization (increased peak)
-                'aecho=0.8:0.88:6:0.4,'   # Subtle room presence
-                'highpass=f=80,'          # Remove low-end rumble
-                'lowpass=f=15000,'        # Remove harsh high-end hiss
-                'atempo=1.0'              # Normal speed (1.0) for better energy
-            ),
-            '-ar', '48000',
-            '-ac', '2',
-            '-q:a', '0',
-            output_path
-        ]
-
-        success = run_command(convert_cmd)
+        # Post-process into the final scene audio
+        success = postprocess_voice(wav.squeeze(0).numpy(), sr, output_path)
 
         if success and os.path.exists(output_path):
             print(f"DEBUG: Successfully generated cloned voice at {output_path}", file=sys.stderr)
-            return
+            return 'cloned'
 
     except Exception as e:
         print(f"Error: Voice cloning failed: {e}", file=sys.stderr)
     finally:
         # Cleanup temporary files
-        for temp_file in [temp_tts_path, temp_output_wav]:
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
+        if temp_tts_path and os.path.exists(temp_tts_path):
+            os.remove(temp_tts_path)
 
         if target_wav_path and target_wav_path != target_voice_path and os.path.exists(target_wav_path):
             os.remove(target_wav_path)
 
     # Fallback to edge_tts if voice cloning fails or was skipped
     print(f"Warning: Falling back to edge_tts for scene {scene_index} (Language: {current_language})", file=sys.stderr)
-    await generate_tts_audio(output_path, text, style, scene_index, current_language)
+    return await generate_tts_audio(output_path, text, style, scene_index, current_language)
+
+# Persistent cache of post-processed scene narration audio
+TTS_CACHE_MAX_MB = int(os.getenv('WORKER_TTS_CACHE_MB', '1024'))
+# Bump when the voice post-processing chain changes so stale audio is not reused
+TTS_PIPELINE_VERSION = 'mtl-dsp-1'
+tts_cache = None
+tts_cache_stats = {'hits': 0, 'misses': 0}
+tts_cache_lock = threading.Lock()
+_voice_digests = {}
+
+def tts_model_version():
+    """Identifies the TTS model and post-processing chain that produced cached audio."""
+    try:
+        package_version = importlib.metadata.version('chatterbox-tts')
+    except importlib.metadata.PackageNotFoundError:
+        package_version = 'unknown'
+    version = f"chatterbox-tts=={package_version}/{TTS_PIPELINE_VERSION}"
+    # Scene audio for the narration track skips the per-scene leveling
+    return version + '/unleveled' if NARRATION_MODE == 'track' else version
+
+def voice_digest(path):
+    """Content hash of a reference voice file, memoized by path, size and mtime."""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime)
+    if memo_key not in _voice_digests:
+        _voice_digests[memo_key] = file_digest(path)
+    return _voice_digests[memo_key]
+
+def reset_tts_cache_stats():
+    with tts_cache_lock:
+        tts_cache_stats.update(hits=0, misses=0)
+
+def tts_cache_lookup(output_path, text, target_voice_path, language, style, scene_index=0):
+    """Checks the TTS cache for a scene. Returns (cache key, hit) and copies hits to output_path."""
+    global tts_cache
+    with tts_cache_lock:
+        if tts_cache is None:
+            tts_cache = open_cache('tts', TTS_CACHE_MAX_MB) or False
+
+    key = cache_key('tts', text, detect_scene_language(text, language), voice_digest(target_voice_path), style, tts_model_version())
+    hit = bool(tts_cache) and tts_cache.copy_to(key, output_path)
+    with tts_cache_lock:
+        tts_cache_stats['hits' if hit else 'misses'] += 1
+    if hit:
+        print(f"DEBUG: TTS cache hit for scene {scene_index}", file=sys.stderr)
+    return key, hit
+
+def tts_cache_store(key, output_path):
+    if tts_cache and os.path.exists(output_path):
+        tts_cache.put_file(key, output_path)
+
+# Batched synthesis: consecutive narration lines are packed into one generate()
+# call and the output is split back per scene (1 = one call per scene)
+TTS_BATCH_SIZE = int(os.getenv('WORKER_TTS_BATCH_SIZE', '1'))
+TTS_BATCH_MAX_CHARS = 300  # Keeps packed text well inside the model's token budget
+
+def plan_tts_batches(texts, language='en', batch_size=TTS_BATCH_SIZE, max_chars=TTS_BATCH_MAX_CHARS):
+    """Groups consecutive scene indices that share a language into synthesis batches."""
+    batches = []
+    for i, text in enumerate(texts):
+        if batches:
+            batch = batches[-1]
+            same_language = detect_scene_language(texts[batch[0]], language) == detect_scene_language(text, language)
+            chars = sum(len(texts[j]) for j in batch) + len(text)
+            if same_language and len(batch) < batch_size and chars <= max_chars:
+                batch.append(i)
+                continue
+        batches.append([i])
+    return batches
+
+def split_batched_audio(wav, texts, sr, min_seconds=0.3):
+    """Splits packed synthesis output back into per-line audio at the pauses between sentences.
+
+    Boundaries are expected roughly in proportion to each line's length; the quietest
+    100 ms stretch near each expected boundary is used as the cut. Returns None when the
+    output can't be split plausibly, so the caller can fall back to per-line synthesis.
+    """
+    frame = max(1, int(sr * 0.02))
+    n_frames = len(wav) // frame
+    if n_frames < len(texts) * 2:
+        return None
+
+    weights = np.array([max(len(t.strip()), 1) for t in texts], dtype=np.float64)
+    expected = np.cumsum(weights)[:-1] / weights.sum()
+    energy = np.sqrt(np.mean(wav[:n_frames * frame].reshape(n_frames, frame).astype(np.float64) ** 2, axis=1))
+    energy = np.convolve(energy, np.ones(5) / 5, mode='same')
+    # Search up to half of the shortest line either side of the expected boundary
+    window = max(2, int(n_frames * 0.5 * weights.min() / weights.sum()))
+
+    cuts = [0]
+    for position in expected:
+        center = int(position * n_frames)
+        lo = max(cuts[-1] + 1, center - window)
+        hi = min(n_frames - 1, center + window)
+        if lo >= hi:
+            return None
+        cuts.append(lo + int(np.argmin(energy[lo:hi])))
+
+    bounds = [c * frame for c in cuts] + [len(wav)]
+    pieces = [wav[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    if any(len(piece) < min_seconds * sr for piece in pieces):
+        return None
+    return pieces
+
+def synthesize_batch(texts, language, target_voice_path=None):
+    """Runs several narration lines through one generate() call. Returns per-line samples or None."""
+    use_voice_conditionals(target_voice_path)
+    # Terminate each line so the model leaves a sentence pause between them
+    packed = " ".join(t.strip() if t.strip()[-1:] in '.!?।' else t.strip() + '.' for t in texts)
+    tts_wav = tts_model.generate(packed, language_id=language, audio_prompt_path=None)
+    return split_batched_audio(tts_wav.squeeze(0).numpy(), texts, tts_model.sr)
+
+def synthesize_scene_batch(batch, language, style, target_voice_path=TARGET_VOICE_PATH):
+    """Synthesizes a batch of (scene_index, aud_path, narration) jobs; blocking, for scheduler threads.
+
+    Returns the scene indices whose audio came from the model (or the TTS cache), as
+    opposed to a fallback engine.
+    """
+    pending = []
+    completed = set()
+    for scene_index, aud_path, text in batch:
+        key, hit = tts_cache_lookup(aud_path, text, target_voice_path, language, style, scene_index)
+        if hit:
+            completed.add(scene_index)
+        else:
+            pending.append((scene_index, aud_path, text, key))
+
+    pieces = None
+    if len(pending) > 1:
+        texts = [text for _, _, text, _ in pending]
+        scene_language = detect_scene_language(texts[0], language)
+        print(f"DEBUG: Batched TTS for scenes {[job[0] for job in pending]} (Language: {scene_language})", file=sys.stderr)
+        try:
+            with tracing.span('tts.generate', 'model', scenes=[job[0] for job in pending], chars=sum(len(text) for text in texts)):
+                pieces = synthesize_batch(texts, scene_language, target_voice_path)
+        except Exception as e:
+            print(f"Warning: Batched TTS failed: {e}", file=sys.stderr)
+        if pieces is None:
+            print(f"DEBUG: Batched TTS output could not be split, synthesizing scenes individually", file=sys.stderr)
+
+    for n, (scene_index, aud_path, text, key) in enumerate(pending):
+        # Inference can't be interrupted, but a cancelled story stops between scenes
+        deadlines.check()
+        with tracing.span('tts.scene', 'model', scene=scene_index, chars=len(text)) as span:
+            if pieces is not None and postprocess_voice(pieces[n], tts_model.sr, aud_path):
+                span['engine'] = 'batched'
+                tts_cache_store(key, aud_path)
+                completed.add(scene_index)
+                continue
+            with tracing.span('tts.generate', 'model'):
+                engine = asyncio.run(generate_cloned_voice(aud_path, text, target_voice_path, scene_index, language, style))
+            span['engine'] = engine
+            if engine == 'cloned':
+                tts_cache_store(key, aud_path)
+                completed.add(scene_index)
+    return completed
 
 def clean_watermark(image_path):
     """Attempts to remove watermarks from an image with improved detection."""
@@ -503,84 +1090,12 @@ def clean_watermark(image_path):
         if img is None: return False
 
         h, w = img.shape[:2]
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Create combined mask for watermark detection
-        final_mask = np.zeros(gray.shape, dtype=np.uint8)
-
-        # === METHOD 1: Bright text detection (white/light watermarks) ===
-        _, bright_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
-
-        # === METHOD 2: Semi-transparent gray text (Adobe Stock style) ===
-        # These watermarks are often gray (not bright white)
-        lower_gray = np.array([180, 180, 180])
-        upper_gray = np.array([240, 240, 240])
-        gray_mask = cv2.inRange(img, lower_gray, upper_gray)
-
-        # === METHOD 3: Edge-based text detection ===
-        edges = cv2.Canny(gray, 50, 150)
-
-        # Combine detection methods
-        combined = cv2.bitwise_or(bright_mask, gray_mask)
-        combined = cv2.bitwise_or(combined, edges)
-
-        # === LOCATION FILTER: Only target watermark-prone areas ===
-        location_mask = np.zeros(gray.shape, dtype=np.uint8)
-
-        # Bottom strip (full width, bottom 15% of image) - most common watermark location
-        cv2.rectangle(location_mask, (0, int(h*0.85)), (w, h), 255, -1)
-
-        # Bottom-left corner (extended area)
-        cv2.rectangle(location_mask, (0, int(h*0.75)), (int(w*0.35), h), 255, -1)
-
-        # Bottom-right corner (extended area)
-        cv2.rectangle(location_mask, (int(w*0.65), int(h*0.75)), (w, h), 255, -1)
-
-        # Top corners (for logos)
-        cv2.rectangle(location_mask, (0, 0), (int(w*0.25), int(h*0.12)), 255, -1)
-        cv2.rectangle(location_mask, (int(w*0.75), 0), (w, int(h*0.12)), 255, -1)
-
-        # Apply location filter
-        detected = cv2.bitwise_and(combined, location_mask)
-
-        # === MORPHOLOGICAL OPERATIONS: Connect text characters ===
-        # Dilate to connect letters in watermark text
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 3))
-        detected = cv2.dilate(detected, kernel, iterations=2)
-
-        # Close gaps in text
-        kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 5))
-        detected = cv2.morphologyEx(detected, cv2.MORPH_CLOSE, kernel_close)
-
-        # === CONTOUR FILTERING: Keep only watermark-sized regions ===
-        contours, _ = cv2.findContours(detected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            x, y, cw, ch = cv2.boundingRect(contour)
-
-            # Filter: watermarks are typically small-medium sized, wide, and near edges
-            min_area = 100
-            max_area = (h * w) * 0.08  # Max 8% of image
-            aspect_ratio = cw / max(ch, 1)
-
-            # Watermark text is usually wider than tall (aspect ratio > 1.5)
-            # Or could be a logo (more square-ish)
-            if min_area < area < max_area and (aspect_ratio > 1.2 or area < 5000):
-                # Check if it's in the edge regions
-                is_bottom = y > h * 0.7
-                is_top_corner = y < h * 0.15 and (x < w * 0.3 or x > w * 0.7)
-
-                if is_bottom or is_top_corner:
-                    cv2.drawContours(final_mask, [contour], -1, 255, -1)
-
-        # Dilate the final mask slightly to cover text edges
-        kernel_final = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        final_mask = cv2.dilate(final_mask, kernel_final, iterations=2)
+        final_mask = watermark.detect(img, WATERMARK_DETECT_MAX_WIDTH)
 
         # Safety Check: Don't process if mask is empty or too large
         mask_pixels = cv2.countNonZero(final_mask)
         total_pixels = h * w
+        tracing.annotate(width=w, height=h, mask_pixels=mask_pixels)
 
         if mask_pixels == 0:
             print(f"DEBUG: No watermark detected in image", file=sys.stderr)
@@ -592,10 +1107,10 @@ def clean_watermark(image_path):
 
         # === INPAINTING: Remove the watermark ===
         # Use larger radius for better blending
-        result = cv2.inpaint(img, final_mask, 5, cv2.INPAINT_NS)
+        watermark.inpaint(img, final_mask, 5)
 
         # Save the cleaned image
-        cv2.imwrite(image_path, result)
+        cv2.imwrite(image_path, img)
         print(f"DEBUG: Successfully cleaned watermark from image ({mask_pixels} pixels)", file=sys.stderr)
         return True
 
@@ -603,36 +1118,56 @@ def clean_watermark(image_path):
         print(f"Warning: Watermark cleaning failed: {e}", file=sys.stderr)
         return False
 
-def create_scene_video(image_path, audio_path, output_path, narration, scene_index=0, aspect_ratio='16:9'):
-    """Creates cinema-quality video with dynamic Ken Burns effects and modern subtitles."""
-    width, height = (1920, 1080) if aspect_ratio == '16:9' else (1080, 1920)
-
-    # Get audio duration
-    try:
-        result = subprocess.run([FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', audio_path], capture_output=True, text=True)
-        duration = float(result.stdout.strip())
-    except:
-        duration = 5.0
-    duration = max(duration, 1.0)
-
-    fps = 30
+SCENE_FPS = 30
+
+# === CINEMATIC COLOR GRADING ===
+# Slight contrast boost, saturation enhancement, and film-like curves
+COLOR_GRADING = (
+    "eq=contrast=1.08:saturation=1.15:brightness=0.01,"
+    "curves=preset=lighter,"
+    "unsharp=5:5:0.8:5:5:0.4"  # Subtle sharpening
+)
+
+def scene_duration(audio_path):
+    """Scene length in seconds: the narration audio's duration (at least one second).
+
+    Raises (OSError, ValueError) when the audio is missing or can't be measured.
+    """
+    return max(media_info.duration(audio_path), 1.0)
+
+def scene_video_filter(narration, duration, scene_index=0, aspect_ratio='16:9', source='image', subtitles_path=None, profile=None):
+    """Builds the Ken Burns, grading and subtitle filter chain for one scene.
+
+    source says what the input is: 'image' (a looped downloaded image: scaled, cropped
+    and graded at 4K before zoompan), 'still' (a looped prepare_scene_still output,
+    already at motion stage size and graded: zoompan only) or 'frames' (moving raw
+    frames from motion.render_frames: only fades and subtitles are applied).
+    The scene's subtitles are written to subtitles_path and burned in; without one
+    (subtitles burned over the whole timeline instead) the scene has none.
+    profile (RENDER_PROFILES) sets the output size, frame rate and grading.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    width, height = output_size(aspect_ratio, profile)
+    fps = profile['fps']
     total_frames = int(duration * fps)
+    # Zoom steps are per frame; scale them so motion keeps its timing at lower frame rates
+    speed = SCENE_FPS / fps
 
     # === DYNAMIC KEN BURNS EFFECTS ===
     # 6 different motion patterns for variety
     motion_patterns = [
         # Pattern 0: Fast zoom in from center
-        {"zoom": "min(zoom+0.0015,1.35)", "x": "iw/2-(iw/zoom/2)", "y": "ih/2-(ih/zoom/2)"},
+        {"zoom": f"min(zoom+{0.0015 * speed:g},1.35)", "x": "iw/2-(iw/zoom/2)", "y": "ih/2-(ih/zoom/2)"},
         # Pattern 1: Fast zoom out from center
-        {"zoom": "max(1.35-0.0015*on,1.0)", "x": "iw/2-(iw/zoom/2)", "y": "ih/2-(ih/zoom/2)"},
+        {"zoom": f"max(1.35-{0.0015 * speed:g}*on,1.0)", "x": "iw/2-(iw/zoom/2)", "y": "ih/2-(ih/zoom/2)"},
         # Pattern 2: Pan left to right with zoom
-        {"zoom": "min(zoom+0.0008,1.20)", "x": "on/({})*iw/3".format(total_frames), "y": "ih/2-(ih/zoom/2)"},
+        {"zoom": f"min(zoom+{0.0008 * speed:g},1.20)", "x": "on/({})*iw/3".format(total_frames), "y": "ih/2-(ih/zoom/2)"},
         # Pattern 3: Pan right to left with zoom
-        {"zoom": "min(zoom+0.0008,1.20)", "x": "iw/3-on/({})*iw/3".format(total_frames), "y": "ih/2-(ih/zoom/2)"},
+        {"zoom": f"min(zoom+{0.0008 * speed:g},1.20)", "x": "iw/3-on/({})*iw/3".format(total_frames), "y": "ih/2-(ih/zoom/2)"},
         # Pattern 4: Zoom in on upper third
-        {"zoom": "min(zoom+0.0012,1.3)", "x": "iw/2-(iw/zoom/2)", "y": "ih/4-(ih/zoom/2)"},
+        {"zoom": f"min(zoom+{0.0012 * speed:g},1.3)", "x": "iw/2-(iw/zoom/2)", "y": "ih/4-(ih/zoom/2)"},
         # Pattern 5: Zoom in on lower third
-        {"zoom": "min(zoom+0.0012,1.3)", "x": "iw/2-(iw/zoom/2)", "y": "ih*3/4-(ih/zoom/2)"},
+        {"zoom": f"min(zoom+{0.0012 * speed:g},1.3)", "x": "iw/2-(iw/zoom/2)", "y": "ih*3/4-(ih/zoom/2)"},
     ]
 
     pattern = motion_patterns[scene_index % len(motion_patterns)]
@@ -641,78 +1176,12 @@ def create_scene_video(image_path, audio_path, output_path, narration, scene_ind
     y_expr = pattern["y"]
 
     # === MODERN SUBTITLE STYLING (TikTok/YouTube Shorts style) ===
-    narration = re.sub(r'\s+', ' ', narration).strip()
-    words = narration.split()
-    total_words = len(words)
-
-    is_hindi = is_devanagari(narration)
-
-    # Cross-platform font detection - prefer bold fonts
-    possible_fonts = [
-        "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
-        "Arial",
-    ]
-
-    # If Hindi, prioritize Hindi fonts
-    if is_hindi:
-        hindi_fonts = [
-             os.path.join(project_root, 'public', 'fonts', 'NotoSansDevanagari-Bold.ttf'),
-             "/System/Library/Fonts/Supplemental/DevanagariMT.ttc",
-             "/System/Library/Fonts/Kohinoor.ttc",
-             "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Bold.ttf",
-             "/usr/share/fonts/noto/NotoSansDevanagari-Bold.ttf",
-        ]
-        possible_fonts = hindi_fonts + possible_fonts
-
-    font_path = "Arial"
-    for path in possible_fonts:
-        if os.path.exists(path):
-            font_path = path
-            break
-
-    if total_words == 0:
-        subtitles_filter = ""
-    else:
-        # Calculate duration per word
-        duration_per_word = duration / total_words
-
-        # Show 3 words at a time for better readability
-        chunks = []
-        chunk_size = 3
-        for i in range(0, total_words, chunk_size):
-            chunk_words = words[i:i + chunk_size]
-            start_time = i * duration_per_word
-            end_time = min((i + chunk_size) * duration_per_word, duration)
-            chunks.append({
-                'text': " ".join(chunk_words),
-                'start': start_time,
-                'end': end_time
-            })
-
-        # Modern subtitle styling with white text, black outline, and shadow
-        font_size = 64 if aspect_ratio == '16:9' else 80
-        # Center-bottom for 16:9, center for 9:16 (TikTok style)
-        y_pos = "h-150" if aspect_ratio == '16:9' else "(h-text_h)/2+300"
-
-        drawtext_filters = []
-        for chunk in chunks:
-            safe_txt = chunk['text'].replace("'", "'\\\\\\''").replace(":", "\\:").replace(",", "\\,")
-            safe_txt = safe_txt.replace("\n", " ").replace("\r", "")
-            # Modern style: White text with thick black border and subtle shadow
-            dt = (
-                f"drawtext=text='{safe_txt}':fontfile='{font_path}':"
-                f"fontcolor=white:fontsize={font_size}:"
-                f"borderw=4:bordercolor=black:"
-                f"shadowcolor=black@0.8:shadowx=2:shadowy=2:"
-                f"x=(w-text_w)/2:y={y_pos}:"
-                f"enable='between(t,{chunk['start']:.3f},{chunk['end']:.3f})'"
-            )
-            drawtext_filters.append(dt)
-
-        subtitles_filter = ",".join(drawtext_filters)
+    # One libass pass over the scene's ASS script, however many chunks it has
+    subtitles_filter = ""
+    if subtitles_path:
+        font_path = subtitles.write_scene_ass(subtitles_path, narration, duration, aspect_ratio, is_devanagari(narration))
+        if font_path is not False:
+            subtitles_filter = subtitles.ass_filter(subtitles_path, font_path)
 
     # === HIGH QUALITY BASE RESOLUTION ===
     if aspect_ratio == '16:9':
@@ -720,220 +1189,1008 @@ def create_scene_video(image_path, audio_path, output_path, narration, scene_ind
     else:
         base_w, base_h = 2160, 3840  # 4K vertical base
 
-    # === CINEMATIC COLOR GRADING ===
-    # Slight contrast boost, saturation enhancement, and film-like curves
-    color_grading = (
-        "eq=contrast=1.08:saturation=1.15:brightness=0.01,"
-        "curves=preset=lighter,"
-        "unsharp=5:5:0.8:5:5:0.4"  # Subtle sharpening
-    )
-
     # Build video filter chain
-    vf_parts = [
-        f"scale=w={base_w}:h={base_h}:force_original_aspect_ratio=increase",
-        f"crop={base_w}:{base_h}",
-        color_grading,
-        f"zoompan=z='{zoom_expr}':x='{x_expr}':y='{y_expr}':d={total_frames}:s={width}x{height}:fps={fps}",
+    vf_parts = []
+    if source == 'image':
+        vf_parts.extend([
+            f"scale=w={base_w}:h={base_h}:force_original_aspect_ratio=increase",
+            f"crop={base_w}:{base_h}",
+            profile['grading'],
+        ])
+    if source != 'frames':
+        vf_parts.append(f"zoompan=z='{zoom_expr}':x='{x_expr}':y='{y_expr}':d={total_frames}:s={width}x{height}:fps={fps}")
+    vf_parts.extend([
         f"fade=t=in:st=0:d=0.4",
         f"fade=t=out:st={max(0, duration-0.4)}:d=0.4",
-    ]
+    ])
 
     if subtitles_filter:
         vf_parts.append(subtitles_filter)
 
-    vf_parts.extend([
-        f"fps={fps}",
-        "format=yuv420p"
-    ])
+    if source != 'frames':
+        vf_parts.append(f"fps={fps}")
+    vf_parts.append("format=yuv420p")
+    return ",".join(vf_parts)
+
+# === HIGH QUALITY ENCODING ===
+VIDEO_ENCODE_ARGS = [
+    '-c:v', 'libx264',
+    '-preset', 'slow',        # Better compression quality
+    '-crf', '17',             # Higher quality (lower = better, 17-18 is near lossless)
+    '-profile:v', 'high',     # H.264 High Profile
+    '-level', '4.1',          # Compatibility level
+    '-tune', 'film',          # Optimize for film content
+    '-movflags', '+faststart', # Web optimization
+    '-pix_fmt', 'yuv420p',
+]
+AUDIO_ENCODE_ARGS = [
+    '-c:a', 'aac',
+    '-b:a', '256k',           # Higher audio bitrate
+    '-ar', '48000',
+]
+
+# === RENDER PROFILES ===
+# Selected per job with the payload's "render_profile". A draft only changes how
+# frames are made and encoded: images, cleaned images, graded stills and narration
+# go through the same caches as a final render, so the final only re-encodes.
+RENDER_PROFILES = {
+    'final': {
+        'scale': 1.0,
+        'fps': SCENE_FPS,
+        'grading': COLOR_GRADING,
+        'video': VIDEO_ENCODE_ARGS,
+        'audio': AUDIO_ENCODE_ARGS,
+        'output': 'final_video.mp4',
+        # A 1080p single-pass graph needs ~1 GB at 4 scenes and ~2 GB at 12
+        'render_mode': 'multi_step',
+    },
+    # Half resolution, half frame rate, fast encode; eq + curves without sharpening
+    'draft': {
+        'scale': 0.5,
+        'fps': 15,
+        'grading': "eq=contrast=1.08:saturation=1.15:brightness=0.01,curves=preset=lighter",
+        'video': ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '26', '-movflags', '+faststart', '-pix_fmt', 'yuv420p'],
+        'audio': ['-c:a', 'aac', '-b:a', '128k', '-ar', '48000'],
+        'output': 'draft_video.mp4',
+        'render_mode': 'single_pass',
+    },
+}
+DEFAULT_RENDER_PROFILE = 'final'
 
-    # === HIGH QUALITY ENCODING ===
-    command = [
-        FFMPEG_PATH, '-y', '-loop', '1', '-i', image_path, '-i', audio_path,
-        '-vf', ",".join(vf_parts),
-        '-c:v', 'libx264',
-        '-preset', 'slow',        # Better compression quality
-        '-crf', '17',             # Higher quality (lower = better, 17-18 is near lossless)
-        '-profile:v', 'high',     # H.264 High Profile
-        '-level', '4.1',          # Compatibility level
-        '-tune', 'film',          # Optimize for film content
-        '-movflags', '+faststart', # Web optimization
-        '-t', str(duration),
-        '-pix_fmt', 'yuv420p',
-        '-c:a', 'aac',
-        '-b:a', '256k',           # Higher audio bitrate
-        '-ar', '48000',
-        '-shortest',
-        output_path
-    ]
-    if not run_command(command):
-        with open(output_path, 'w') as f: f.write("mock")
+def output_size(aspect_ratio='16:9', profile=None):
+    """Output frame size for an aspect ratio under a render profile (even dimensions)."""
+    width, height = (1920, 1080) if aspect_ratio == '16:9' else (1080, 1920)
+    scale = (profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE])['scale']
+    return 2 * int(width * scale / 2), 2 * int(height * scale / 2)
+
+# Scene clips are intermediates that the assembly decodes and re-encodes, so they
+# are written in a cheap near-lossless format; the expensive encode happens once at the end
+INTERMEDIATE_FORMATS = {
+    # x264 ultrafast at near-lossless quality, PCM audio (default)
+    'ultrafast': {
+        'ext': '.mkv',
+        'video': ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '10', '-pix_fmt', 'yuv420p'],
+        'audio': ['-c:a', 'pcm_s16le', '-ar', '48000'],
+        'segments': True,
+    },
+    # All-intra mezzanine: fastest to seek and cut, largest on disk
+    'intra': {
+        'ext': '.mkv',
+        'video': ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '10', '-g', '1', '-pix_fmt', 'yuv420p'],
+        'audio': ['-c:a', 'pcm_s16le', '-ar', '48000'],
+        'segments': True,
+    },
+    # Previous behaviour: every clip at final delivery quality (B-frames and AAC can't
+    # be cut on frame boundaries, so assembly always re-encodes the crossfade chain)
+    'final': {
+        'ext': '.mp4',
+        'video': VIDEO_ENCODE_ARGS,
+        'audio': AUDIO_ENCODE_ARGS,
+        'segments': False,
+    },
+}
+INTERMEDIATE_FORMAT = os.getenv('WORKER_INTERMEDIATE_FORMAT', 'ultrafast')
+if INTERMEDIATE_FORMAT not in INTERMEDIATE_FORMATS:
+    print(f"Warning: Unknown WORKER_INTERMEDIATE_FORMAT '{INTERMEDIATE_FORMAT}', using 'ultrafast'", file=sys.stderr)
+    INTERMEDIATE_FORMAT = 'ultrafast'
+
+# 'segments' re-encodes only the crossfade windows and stream-copies the rest of every
+# clip (see segments.py); 'xfade' re-encodes the whole timeline through one xfade chain
+ASSEMBLY_MODE = os.getenv('WORKER_ASSEMBLY_MODE', 'segments')
+INTERMEDIATE_SAMPLE_RATE = 48000
+
+def segment_assembly(intermediate_format=None):
+    """True if clips in this intermediate format are assembled from stream-copied segments."""
+    return ASSEMBLY_MODE == 'segments' and INTERMEDIATE_FORMATS[intermediate_format or INTERMEDIATE_FORMAT]['segments']
+
+def scene_clip_path(output_dir, scene_index, intermediate_format=None):
+    return os.path.join(output_dir, f"scene_{scene_index}_vid" + INTERMEDIATE_FORMATS[intermediate_format or INTERMEDIATE_FORMAT]['ext'])
+
+# 'numpy' renders Ken Burns frames with motion.py and pipes them to ffmpeg at output
+# resolution; 'zoompan' runs the original 4K zoompan filter chain inside ffmpeg
+MOTION_ENGINE = os.getenv('WORKER_MOTION_ENGINE', 'numpy')
+
+# Prepared (resized + graded) scene stills, keyed by source image hash and aspect ratio
+STILL_CACHE_MAX_MB = int(os.getenv('WORKER_STILL_CACHE_MB', '1024'))
+# Bump when motion.prepare_still's output changes
+STILL_PIPELINE_VERSION = 'grade-lut-1'
+still_cache = None
+still_cache_lock = threading.Lock()
+
+def prepare_scene_still(image_path, aspect_ratio='16:9', output_path=None, profile=None):
+    """Decodes, resizes to the motion stage size and grades a scene image, once per source.
+
+    Returns the prepared BGR still; with output_path it is also written there as PNG for
+    ffmpeg inputs. Results are cached on disk by source hash and aspect ratio at full
+    resolution, so a draft and a later final render share them; reduced-size profiles
+    get a downscaled copy.
+    """
+    global still_cache
+    with still_cache_lock:
+        if still_cache is None:
+            still_cache = open_cache('stills', STILL_CACHE_MAX_MB) or False
 
-def step4_automatic_assembly(output_dir, scene_videos, background_music=None, aspect_ratio='16:9'):
-    """Stitches all scenes with crossfade transitions and professional audio mixing."""
-    final_video_path = os.path.join(output_dir, "final_video.mp4")
-    concat_file_path = os.path.join(output_dir, "concat.txt")
-    temp_merged_path = os.path.join(output_dir, "temp_merged.mp4")
-    temp_watermarked_path = os.path.join(output_dir, "temp_watermarked.mp4")
-
-    # If only one scene, skip complex assembly
-    if len(scene_videos) == 1:
-        shutil.copy(scene_videos[0], temp_merged_path)
-    elif len(scene_videos) > 1:
-        # Use xfade for smooth crossfade transitions between scenes
-        # Build complex filter for crossfades
-        crossfade_duration = 0.3  # 300ms crossfade
-
-        # Get durations of each video
-        durations = []
-        for vid in scene_videos:
+    width, height = (1920, 1080) if aspect_ratio == '16:9' else (1080, 1920)
+    key = cache_key('still', file_digest(image_path), aspect_ratio, motion.stage_size(width, height, aspect_ratio), STILL_PIPELINE_VERSION)
+    encoded = still_cache.get_bytes(key) if still_cache else None
+    if encoded is not None:
+        still = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        still = motion.prepare_still(image_path, width, height, aspect_ratio)
+        # Fast PNG compression: these are re-read often and evicted by size anyway
+        encoded = cv2.imencode('.png', still, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1].tobytes()
+        if still_cache:
+            still_cache.put_bytes(key, encoded)
+
+    stage_w, stage_h = motion.stage_size(*output_size(aspect_ratio, profile), aspect_ratio)
+    if stage_w < still.shape[1]:
+        still = cv2.resize(still, (stage_w, stage_h), interpolation=cv2.INTER_AREA)
+        encoded = cv2.imencode('.png', still, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1].tobytes()
+
+    if output_path:
+        with open(output_path, 'wb') as f:
+            f.write(encoded)
+    return still
+
+def run_piped_command(command, frames, duration=None):
+    """Runs an ffmpeg command that reads raw video frames from stdin. Returns True on success.
+
+    Progress events, the stderr tail and the deadline are handled as in run_command,
+    on reader threads.
+    """
+    command = progress.ffmpeg_command(command)
+    print(f"Running: {' '.join(command)} < frames", file=sys.stderr)
+    try:
+        with deadlines.process(command, duration, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            tracker = accounting.track(process)
+            reader, stderr_tail = progress.tail_stderr(io.TextIOWrapper(process.stderr, encoding='utf-8', errors='replace'))
+            stage, scene = tracing.current_stage()
+            follower = threading.Thread(target=progress.follow, args=(io.TextIOWrapper(process.stdout, encoding='utf-8', errors='replace'), stage, scene, duration), daemon=True)
+            follower.start()
             try:
-                result = subprocess.run([FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', vid], capture_output=True, text=True)
-                durations.append(float(result.stdout.strip()))
-            except:
-                durations.append(5.0)
-
-        # Build input arguments
-        input_args = []
-        for vid in scene_videos:
-            input_args.extend(['-i', vid])
-
-        # Build xfade filter chain
-        if len(scene_videos) == 2:
-            # Simple case: 2 videos
-            offset = durations[0] - crossfade_duration
-            filter_complex = f"[0:v][1:v]xfade=transition=fade:duration={crossfade_duration}:offset={offset}[v];[0:a][1:a]acrossfade=d={crossfade_duration}[a]"
-            map_args = ['-map', '[v]', '-map', '[a]']
-        else:
-            # Multiple videos: chain xfades
-            filter_parts = []
-            current_offset = 0
-
-            # First xfade
-            current_offset = durations[0] - crossfade_duration
-            filter_parts.append(f"[0:v][1:v]xfade=transition=fade:duration={crossfade_duration}:offset={current_offset}[v1]")
-            filter_parts.append(f"[0:a][1:a]acrossfade=d={crossfade_duration}[a1]")
-
-            # Chain remaining videos
-            for i in range(2, len(scene_videos)):
-                prev_v = f"v{i-1}"
-                prev_a = f"a{i-1}"
-                curr_v = f"v{i}" if i < len(scene_videos) - 1 else "v"
-                curr_a = f"a{i}" if i < len(scene_videos) - 1 else "a"
-
-                # Calculate offset (previous accumulated duration minus crossfades)
-                current_offset += durations[i-1] - crossfade_duration
-
-                filter_parts.append(f"[{prev_v}][{i}:v]xfade=transition=fade:duration={crossfade_duration}:offset={current_offset}[{curr_v}]")
-                filter_parts.append(f"[{prev_a}][{i}:a]acrossfade=d={crossfade_duration}[{curr_a}]")
-
-            filter_complex = ";".join(filter_parts)
-            map_args = ['-map', '[v]', '-map', '[a]']
-
-        xfade_cmd = [FFMPEG_PATH, '-y'] + input_args + [
-            '-filter_complex', filter_complex
-        ] + map_args + [
-            '-c:v', 'libx264', '-preset', 'fast', '-crf', '18',
-            '-c:a', 'aac', '-b:a', '256k',
-            temp_merged_path
+                for frame in frames:
+                    process.stdin.write(frame.data)
+            except BrokenPipeError:
+                pass  # ffmpeg exited early (e.g. -shortest, or killed); its return code tells
+            except Exception:
+                process.kill()
+                raise
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+            follower.join()
+            reader.join()
+            process.stdout.close()
+            process.stderr.close()
+            returncode = accounting.wait(process, command, tracker)
+    except deadlines.Cancelled:
+        # A killed encode leaves a truncated output (ffmpeg's output is always last)
+        if os.path.exists(command[-1]): os.remove(command[-1])
+        raise
+    if returncode != 0:
+        print(f"Error: {''.join(stderr_tail)}", file=sys.stderr)
+        return False
+    return True
+
+def create_scene_video(image_path, audio_path, output_path, narration, scene_index=0, aspect_ratio='16:9', intermediate_format=None, motion_engine=None, still_path=None, profile=None):
+    """Creates cinema-quality video with dynamic Ken Burns effects and modern subtitles.
+
+    The clip is written in the intermediate format (WORKER_INTERMEDIATE_FORMAT by default)
+    at the render profile's size and frame rate. still_path is the scene's
+    prepare_scene_still output (for the same profile), when the pipeline made one.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    duration = scene_duration(audio_path)
+    intermediate = INTERMEDIATE_FORMATS[intermediate_format or INTERMEDIATE_FORMAT]
+    subtitles_path = os.path.splitext(output_path)[0] + '.ass' if SUBTITLE_MODE == 'scene' else None
+    # Keyframes on every frame segment assembly may cut the clip at
+    video_args = intermediate['video']
+    if segment_assembly(intermediate_format):
+        video_args = video_args + ['-force_key_frames', segments.force_key_frames(duration, profile['fps'], CROSSFADE_DURATION)]
+
+    try:
+        if (motion_engine or MOTION_ENGINE) == 'numpy':
+            width, height = output_size(aspect_ratio, profile)
+            fps = profile['fps']
+            total_frames = int(duration * fps)
+            try:
+                still = cv2.imread(still_path, cv2.IMREAD_COLOR) if still_path and os.path.exists(still_path) else None
+                if still is None:
+                    still = prepare_scene_still(image_path, aspect_ratio, None, profile)
+                command = [
+                    FFMPEG_PATH, '-y',
+                    '-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+                    '-i', audio_path,
+                    '-vf', scene_video_filter(narration, duration, scene_index, aspect_ratio, 'frames', subtitles_path, profile),
+                ] + video_args + [
+                    '-t', str(duration),
+                ] + intermediate['audio'] + [
+                    '-shortest',
+                    output_path
+                ]
+                frames = motion.render_frames(still, total_frames, width, height, aspect_ratio, scene_index, SCENE_FPS / fps)
+                if run_piped_command(command, frames, duration):
+                    return
+            except Exception as e:
+                print(f"Warning: Motion engine failed for scene {scene_index}: {e}. Falling back to zoompan", file=sys.stderr)
+
+        source = 'still' if still_path and os.path.exists(still_path) else 'image'
+        command = [
+            FFMPEG_PATH, '-y', '-loop', '1', '-i', still_path if source == 'still' else image_path, '-i', audio_path,
+            '-vf', scene_video_filter(narration, duration, scene_index, aspect_ratio, source, subtitles_path, profile),
+        ] + video_args + [
+            '-t', str(duration),
+        ] + intermediate['audio'] + [
+            '-shortest',
+            output_path
         ]
+        if not run_command(command, duration):
+            with open(output_path, 'w') as f: f.write("mock")
+    finally:
+        # The scene's ASS script is burnt into the clip by now
+        if subtitles_path and os.path.exists(subtitles_path): os.remove(subtitles_path)
 
-        if not run_command(xfade_cmd):
-            # Fallback to simple concat if xfade fails
-            print("DEBUG: Crossfade failed, using simple concat", file=sys.stderr)
-            with open(concat_file_path, 'w') as f:
-                for vid in scene_videos:
-                    f.write(f"file '{os.path.abspath(vid)}'\n")
-            run_command([FFMPEG_PATH, '-y', '-f', 'concat', '-safe', '0', '-i', concat_file_path, '-c', 'copy', temp_merged_path])
-    else:
-        return None
+CROSSFADE_DURATION = 0.3  # 300ms crossfade between scenes
+
+# 'track' mixes the scene narration into one story track in memory (see narration.py),
+# normalizes its loudness once and muxes it as the final audio; 'scene' levels every
+# scene's voice and the mixed narration again with dynaudnorm
+NARRATION_MODE = os.getenv('WORKER_NARRATION_MODE', 'track')
+NARRATION_LOUDNESS = float(os.getenv('WORKER_NARRATION_LUFS', '-14'))  # EBU R128 integrated loudness target (YouTube's reference level)
+NARRATION_TRUE_PEAK = -1.5  # dBTP ceiling
 
-    if not os.path.exists(temp_merged_path):
+def write_narration_track(output_dir, scenes, durations=None):
+    """Writes the normalized narration track for render_scenes dicts. Returns its path or None.
+
+    durations are the scene lengths on the timeline (the scenes' own by default).
+    """
+    durations = durations or [scene['duration'] for scene in scenes]
+    track_path = os.path.join(output_dir, "narration.wav")
+    try:
+        with tracing.span('narration.mix', scenes=len(scenes)) as span:
+            samples = narration.timeline([narration.load(scene['audio']) for scene in scenes], durations, CROSSFADE_DURATION)
+            span.update(narration.normalize(samples, NARRATION_LOUDNESS, NARRATION_TRUE_PEAK), seconds=round(len(samples) / audio_dsp.OUTPUT_SAMPLE_RATE, 3))
+            narration.write(track_path, samples)
+            media_info.record_duration(track_path, len(samples) / audio_dsp.OUTPUT_SAMPLE_RATE)
+        print(f"DEBUG: Narration track {track_path}: {span.get('input_lufs')} LUFS, {span['gain_db']:+.1f} dB gain, "
+              f"{span['limited_db']:.1f} dB limited", file=sys.stderr)
+        return track_path
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not build the narration track: {e}", file=sys.stderr)
         return None
 
-    video_to_process = temp_merged_path
+def logo_overlay_filter(logo_input, video_input, aspect_ratio='16:9', output='', profile=None):
+    """Scales the logo to 8% of the frame width and overlays it bottom-right at 70% opacity."""
+    width, _ = output_size(aspect_ratio, profile)
+    scale = (profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE])['scale']
+    logo_w = int(width * 0.08)  # Slightly smaller logo
+    margin = round(25 * scale)
+    return (f"{logo_input}scale={logo_w}:-1,format=rgba,colorchannelmixer=aa=0.7[logo];"
+            f"{video_input}[logo]overlay=W-w-{margin}:H-h-{margin}{output}")
+
+def music_mix_filter(narration_input, music_input, fade_out_start, output, level=True):
+    """Mixes the looped music bed under the narration with fade in/out.
+
+    Without level the narration is mixed as is (the normalized narration track).
+    """
+    narration_chain = ''
+    if level:
+        narration_chain = f"{narration_input}volume=1.5,dynaudnorm=p=0.9[narr];"  # Balanced narration
+        narration_input = '[narr]'
+    return (
+        f"{music_input}volume=0.25,afade=t=in:d=2,afade=t=out:st={fade_out_start}:d=3[bg];"  # Increased music volume
+        f"{narration_chain}"
+        f"{narration_input}[bg]amix=inputs=2:duration=first:dropout_transition=2,volume=2{output}"
+    )
 
-    # Add logo watermark
-    if os.path.exists(LOGO_PATH):
-        width = 1920 if aspect_ratio == '16:9' else 1080
-        logo_w = int(width * 0.08)  # Slightly smaller logo
-        logo_filter = f"[1:v]scale={logo_w}:-1,format=rgba,colorchannelmixer=aa=0.7[logo]"
-        if run_command([FFMPEG_PATH, '-y', '-i', temp_merged_path, '-i', LOGO_PATH,
-                       '-filter_complex', f"{logo_filter};[0:v][logo]overlay=W-w-25:H-h-25",
-                       '-c:v', 'libx264', '-preset', 'fast', '-crf', '18', '-c:a', 'copy', temp_watermarked_path]):
-            video_to_process = temp_watermarked_path
+def story_subtitles_filter(output_dir, scenes, aspect_ratio='16:9', durations=None):
+    """Writes one ASS script for the whole crossfaded timeline (SUBTITLE_MODE 'timeline').
+
+    scenes are render_scenes dicts. Returns the `ass` filter that burns it over the
+    assembled video, or None when the story has no narration text.
+    """
+    durations = durations or [scene['duration'] for scene in scenes]
+    timeline = []
+    offset = 0.0
+    for scene, duration in zip(scenes, durations):
+        timeline.append((scene['narration'], offset, duration))
+        offset += duration - CROSSFADE_DURATION
+    ass_path = os.path.join(output_dir, "subtitles.ass")
+    devanagari = any(is_devanagari(scene['narration']) for scene in scenes)
+    font_path = subtitles.write_story_ass(ass_path, timeline, aspect_ratio, devanagari)
+    return subtitles.ass_filter(ass_path, font_path) if font_path is not False else None
+
+def crossfade_segments(output_dir, scene_videos, durations, profile=None):
+    """Writes the pieces of the crossfaded timeline (see segments.py).
+
+    Each scene's middle is stream-copied from its clip and only the crossfade windows
+    are encoded, one cut at a time, so time and memory per cut don't grow with the
+    scene count. The clips must have been encoded with segment keyframes at these
+    durations. Returns the pieces in order as (path, seconds; None for the last), or
+    None (leaving nothing behind) if a scene is too short to cut or a piece fails.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    intermediate = INTERMEDIATE_FORMATS[INTERMEDIATE_FORMAT]
+    fps = profile['fps']
+    pieces = segments.plan(durations, fps, CROSSFADE_DURATION)
+    if pieces is None:
+        print("DEBUG: A scene is too short to cut around its crossfades", file=sys.stderr)
+        return None
 
-    # Mix background music with improved audio levels
-    print(f"DEBUG: Background music check - path: {background_music}, exists: {background_music and os.path.exists(background_music)}", file=sys.stderr)
-    if background_music and os.path.exists(background_music):
-        print(f"DEBUG: Adding background music from: {background_music}", file=sys.stderr)
+    written = []
+    for n, (kind, k, first, count) in enumerate(pieces):
+        piece_path = os.path.join(output_dir, f"segment_{n}.mkv")
+        if kind == 'copy':
+            written.append((piece_path, (count - first) / fps if count is not None else None))
+            command = [FFMPEG_PATH, '-y', '-i', scene_videos[k], '-map', '0:v', '-map', '0:a'] + segments.copy_options(
+                first, count, fps, INTERMEDIATE_SAMPLE_RATE) + intermediate['audio'] + [piece_path]
+            with tracing.span('segment.copy', scene=k, frames=count - first if count is not None else None):
+                ok = run_command(command)
+        else:
+            # Seek half a frame early so the window's first frame survives timestamp rounding
+            lead = 0.5 / fps
+            written.append((piece_path, count / fps))
+            command = [FFMPEG_PATH, '-y', '-ss', f"{first / fps - lead:.6f}", '-i', scene_videos[k],
+                       '-t', f"{(count + 1) / fps:.6f}", '-i', scene_videos[k + 1],
+                       '-filter_complex', segments.blend_filter(count, fps, INTERMEDIATE_SAMPLE_RATE, lead),
+                       '-map', '[v]', '-map', '[a]'] + intermediate['video'] + intermediate['audio'] + [piece_path]
+            with tracing.span('xfade.window', scene=k, frames=count):
+                ok = run_command(command, count / fps)
+        if not ok:
+            for path, _ in written:
+                if os.path.exists(path): os.remove(path)
+            return None
+    return written
+
+def write_concat_list(path, files):
+    """Writes a concat demuxer list of (file, duration or None) entries."""
+    with open(path, 'w') as f:
+        for file_path, duration in files:
+            f.write(f"file '{os.path.abspath(file_path)}'\n")
+            if duration is not None:
+                # Exact piece lengths, so the timeline doesn't depend on container durations
+                f.write(f"duration {duration:.6f}\n")
+
+def step4_automatic_assembly(output_dir, scene_videos, background_music=None, aspect_ratio='16:9', subtitles_filter=None, durations=None, profile=None, narration_track=None):
+    """Stitches all scenes with crossfade transitions and professional audio mixing.
+
+    With segment assembly the crossfade windows are encoded on their own and the rest
+    of every clip is stream-copied (durations must be the ones the clips were encoded
+    at); otherwise the crossfades are written in the intermediate clip format through
+    one xfade chain. The logo overlay, music mix, timeline subtitles (subtitles_filter,
+    if any) and the final high quality encode then happen together in one last pass,
+    which reads segments straight through the concat demuxer. durations are the scene
+    lengths the clips were rendered at; without them the clip headers are read. The
+    final encode and output name follow the render profile. With narration_track (see
+    write_narration_track) that is the final audio instead of the clips' own.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    intermediate = INTERMEDIATE_FORMATS[INTERMEDIATE_FORMAT]
+    final_video_path = os.path.join(output_dir, profile['output'])
+    concat_file_path = os.path.join(output_dir, "concat.txt")
+    temp_merged_path = os.path.join(output_dir, "temp_merged" + intermediate['ext'])
+    segments_list_path = os.path.join(output_dir, "segments.txt")
+    merged_input = ['-i', temp_merged_path]
+    pieces = None
 
-        # Get video duration for accurate fade-out timing
-        video_duration = 0
+    cut_segments = durations is not None and segment_assembly()
+    if durations is None:
         try:
-            result = subprocess.run([FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', video_to_process], capture_output=True, text=True)
-            video_duration = float(result.stdout.strip())
-            print(f"DEBUG: Video duration: {video_duration} seconds", file=sys.stderr)
-        except:
-            video_duration = 60.0  # Default fallback
-            print(f"DEBUG: Could not get video duration, using default: {video_duration} seconds", file=sys.stderr)
-
-        # Calculate fade-out start time (3 seconds before end)
-        fade_out_start = max(0, video_duration - 3)
-
-        music_mix_command = [
-            FFMPEG_PATH, '-y', '-i', video_to_process, '-stream_loop', '-1', '-i', background_music,
-            '-filter_complex',
-            f"[1:a]volume=0.25,afade=t=in:d=2,afade=t=out:st={fade_out_start}:d=3[bg];"  # Increased music volume
-            "[0:a]volume=1.5,dynaudnorm=p=0.9[narr];"  # Balanced narration
-            "[narr][bg]amix=inputs=2:duration=first:dropout_transition=2,volume=2[a]",
-            '-map', '0:v', '-map', '[a]',
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '256k', '-ar', '48000',
-            '-shortest', final_video_path
-        ]
-        if run_command(music_mix_command):
-            print(f"DEBUG: Background music mixed successfully", file=sys.stderr)
-            for p in [temp_merged_path, temp_watermarked_path]:
-                if os.path.exists(p): os.remove(p)
-            return final_video_path
+            durations = [media_info.duration(vid) for vid in scene_videos]
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read scene clip durations: {e}", file=sys.stderr)
+            return None
+    video_duration = sum(durations) - CROSSFADE_DURATION * max(len(durations) - 1, 0)
+
+    if len(scene_videos) > 1 and cut_segments:
+        with tracing.span('xfade', scenes=len(scene_videos), seconds=round(video_duration, 3), mode='segments') as span:
+            pieces = crossfade_segments(output_dir, scene_videos, durations, profile)
+            span['ok'] = pieces is not None
+        if pieces is not None:
+            write_concat_list(segments_list_path, pieces)
+            merged_input = ['-f', 'concat', '-safe', '0', '-i', segments_list_path]
         else:
-            print(f"DEBUG: Background music mixing failed, continuing without background music", file=sys.stderr)
-    else:
-        if background_music:
-            print(f"DEBUG: Background music file not found: {background_music}", file=sys.stderr)
+            print("DEBUG: Segment assembly failed, re-encoding the crossfade chain", file=sys.stderr)
+
+    if pieces is None:
+        # If only one scene, skip complex assembly
+        if len(scene_videos) == 1:
+            shutil.copy(scene_videos[0], temp_merged_path)
+        elif len(scene_videos) > 1:
+            # Use xfade for smooth crossfade transitions between scenes
+            # Build complex filter for crossfades
+            crossfade_duration = CROSSFADE_DURATION
+
+            # Build input arguments
+            input_args = []
+            for vid in scene_videos:
+                input_args.extend(['-i', vid])
+
+            # Build xfade filter chain
+            if len(scene_videos) == 2:
+                # Simple case: 2 videos
+                offset = durations[0] - crossfade_duration
+                filter_complex = f"[0:v][1:v]xfade=transition=fade:duration={crossfade_duration}:offset={offset}[v];[0:a][1:a]acrossfade=d={crossfade_duration}[a]"
+                map_args = ['-map', '[v]', '-map', '[a]']
+            else:
+                # Multiple videos: chain xfades
+                filter_parts = []
+                current_offset = 0
+
+                # First xfade
+                current_offset = durations[0] - crossfade_duration
+                filter_parts.append(f"[0:v][1:v]xfade=transition=fade:duration={crossfade_duration}:offset={current_offset}[v1]")
+                filter_parts.append(f"[0:a][1:a]acrossfade=d={crossfade_duration}[a1]")
+
+                # Chain remaining videos
+                for i in range(2, len(scene_videos)):
+                    prev_v = f"v{i-1}"
+                    prev_a = f"a{i-1}"
+                    curr_v = f"v{i}" if i < len(scene_videos) - 1 else "v"
+                    curr_a = f"a{i}" if i < len(scene_videos) - 1 else "a"
+
+                    # Calculate offset (previous accumulated duration minus crossfades)
+                    current_offset += durations[i-1] - crossfade_duration
+
+                    filter_parts.append(f"[{prev_v}][{i}:v]xfade=transition=fade:duration={crossfade_duration}:offset={current_offset}[{curr_v}]")
+                    filter_parts.append(f"[{prev_a}][{i}:a]acrossfade=d={crossfade_duration}[{curr_a}]")
+
+                filter_complex = ";".join(filter_parts)
+                map_args = ['-map', '[v]', '-map', '[a]']
+
+            xfade_cmd = [FFMPEG_PATH, '-y'] + input_args + [
+                '-filter_complex', filter_complex
+            ] + map_args + intermediate['video'] + intermediate['audio'] + [
+                temp_merged_path
+            ]
+
+            with tracing.span('xfade', scenes=len(scene_videos), seconds=round(video_duration, 3)) as span:
+                crossfaded = run_command(xfade_cmd, video_duration)
+                span['ok'] = crossfaded
+            if not crossfaded:
+                # Fallback to simple concat if xfade fails
+                print("DEBUG: Crossfade failed, using simple concat", file=sys.stderr)
+                with open(concat_file_path, 'w') as f:
+                    for vid in scene_videos:
+                        f.write(f"file '{os.path.abspath(vid)}'\n")
+                with tracing.span('concat', scenes=len(scene_videos)):
+                    run_command([FFMPEG_PATH, '-y', '-f', 'concat', '-safe', '0', '-i', concat_file_path, '-c', 'copy', temp_merged_path])
+                video_duration = sum(durations)
+                narration_track = None  # Laid out for crossfades, so it no longer lines up
         else:
-            print(f"DEBUG: No background music path provided", file=sys.stderr)
+            return None
+
+        if not os.path.exists(temp_merged_path):
+            return None
 
-    # No background music - just rename
-    if video_to_process == temp_watermarked_path:
-        os.rename(temp_watermarked_path, final_video_path)
-        if os.path.exists(temp_merged_path): os.remove(temp_merged_path)
+    # Mix background music with improved audio levels
+    print(f"DEBUG: Background music check - path: {background_music}, exists: {background_music and os.path.exists(background_music)}", file=sys.stderr)
+    if background_music and not os.path.exists(background_music):
+        print(f"DEBUG: Background music file not found: {background_music}", file=sys.stderr)
+        background_music = None
+    elif not background_music:
+        print(f"DEBUG: No background music path provided", file=sys.stderr)
+
+    # Fade the music out over the last 3 seconds of the assembled timeline
+    fade_out_start = max(0, video_duration - 3)
+    print(f"DEBUG: Video duration: {video_duration} seconds", file=sys.stderr)
+
+    # Subtitles, logo watermark, music bed and the final encode in one pass; if the full
+    # graph fails, drop the music first, then the logo, then the subtitles
+    use_logo = os.path.exists(LOGO_PATH)
+    attempts = [(use_logo, background_music, subtitles_filter), (use_logo, None, subtitles_filter),
+                (False, None, subtitles_filter), (False, None, None)]
+    for logo, music, subs in dict.fromkeys(attempts):
+        input_args = list(merged_input)
+        filter_parts = []
+        video, audio = '[0:v]', '[0:a]'
+        if narration_track:
+            input_args.extend(['-i', narration_track])
+            audio = '[1:a]'
+        next_input = 2 if narration_track else 1
+        if subs:
+            filter_parts.append(f"{video}{subs}[vsub]")
+            video = '[vsub]'
+        if logo:
+            input_args.extend(['-i', LOGO_PATH])
+            filter_parts.append(logo_overlay_filter(f"[{next_input}:v]", video, aspect_ratio, '[vout]', profile))
+            video = '[vout]'
+            next_input += 1
+        if music:
+            print(f"DEBUG: Adding background music from: {music}", file=sys.stderr)
+            input_args.extend(['-stream_loop', '-1', '-i', music])
+            filter_parts.append(music_mix_filter(audio, f"[{next_input}:a]", fade_out_start, '[aout]', level=not narration_track))
+            audio = '[aout]'
+
+        command = [FFMPEG_PATH, '-y'] + input_args
+        if filter_parts:
+            command += ['-filter_complex', ";".join(filter_parts)]
+        command += ['-map', video if video != '[0:v]' else '0:v', '-map', audio if music else audio.strip('[]')]
+        command += profile['video'] + profile['audio'] + ['-shortest', final_video_path]
+        # The logo overlay and music mix run inside the final encode
+        with tracing.span('final.encode', logo=logo, music=bool(music), subtitles=bool(subs), seconds=round(video_duration, 3)) as span:
+            encoded = run_command(command, video_duration)
+            span['ok'] = encoded
+            if encoded and os.path.exists(final_video_path):
+                span['bytes'] = os.path.getsize(final_video_path)
+        if encoded:
+            if music:
+                print(f"DEBUG: Background music mixed successfully", file=sys.stderr)
+            elif background_music:
+                print(f"DEBUG: Background music mixing failed, continuing without background music", file=sys.stderr)
+            break
     else:
-        os.rename(temp_merged_path, final_video_path)
+        final_video_path = None
 
+    for path in [temp_merged_path, segments_list_path] + [path for path, _ in pieces or []]:
+        if os.path.exists(path): os.remove(path)
     return final_video_path
 
-async def main():
-    if len(sys.argv) < 2:
-        print("Error: No input provided", file=sys.stderr)
+def assemble_scene_clips(output_dir, scenes, background_music=None, aspect_ratio='16:9', subtitles_filter=None, profile=None, narration_track=None):
+    """Multi-step assembly of render_scenes dicts with clips, at their known durations."""
+    return step4_automatic_assembly(output_dir, [scene['video'] for scene in scenes], background_music, aspect_ratio,
+                                    subtitles_filter, [scene['duration'] for scene in scenes], profile, narration_track)
+
+def render_single_pass(output_dir, scenes, background_music=None, aspect_ratio='16:9', subtitles_filter=None, profile=None, narration_track=None):
+    """Renders the final video from scene stills and narration in one ffmpeg run.
+
+    Scene Ken Burns/subtitle chains, crossfades, the logo overlay and the music bed
+    are composed into a single filter graph with one video and one audio encode,
+    instead of encoding every scene clip and re-encoding the assembled video.
+    scenes are render_scenes dicts; a scene's prepared 'still' is used instead of its
+    raw image when present. With subtitles_filter (SUBTITLE_MODE 'timeline') subtitles
+    are burned once over the crossfaded timeline instead of per scene. With
+    narration_track (see write_narration_track) the scene audio is not read and that
+    is the audio instead. Returns the final video path, or None so the caller can
+    fall back to the multi-step path.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    final_video_path = os.path.join(output_dir, profile['output'])
+    if not scenes:
+        return None
+
+    input_args = []
+    filter_parts = []
+    durations = []
+    subtitles_paths = []
+    inputs_per_scene = 1 if narration_track else 2
+    for n, scene in enumerate(scenes):
+        still = scene.get('still')
+        image_path, source = (still, 'still') if still and os.path.exists(still) else (scene['image'], 'image')
+        duration = scene['duration']
+        durations.append(duration)
+        subtitles_path = os.path.join(output_dir, f"scene_{scene['index']}_subs.ass") if not subtitles_filter else None
+        if subtitles_path:
+            subtitles_paths.append(subtitles_path)
+        # Bounding the looped still keeps each scene input finite
+        input_args.extend(['-loop', '1', '-t', f"{duration + 1:.3f}", '-i', image_path])
+        filter_parts.append(
+            f"[{inputs_per_scene * n}:v]{scene_video_filter(scene['narration'], duration, scene['index'], aspect_ratio, source, subtitles_path, profile)},"
+            f"trim=duration={duration:.6f}[sv{n}]"
+        )
+        if not narration_track:
+            input_args.extend(['-i', scene['audio']])
+            filter_parts.append(
+                f"[{2 * n + 1}:a]aresample=48000,aformat=channel_layouts=stereo,"
+                f"apad,atrim=duration={duration:.6f}[sa{n}]"
+            )
+
+    # Crossfade chain (same offsets as the multi-step assembly)
+    video, audio = "[sv0]", "[sa0]"
+    offset = 0.0
+    for n in range(1, len(scenes)):
+        offset += durations[n - 1] - CROSSFADE_DURATION
+        filter_parts.append(f"{video}[sv{n}]xfade=transition=fade:duration={CROSSFADE_DURATION}:offset={offset:.6f}[xv{n}]")
+        video = f"[xv{n}]"
+        if not narration_track:
+            filter_parts.append(f"{audio}[sa{n}]acrossfade=d={CROSSFADE_DURATION}[xa{n}]")
+            audio = f"[xa{n}]"
+    total_duration = sum(durations) - CROSSFADE_DURATION * (len(scenes) - 1)
+
+    if subtitles_filter:
+        filter_parts.append(f"{video}{subtitles_filter}[vsub]")
+        video = "[vsub]"
+
+    next_input = inputs_per_scene * len(scenes)
+    if narration_track:
+        # Crossfaded and normalized already
+        input_args.extend(['-i', narration_track])
+        audio = f"[{next_input}:a]"
+        next_input += 1
+    if os.path.exists(LOGO_PATH):
+        input_args.extend(['-i', LOGO_PATH])
+        filter_parts.append(logo_overlay_filter(f"[{next_input}:v]", video, aspect_ratio, "[vout]", profile))
+        next_input += 1
+    else:
+        filter_parts.append(f"{video}null[vout]")
+
+    if background_music and os.path.exists(background_music):
+        print(f"DEBUG: Adding background music from: {background_music}", file=sys.stderr)
+        input_args.extend(['-stream_loop', '-1', '-i', background_music])
+        fade_out_start = max(0, total_duration - 3)
+        filter_parts.append(music_mix_filter(audio, f"[{next_input}:a]", fade_out_start, "[aout]", level=not narration_track))
+    else:
+        filter_parts.append(f"{audio}anull[aout]")
+
+    filter_script_path = os.path.join(output_dir, "single_pass_filter.txt")
+    with open(filter_script_path, 'w') as f:
+        # A script file avoids the command-line length limit on long stories
+        f.write(";\n".join(filter_parts))
+
+    print(f"DEBUG: Single-pass render of {len(scenes)} scenes ({total_duration:.2f}s)", file=sys.stderr)
+    command = [FFMPEG_PATH, '-y'] + input_args + [
+        '-filter_complex_script', filter_script_path,
+        '-map', '[vout]', '-map', '[aout]',
+    ] + profile['video'] + profile['audio'] + [
+        '-t', f"{total_duration:.6f}",
+        final_video_path
+    ]
+    try:
+        # Scene motion, crossfades, logo overlay, music mix and the final encode in one run
+        with tracing.span('single_pass.encode', scenes=len(scenes), seconds=round(total_duration, 3),
+                          logo=os.path.exists(LOGO_PATH), music=bool(background_music and os.path.exists(background_music))) as span:
+            span['ok'] = run_command(command, total_duration) and os.path.exists(final_video_path)
+            if span['ok']:
+                span['bytes'] = os.path.getsize(final_video_path)
+        if span['ok']:
+            return final_video_path
+    finally:
+        for path in [filter_script_path] + subtitles_paths:
+            if os.path.exists(path): os.remove(path)
+    return None
+
+async def fallback_scene_image(fetcher, img_path, last_successful_image, aspect_ratio, scene_index=0):
+    """Fills in a scene image when every search tier failed."""
+    if last_successful_image and os.path.exists(last_successful_image):
+        # Fallback: Use previous scene's image ("like scene 1")
+        print(f"DEBUG: All searches failed. reusing previous image for scene {scene_index}", file=sys.stderr)
+        shutil.copy(last_successful_image, img_path)
         return
+
+    # Final Fallback: Generate a random placeholder image from Picsum
+    print(f"DEBUG: Falling back to Picsum image for scene {scene_index}", file=sys.stderr)
     try:
-        if os.path.exists(sys.argv[1]):
-            with open(sys.argv[1], 'r') as f: data = json.load(f)
-        else:
-            data = json.loads(sys.argv[1])
+        await fetcher.fetch_picsum(img_path, aspect_ratio)
     except Exception as e:
-        print(f"Error parsing input: {str(e)}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
-        return
+        print(f"DEBUG: Picsum fallback failed: {e}. Using black image.", file=sys.stderr)
+        dimensions = "1920x1080" if aspect_ratio == "16:9" else "1080x1920"
+        run_command([FFMPEG_PATH, '-y', '-f', 'lavfi', '-i', f'color=c=black:s={dimensions}', '-frames:v', '1', img_path])
+
+# Concurrency limits per resource class for the scene pipeline
+# (network concurrency is bounded per provider by ImageFetcher)
+PIPELINE_LIMITS = {
+    'model': int(os.getenv('WORKER_MODEL_CONCURRENCY', '1')),      # TTS inference (model is not re-entrant)
+    'encode': int(os.getenv('WORKER_ENCODE_CONCURRENCY', '2')),    # ffmpeg encodes and OpenCV work
+}
+
+# 'scene' burns each scene's subtitles into its own chain; 'timeline' writes one ASS
+# script for the story and burns it once over the assembled, crossfaded video
+SUBTITLE_MODE = os.getenv('WORKER_SUBTITLE_MODE', 'scene')
+
+# 'single_pass' composes scenes, crossfades, logo and music into one ffmpeg graph with a
+# single encode; 'multi_step' encodes scene clips and assembles them (also the fallback).
+# Each render profile picks its own mode; WORKER_RENDER_MODE overrides it for all of them
+RENDER_MODE = os.getenv('WORKER_RENDER_MODE', '')
+
+# Single-pass keeps every scene branch of its graph in memory at once, so its peak RSS
+# grows with the scene count; longer stories render multi-step anyway (with segment assembly,
+# whose peak doesn't grow with it). Measured with bench.py single-pass: about 105 MB
+# per scene and megapixel of output frame, plus about 200 MB per megapixel for the encoder
+SINGLE_PASS_MAX_MB = int(os.getenv('WORKER_SINGLE_PASS_MAX_MB', '2560'))
+SINGLE_PASS_MB_PER_SCENE_MPIXEL = 105
+SINGLE_PASS_MB_PER_MPIXEL = 200
+
+def single_pass_memory_mb(scene_count, aspect_ratio='16:9', profile=None):
+    """Estimated peak RSS in MB of the single-pass ffmpeg graph for scene_count scenes."""
+    width, height = output_size(aspect_ratio, profile)
+    megapixels = width * height / 1e6
+    return megapixels * (SINGLE_PASS_MB_PER_MPIXEL + SINGLE_PASS_MB_PER_SCENE_MPIXEL * scene_count)
+
+def choose_render_mode(scene_count, aspect_ratio='16:9', profile=None):
+    """The profile's render mode (or RENDER_MODE), but 'multi_step' for a single-pass story
+    over SINGLE_PASS_MAX_MB (0 disables the cap)."""
+    mode = RENDER_MODE or (profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE])['render_mode']
+    if mode == 'single_pass' and SINGLE_PASS_MAX_MB:
+        estimate = single_pass_memory_mb(scene_count, aspect_ratio, profile)
+        if estimate > SINGLE_PASS_MAX_MB:
+            print(f"DEBUG: Single-pass render of {scene_count} scenes would need ~{estimate:.0f} MB "
+                  f"(limit {SINGLE_PASS_MAX_MB} MB), rendering multi-step", file=sys.stderr)
+            return 'multi_step'
+    return mode
+
+class ResourceScheduler:
+    """Runs blocking pipeline stages on worker threads, bounded per resource class."""
+
+    def __init__(self, limits=None):
+        self.limits = dict(limits or PIPELINE_LIMITS)
+        self.semaphores = {name: asyncio.Semaphore(max(1, n)) for name, n in self.limits.items()}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=sum(max(1, n) for n in self.limits.values()))
+
+    async def run(self, resource, func, *args, stage=None, scene=None, timeout=None):
+        """Runs func(*args) on a worker thread once the resource has a free slot.
+
+        With stage, the run (from when it gets its slot) is bounded by that stage's
+        deadline, or by timeout instead if given; missing it cancels the story.
+        """
+        async with self.semaphores[resource]:
+            deadlines.check()
+            loop = asyncio.get_running_loop()
+            # Worker threads see the caller's context, so trace spans nest under the stage
+            future = loop.run_in_executor(self.executor, contextvars.copy_context().run, functools.partial(func, *args))
+            if stage is None:
+                return await future
+            return await deadlines.bounded(future, stage, scene, timeout)
+
+    def shutdown(self):
+        if deadlines.cancelled():
+            # Don't wait for inference that can't be interrupted
+            deadlines.abandon(self.executor)
+        else:
+            self.executor.shutdown(wait=True)
+
+async def render_scenes(output_dir, scenes, aspect_ratio, language, style, encode_clips=True, profile=None):
+    """Renders every scene clip through a fetch -> clean -> tts -> render task graph.
+
+    Each scene's tasks run as soon as their inputs are ready, so scene N+1's image
+    search and TTS overlap scene N's encode. Returns one dict per rendered scene, in
+    scene order, with its 'image', prepared 'still' (resized and graded once, or None),
+    'audio' and its 'duration', 'narration', 'index' and clip 'video' (None when
+    encode_clips is off and the clips are left to the single-pass render). Stills and
+    clips are made for the render profile; images and audio don't depend on it.
+
+    Stages whose inputs match the output_dir's render manifest and whose artifacts are
+    still there are skipped, so a rerun only redoes edited or unfinished scenes.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    scheduler = ResourceScheduler()
+    manifest = RenderManifest(output_dir)
+    image_tasks = []
+    reused = collections.Counter()
+
+    async def prepare_image(i, scene, img_path, previous_task):
+        inputs = cache_key('image', scene['image_prompt'], aspect_ratio)
+        if manifest.reusable(i, 'image', inputs, img_path):
+            reused['image'] += 1
+            return img_path
+
+        # Fetch (all scenes up front) and clean concurrently with other scenes...
+        with tracing.span('image.acquire', 'network', scene=i) as span:
+            image = await deadlines.bounded(fetcher.acquire(scene['image_prompt'], img_path, aspect_ratio, i), 'image.acquire', i)
+            span['provider'] = image['provider'] if image else None
+        success = image is not None
+        if success and not image['cached']:
+            # Clean the downloaded image from watermarks before using it
+            await scheduler.run('encode', tracing.traced('watermark.clean', clean_watermark, scene=i), img_path, stage='watermark.clean', scene=i)
+            await scheduler.run('encode', fetcher.store_cleaned, image, img_path)
+
+        # ...but resolve the fallback in scene order, so a failed scene reuses the
+        # last successful image *before* it, exactly as the sequential loop did.
+        last_successful_image = await previous_task if previous_task else None
+        if success:
+            # Fallback images are not recorded, so a rerun searches again
+            manifest.record(i, 'image', inputs, img_path)
+            return img_path
+        await fallback_scene_image(fetcher, img_path, last_successful_image, aspect_ratio, i)
+        return last_successful_image
+
+    async def prepare_still(i, img_path):
+        still_path = os.path.join(output_dir, f"scene_{i}_still.png")
+        try:
+            image_digest = await scheduler.run('encode', manifest.digest, i, 'image', img_path)
+            stage = motion.stage_size(*output_size(aspect_ratio, profile), aspect_ratio)
+            inputs = cache_key('still', image_digest, aspect_ratio, stage, STILL_PIPELINE_VERSION)
+            if manifest.reusable(i, 'still', inputs, still_path):
+                reused['still'] += 1
+                return still_path
+            await scheduler.run('encode', tracing.traced('still.prepare', prepare_scene_still, scene=i), img_path, aspect_ratio, still_path, profile,
+                                stage='still.prepare', scene=i)
+            manifest.record(i, 'still', inputs, still_path)
+            return still_path
+        except Exception as e:
+            print(f"Warning: Could not prepare still for scene {i}: {e}", file=sys.stderr)
+            return None
+
+    async def render_scene(i, scene, img_path, aud_path, vid_path, image_task, tts_task):
+        await image_task
+        if tts_task is None:
+            reused['audio'] += 1
+        elif i in await tts_task:
+            # Fallback-engine audio is not recorded, so a rerun tries the model again
+            manifest.record(i, 'audio', audio_inputs[i], aud_path)
+        try:
+            # Known from the synthesized sample count; read from the WAV header otherwise
+            duration = scene_duration(aud_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Scene {i} has no usable narration audio: {e}", file=sys.stderr)
+            return None
+        rendered = {'index': i, 'image': img_path, 'still': None, 'audio': aud_path, 'narration': scene['narration'], 'duration': duration, 'video': None}
+        if os.path.exists(img_path):
+            rendered['still'] = await prepare_still(i, img_path)
+        if not encode_clips:
+            return rendered if os.path.exists(img_path) else None
+        if await encode_scene_clip(scheduler, manifest, rendered, vid_path, aspect_ratio, profile):
+            reused['clip'] += 1
+        rendered['video'] = vid_path
+        return rendered if os.path.exists(vid_path) else None
 
+    try:
+        async with ImageFetcher() as fetcher:
+            aud_paths = [os.path.join(output_dir, f"scene_{i}_aud.wav") for i in range(len(scenes))]
+            voice = voice_digest(TARGET_VOICE_PATH)
+            audio_inputs = [
+                cache_key('audio', scene['narration'], detect_scene_language(scene['narration'], language), voice, style, tts_model_version())
+                for scene in scenes
+            ]
+
+            # TTS runs in batches of consecutive scenes (single scenes unless batching is
+            # enabled); scenes whose audio is already in output_dir get no task
+            tts_tasks = dict.fromkeys(range(len(scenes)))
+            pending = [i for i in range(len(scenes)) if not manifest.reusable(i, 'audio', audio_inputs[i], aud_paths[i])]
+            for batch in plan_tts_batches([scenes[i]['narration'] for i in pending], language):
+                jobs = [(pending[n], aud_paths[pending[n]], scenes[pending[n]]['narration']) for n in batch]
+                tts_task = asyncio.ensure_future(scheduler.run('model', synthesize_scene_batch, jobs, language, style, stage='tts.generate', scene=jobs[0][0],
+                                                               timeout=deadlines.STAGE_DEADLINES['tts.generate'] * len(jobs)))
+                tts_tasks.update((pending[n], tts_task) for n in batch)
+
+            render_tasks = []
+            for i, scene in enumerate(scenes):
+                img_path = os.path.join(output_dir, f"scene_{i}_img.jpg")
+                vid_path = scene_clip_path(output_dir, i)
+
+                image_task = asyncio.ensure_future(prepare_image(i, scene, img_path, image_tasks[-1] if image_tasks else None))
+                image_tasks.append(image_task)
+                render_tasks.append(render_scene(i, scene, img_path, aud_paths[i], vid_path, image_task, tts_tasks[i]))
+
+            # gather() preserves scene order regardless of completion order
+            rendered_scenes = await asyncio.gather(*render_tasks)
+    finally:
+        scheduler.shutdown()
+
+    if reused:
+        print(f"DEBUG: Reused from the render manifest: {dict(reused)}", file=sys.stderr)
+    return [scene for scene in rendered_scenes if scene]
+
+async def encode_scene_clip(scheduler, manifest, scene, vid_path, aspect_ratio, profile):
+    """Encodes one scene clip unless the manifest has it for the same inputs. Returns True if reused."""
+    source = scene['still'] or scene['image']
+    source_digest = await scheduler.run('encode', manifest.digest, scene['index'], 'still' if scene['still'] else 'image', source)
+    audio_digest = await scheduler.run('encode', manifest.digest, scene['index'], 'audio', scene['audio'])
+    inputs = cache_key('clip', source_digest, audio_digest, scene['narration'], scene['index'], aspect_ratio, profile,
+                       INTERMEDIATE_FORMAT, MOTION_ENGINE, SUBTITLE_MODE, segment_assembly())
+    if manifest.reusable(scene['index'], 'clip', inputs, vid_path):
+        return True
+
+    def encode():
+        with tracing.span('scene.encode', scene=scene['index'], seconds=round(scene['duration'], 3),
+                          motion_engine=MOTION_ENGINE, intermediate_format=INTERMEDIATE_FORMAT) as span:
+            create_scene_video(scene['image'], scene['audio'], vid_path, scene['narration'], scene['index'], aspect_ratio, None, None, scene['still'], profile)
+            if os.path.exists(vid_path):
+                span['bytes'] = os.path.getsize(vid_path)
+
+    await scheduler.run('encode', encode)
+    try:
+        # A failed encode leaves a placeholder file that is not a readable clip
+        media_info.duration(vid_path)
+        manifest.record(scene['index'], 'clip', inputs, vid_path)
+    except (OSError, ValueError):
+        pass
+    return False
+
+async def encode_scene_clips(output_dir, rendered_scenes, aspect_ratio, profile=None):
+    """Encodes scene clips for scenes rendered without them (multi-step fallback).
+
+    Returns the scenes whose clip was written, with 'video' set.
+    """
+    profile = profile or RENDER_PROFILES[DEFAULT_RENDER_PROFILE]
+    scheduler = ResourceScheduler()
+    manifest = RenderManifest(output_dir)
+
+    async def encode(scene):
+        vid_path = scene_clip_path(output_dir, scene['index'])
+        await encode_scene_clip(scheduler, manifest, scene, vid_path, aspect_ratio, profile)
+        return dict(scene, video=vid_path) if os.path.exists(vid_path) else None
+
+    try:
+        encoded = await asyncio.gather(*(encode(scene) for scene in rendered_scenes))
+    finally:
+        scheduler.shutdown()
+    return [scene for scene in encoded if scene]
+
+def load_job_payload(arg):
+    """Loads a story job from a JSON file path or an inline JSON string."""
+    if os.path.exists(arg):
+        with open(arg, 'r') as f: return json.load(f)
+    return json.loads(arg)
+
+async def render_story(data):
+    """Renders one story job and returns the result dict ({"video_path": ...}) or None.
+
+    Every stage is traced; the trace goes to output_dir as Chrome trace-event JSON and
+    the result carries its path and a one-line summary. Likewise for the resource report
+    of every subprocess the render launched (CPU time, peak RSS per stage and scene).
+
+    The render runs under the story and stage deadlines, and SIGTERM/SIGINT cancel it.
+    A cancelled render returns a partial result instead of a video: {"cancelled": true,
+    "reason": "deadline" or "signal", "stage" and "scene" that were running, "detail",
+    "elapsed_s", "in_flight" stages and the scenes whose artifacts are "completed"},
+    which a rerun of the story reuses.
+    """
+    tracing.start()
+    accounting.start()
+    task = asyncio.ensure_future(render_story_stages(data))
+    deadlines.start(task)
+    try:
+        with deadlines.signals_cancel():
+            result = await task
+    except (asyncio.CancelledError, deadlines.Cancelled):
+        if not deadlines.cancelled():
+            task.cancel()
+            raise  # Cancelled from outside, not by a deadline or signal
+        result = None
+    finally:
+        stopped = deadlines.finish()
+        finished = tracing.finish(data['output_dir'])
+        accounted = accounting.finish(data['output_dir'])
+    if stopped and result is None:
+        result = dict(stopped, cancelled=True, completed=completed_scene_stages(data['output_dir']))
+    if accounted:
+        report_path, resources = accounted
+        print(f"DEBUG: Subprocess resources {report_path}: {resources['processes']} processes, "
+              f"{resources['cpu_s']:.1f}s CPU, {resources['wall_s']:.1f}s wall, peak RSS {resources['max_rss_mb']:.0f} MB", file=sys.stderr)
+        if result:
+            result['resource_report_path'] = os.path.abspath(report_path)
+            result['resources'] = resources
+    if finished:
+        trace_path, summary = finished
+        print(f"DEBUG: Render trace {trace_path}: {tracing.summary_line(summary)}", file=sys.stderr)
+        if result:
+            result['trace_path'] = os.path.abspath(trace_path)
+            result['trace_summary'] = tracing.summary_line(summary)
+    return result
+
+def completed_scene_stages(output_dir):
+    """Scene indices per stage (image, audio, still, clip) whose artifacts the render manifest has."""
+    completed = {}
+    if os.path.isdir(output_dir):
+        for index, stages in RenderManifest(output_dir).scenes.items():
+            for stage in stages:
+                completed.setdefault(stage, []).append(int(index))
+    return {stage: sorted(indices) for stage, indices in completed.items()}
+
+async def render_story_stages(data):
     output_dir = data['output_dir']
     scenes = data['scenes']
     style = data.get('style', 'story')
     aspect_ratio = data.get('aspect_ratio', '16:9')
     bg_music = data.get('background_music')
     language = data.get('language', 'en')
+    profile_name = data.get('render_profile') or DEFAULT_RENDER_PROFILE
+    if profile_name not in RENDER_PROFILES:
+        print(f"Warning: Unknown render_profile '{profile_name}', using '{DEFAULT_RENDER_PROFILE}'", file=sys.stderr)
+        profile_name = DEFAULT_RENDER_PROFILE
+    profile = RENDER_PROFILES[profile_name]
 
     # Auto-detect language from content if it's default 'en'
     if language == 'en' and scenes and is_devanagari(scenes[0]['narration']):
@@ -941,7 +2198,8 @@ async def main():
         language = 'hi'
 
     # Initialize appropriate models based on language
-    init_models(language)
+    with tracing.span('models.init', 'model', language=language):
+        init_models(language)
 
     if not bg_music:
         # Fallback: Pick a random MP3 from public/audio/background/
@@ -959,69 +2217,231 @@ async def main():
 
     if not os.path.exists(output_dir): os.makedirs(output_dir)
 
-    scene_videos = []
-    last_successful_image = None # For fallback continuity
+    reset_tts_cache_stats()
+    single_pass = choose_render_mode(len(scenes), aspect_ratio, profile) == 'single_pass'
+    with tracing.span('render_scenes', scenes=len(scenes)):
+        rendered_scenes = await render_scenes(output_dir, scenes, aspect_ratio, language, style, not single_pass, profile)
+    print(f"DEBUG: TTS cache: {tts_cache_stats['hits']} hits, {tts_cache_stats['misses']} misses", file=sys.stderr)
+    if not rendered_scenes:
+        return None
 
-    for i, scene in enumerate(scenes):
-        img_path = os.path.join(output_dir, f"scene_{i}_img.jpg")
-        aud_path = os.path.join(output_dir, f"scene_{i}_aud.mp3")
-        vid_path = os.path.join(output_dir, f"scene_{i}_vid.mp4")
+    story_subtitles = story_subtitles_filter(output_dir, rendered_scenes, aspect_ratio) if SUBTITLE_MODE == 'timeline' else None
+    narration_track = write_narration_track(output_dir, rendered_scenes) if NARRATION_MODE == 'track' else None
 
-        # Try to download image from web
-        # Retry Logic:
-        # 1. Full Query
-        # 2. Simplified Query (Keywords)
-        # 3. Super Broad Query ("abstract background")
+    final_video = None
+    render_mode = 'multi_step'
+    if single_pass:
+        final_video = render_single_pass(output_dir, rendered_scenes, bg_music, aspect_ratio, story_subtitles, profile, narration_track)
+        if final_video:
+            render_mode = 'single_pass'
+        else:
+            print("DEBUG: Single-pass render failed, falling back to per-scene clips and assembly", file=sys.stderr)
+            encoded_scenes = await encode_scene_clips(output_dir, rendered_scenes, aspect_ratio, profile)
+            if narration_track and len(encoded_scenes) != len(rendered_scenes):
+                # Scenes whose clip failed are left out, so the timeline changed
+                narration_track = write_narration_track(output_dir, encoded_scenes) if encoded_scenes else None
+            if encoded_scenes:
+                final_video = assemble_scene_clips(output_dir, encoded_scenes, bg_music, aspect_ratio, story_subtitles, profile, narration_track)
+    else:
+        final_video = assemble_scene_clips(output_dir, rendered_scenes, bg_music, aspect_ratio, story_subtitles, profile, narration_track)
 
-        success = download_web_image(scene['image_prompt'], img_path, aspect_ratio)
+    if final_video:
+        return {"video_path": os.path.abspath(final_video), "render_mode": render_mode, "render_profile": profile_name, "tts_cache": dict(tts_cache_stats)}
+    return None
 
-        if not success:
-            print(f"DEBUG: Primary search failed for scene {i}. Retrying with simplified keywords...", file=sys.stderr)
-            simple_query = extract_keywords(scene['image_prompt'], limit=3)
-            success = download_web_image(simple_query, img_path, aspect_ratio)
+class _DaemonLogStream:
+    """Tees stderr to the daemon log and streams it to the connected client as log lines."""
 
-        if not success:
-            print(f"DEBUG: Secondary search failed. Retrying with broad fallback...", file=sys.stderr)
-            success = download_web_image("cinematic background", img_path, aspect_ratio)
+    def __init__(self, conn, original):
+        self.conn = conn
+        self.original = original
+        self.buffer = ''
+        self.lock = threading.Lock()
+        self.connected = True
 
-        if not success:
-            if last_successful_image and os.path.exists(last_successful_image):
-                 # Fallback: Use previous scene's image ("like scene 1")
-                 print(f"DEBUG: All searches failed. reusing previous image for scene {i}", file=sys.stderr)
-                 shutil.copy(last_successful_image, img_path)
-                 success = True
-            else:
-                # Final Fallback: Generate a random placeholder image from Picsum
-                print(f"DEBUG: Falling back to Picsum image for scene {i}", file=sys.stderr)
-                width = 1920 if aspect_ratio == "16:9" else 1080
-                height = 1080 if aspect_ratio == "16:9" else 1920
+    def send(self, message):
+        if not self.connected: return
+        try:
+            self.conn.sendall((json.dumps(message) + "\n").encode('utf-8'))
+        except OSError:
+            # Client went away (killed, or Laravel timed out); the job's watcher cancels the story
+            self.connected = False
+
+    def write(self, text):
+        self.original.write(text)
+        with self.lock:
+            self.buffer += text
+            while "\n" in self.buffer:
+                line, self.buffer = self.buffer.split("\n", 1)
+                self.send({"log": line})
+        return len(text)
+
+    def flush(self):
+        self.original.flush()
+
+class _RenderJobHandler(socketserver.StreamRequestHandler):
+    """Runs one story job per connection against the already-loaded models.
+
+    While the story renders, the client may send {"cancel": detail} (forward_to_daemon
+    does on SIGTERM/SIGINT); that, or losing the client, cancels the story as a signal
+    would in-process, and the partial result is sent back if the client is still there.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line: return
+
+        self.finished = threading.Event()
+        watcher = threading.Thread(target=self.watch_client, daemon=True)
+        log_stream = _DaemonLogStream(self.connection, sys.stderr)
+        original_stderr = sys.stderr
+        sys.stderr = log_stream
+        try:
+            data = json.loads(line.decode('utf-8'))
+            print(f"DEBUG: Daemon accepted job for story {data.get('story_id')}", file=sys.stderr)
+            watcher.start()
+            result = asyncio.run(render_story(data))
+            response = {"result": result} if result else {"error": "Render produced no video"}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"error": str(e)}
+        finally:
+            self.finished.set()
+            sys.stderr = original_stderr
+        log_stream.send(response)
+        if watcher.is_alive():
+            try:
+                self.connection.shutdown(socket.SHUT_RD)  # Wakes the watcher's read
+            except OSError:
+                pass
+            watcher.join()
+
+        # Inference abandoned by a cancelled story must finish before the model is reused
+        deadlines.drain()
+        signum = deadlines.received_signal()
+        if signum:
+            # The render caught it to stop cleanly; now shut the daemon down as it asked
+            signal.raise_signal(signum)
+
+    def watch_client(self):
+        """Reads the client's messages during the job; a cancel request or EOF cancels it."""
+        detail = "client disconnected"
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if 'cancel' in message:
+                    detail = f"client {message['cancel']}"
+                    break
+        except (OSError, ValueError):
+            pass
+        # Retried until render_story has started the story's deadlines
+        while not self.finished.is_set() and deadlines.cancelled() is None:
+            deadlines.cancel('signal', detail=detail)
+            self.finished.wait(0.1)
+
+class _RenderDaemon(socketserver.UnixStreamServer):
+    # Jobs are handled one at a time (the model is not re-entrant); queued
+    # clients wait in the listen backlog until the current story finishes.
+    request_queue_size = 64
+
+def serve_daemon(socket_path=DAEMON_SOCKET_PATH):
+    """Loads the TTS model once and serves story jobs over a Unix socket until interrupted."""
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"Error: A render daemon is already listening on {socket_path}", file=sys.stderr)
+            return
+        except OSError:
+            os.remove(socket_path)  # Stale socket from a crashed daemon
+        finally:
+            probe.close()
 
-                try:
-                    url = f"https://picsum.photos/{width}/{height}?sig={int(time.time())}"
-                    headers = {'User-Agent': 'Mozilla/5.0'}
-                    req = urllib.request.Request(url, headers=headers)
-                    with urllib.request.urlopen(req, timeout=10) as response:
-                        with open(img_path, 'wb') as f:
-                            f.write(response.read())
-                    success = True
-                except Exception as e:
-                    print(f"DEBUG: Picsum fallback failed: {e}. Using black image.", file=sys.stderr)
-                    dimensions = f"{width}x{height}"
-                    run_command([FFMPEG_PATH, '-y', '-f', 'lavfi', '-i', f'color=c=black:s={dimensions}', '-frames:v', '1', img_path])
-        else:
-            # Clean the downloaded image from watermarks before using it
-            clean_watermark(img_path)
-            last_successful_image = img_path # Update success tracker
+    init_models()
 
-        await generate_cloned_voice(aud_path, scene['narration'], TARGET_VOICE_PATH, i, language, style)
-        create_scene_video(img_path, aud_path, vid_path, scene['narration'], i, aspect_ratio)
-        if os.path.exists(vid_path): scene_videos.append(vid_path)
+    server = _RenderDaemon(socket_path, _RenderJobHandler)
+    print(f"Render daemon listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path): os.remove(socket_path)
 
-    if scene_videos:
-        final_video = step4_automatic_assembly(output_dir, scene_videos, bg_music, aspect_ratio)
-        if final_video:
-            print(json.dumps({"video_path": os.path.abspath(final_video)}))
-            sys.stdout.flush()
+def forward_to_daemon(data, socket_path=DAEMON_SOCKET_PATH):
+    """Sends a job to a running render daemon. Returns its response, or None if no daemon is running.
+
+    SIGTERM/SIGINT are passed on to the daemon, which cancels the story; the response
+    is then its partial result, as render_story returns in-process.
+    """
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except OSError:
+        conn.close()
+        return None
+
+    def cancel(reason, detail=None):
+        # The daemon cancels the story and still sends back the partial result
+        try:
+            conn.sendall((json.dumps({"cancel": detail or reason}) + "\n").encode('utf-8'))
+        except OSError:
+            pass
+
+    print(f"DEBUG: Forwarding job to render daemon at {socket_path}", file=sys.stderr)
+    try:
+        conn.sendall((json.dumps(data) + "\n").encode('utf-8'))
+        with deadlines.signals_cancel(action=cancel), conn.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                message = json.loads(line)
+                if 'log' in message:
+                    print(message['log'], file=sys.stderr)
+                else:
+                    return message
+    finally:
+        conn.close()
+
+    return {"error": "Render daemon closed the connection without a result"}
+
+async def main():
+    if len(sys.argv) < 2:
+        print("Error: No input provided", file=sys.stderr)
+        return
+
+    try:
+        data = load_job_payload(sys.argv[1])
+    except Exception as e:
+        print(f"Error parsing input: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return
+
+    # Prefer a warm daemon; fall back to rendering in this process
+    response = forward_to_daemon(data)
+    if response is not None:
+        result = response.get('result')
+        if not result:
+            print(f"Error: Render daemon failed: {response.get('error')}", file=sys.stderr)
+    else:
+        result = await render_story(data)
+
+    if result:
+        print(json.dumps(result))
+        sys.stdout.flush()
+
+    signum = deadlines.received_signal()
+    if signum or deadlines.abandoned():
+        # A cancelled render may leave inference running on a worker thread, which
+        # would hold the interpreter open; exit as the signal would have
+        sys.stderr.flush()
+        os._exit(128 + signum if signum else 0)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        # Long-lived mode: `python worker.py --serve [socket_path]`
+        serve_daemon(sys.argv[2] if len(sys.argv) > 2 else DAEMON_SOCKET_PATH)
+    else:
+        asyncio.run(main())
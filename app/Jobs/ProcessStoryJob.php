@@ -9,6 +9,7 @@
 use App\Models\Scene;
 use App\Jobs\UploadToYouTubeJob;
 use App\Services\AiStoryService;
+use Illuminate\Support\Facades\Cache;
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Storage;
 use Symfony\Component\Process\Process;
@@ -210,7 +211,26 @@ private function runAiWorker()
         $process->setWorkingDirectory(base_path('ai_worker'));
 
         try {
-            $process->run();
+            // The worker reports encode progress on stderr as "PROGRESS: {json}" lines
+            // (stage, scene, out_time, speed, eta_s); keep the latest for status pages
+            $progressKey = "story:{$this->story->id}:render_progress";
+            $stderrBuffer = '';
+            $process->run(function ($type, $buffer) use ($progressKey, &$stderrBuffer) {
+                if ($type !== Process::ERR) {
+                    return;
+                }
+                $stderrBuffer .= $buffer;
+                $lines = explode("\n", $stderrBuffer);
+                $stderrBuffer = array_pop($lines);
+                foreach ($lines as $line) {
+                    if (str_starts_with($line, 'PROGRESS: ')) {
+                        $event = json_decode(substr($line, strlen('PROGRESS: ')), true);
+                        if (is_array($event)) {
+                            Cache::put($progressKey, $event, now()->addHours(2));
+                        }
+                    }
+                }
+            });
 
             if (!$process->isSuccessful()) {
                 throw new ProcessFailedException($process);
@@ -231,6 +251,12 @@ private function runAiWorker()
                 $output = json_decode($outputRaw, true);
             }
 
+            if (is_array($output) && !empty($output['cancelled'])) {
+                // Partial result: a stage missed its deadline or the worker was stopped
+                $scene = isset($output['scene']) ? " (scene {$output['scene']})" : '';
+                throw new \Exception("AI Worker cancelled at stage " . ($output['stage'] ?? 'unknown') . "{$scene}: " . ($output['detail'] ?? $output['reason'] ?? 'cancelled') . ". Output: " . $outputRaw);
+            }
+
             if (!is_array($output) || !isset($output['video_path'])) {
                 throw new \Exception("AI Worker failed to return video path. Output: " . $outputRaw . " | Error Output: " . $errorOutput);
             }